@@ -1,21 +1,64 @@
 import streamlit as st
 import backend
+import snapshots
 import pandas as pd
 
+PAGE_SIZE = 50
+
 # 1. PAGE SETUP
 st.set_page_config(page_title="The Foodie Sentinel", page_icon="🍜", layout="wide")
 st.title("🍜 The Foodie Sentinel")
 st.markdown("Automated Research & Discovery Engine")
 
+# --- CACHED DATA ACCESS ---
+# Every widget click re-runs this script. The loaders below are cached on the
+# DB's data_version, so they only hit SQLite again after something committed.
+@st.cache_resource
+def get_change_watcher():
+    return backend.ChangeWatcher()
+
+@st.cache_data(max_entries=4)
+def load_watchlist(db_version: int) -> pd.DataFrame:
+    return pd.DataFrame(backend.get_watchlist())
+
+@st.cache_data(max_entries=4)
+def load_neighborhoods(db_version: int) -> list:
+    return backend.get_neighborhoods()
+
+@st.cache_data(max_entries=4)
+def load_count(db_version: int, neighborhood, min_rating) -> int:
+    return backend.count_restaurants(neighborhood=neighborhood, min_rating=min_rating)
+
+@st.cache_data(max_entries=64)
+def load_page(db_version: int, neighborhood, min_rating, sort: str, after):
+    rows, next_cursor = backend.get_restaurants_page(
+        neighborhood=neighborhood, min_rating=min_rating, sort=sort, limit=PAGE_SIZE, after=after
+    )
+    return pd.DataFrame(rows), next_cursor
+
+@st.cache_data(max_entries=32)
+def load_similar(db_version: int, place: str, limit: int):
+    return backend.find_similar_restaurants(place, limit=limit)
+
+@st.cache_data(max_entries=4)
+def load_trends(db_version: int):
+    # Read-only: the sentinel appends to the snapshots after each run (and its
+    # mark commit bumps db_version, so the new files show up here)
+    return (snapshots.ratings_by_neighborhood().to_pandas(),
+            snapshots.discoveries_by_month().to_pandas(),
+            snapshots.target_activity().to_pandas())
+
+db_version = get_change_watcher().version()
+
 # --- SIDEBAR: CONTROLS ---
 with st.sidebar:
     st.header("Add to Watchlist")
     st.markdown("What food should the Sentinel hunt for?")
-    
+
     # Input fields
     new_food = st.text_input("Food Item", placeholder="e.g. Omakase")
     new_loc = st.text_input("Location", value="Markham")
-    
+
     # The Action Button
     if st.button("Start Watching", type="primary"):
         if new_food:
@@ -23,6 +66,7 @@ with st.sidebar:
             msg = backend.add_to_watchlist(new_food, new_loc)
             if "✅" in msg:
                 st.success(msg)
+                db_version = get_change_watcher().version()
             else:
                 st.error(msg)
         else:
@@ -32,18 +76,17 @@ with st.sidebar:
     st.caption(f"Database: `{backend.DB_PATH}`")
 
 # --- MAIN PAGE: TABS ---
-tab1, tab2 = st.tabs(["📋 Watchlist Configuration", "🍽️ The Black Book"])
+tab1, tab2, tab3, tab4 = st.tabs(["📋 Watchlist Configuration", "🍽️ The Black Book", "🔎 Places Like This", "📈 Trends"])
 
 # TAB 1: What are we looking for?
 with tab1:
     st.subheader("Active Search Targets")
-    watchlist_data = backend.get_watchlist()
-    
-    if watchlist_data:
-        df = pd.DataFrame(watchlist_data)
+    df = load_watchlist(db_version)
+
+    if not df.empty:
         # Display as a clean interactive table
         st.dataframe(
-            df, 
+            df,
             use_container_width=True,
             column_config={
                 "last_checked": st.column_config.TextColumn("Last Scan"),
@@ -57,13 +100,83 @@ with tab1:
 # TAB 2: What have we found?
 with tab2:
     st.subheader("Discovered Restaurants")
-    restaurant_data = backend.get_all_restaurants()
-    
-    if restaurant_data:
-        df_rest = pd.DataFrame(restaurant_data)
+
+    col1, col2, col3 = st.columns(3)
+    hood = col1.selectbox("Neighborhood", ["All"] + load_neighborhoods(db_version))
+    min_rating = col2.slider("Min rating", 0, 10, 0)
+    sort = col3.selectbox("Sort by", list(backend.SORT_OPTIONS), format_func=lambda s: s.replace("_", " ").title())
+
+    neighborhood = None if hood == "All" else hood
+    min_rating = min_rating or None
+
+    # Keyset pagination: remember the cursor that starts each visited page.
+    # Changing a filter starts over at page 1.
+    view = (neighborhood, min_rating, sort)
+    if st.session_state.get("bb_view") != view:
+        st.session_state.bb_view = view
+        st.session_state.bb_cursors = [None]
+    cursors = st.session_state.bb_cursors
+
+    df_rest, next_cursor = load_page(db_version, neighborhood, min_rating, sort, cursors[-1])
+    total = load_count(db_version, neighborhood, min_rating)
+
+    if not df_rest.empty:
         st.dataframe(
-            df_rest[["name", "neighborhood", "taste_rating", "notes"]], 
+            df_rest[["name", "neighborhood", "taste_rating", "notes"]],
             use_container_width=True
         )
+        pages = max(1, -(-total // PAGE_SIZE))
+        prev_col, info_col, next_col = st.columns([1, 3, 1])
+        if prev_col.button("← Prev", disabled=len(cursors) == 1):
+            cursors.pop()
+            st.rerun()
+        info_col.caption(f"Page {len(cursors)} of {pages} · {total} restaurants")
+        if next_col.button("Next →", disabled=next_cursor is None):
+            cursors.append(next_cursor)
+            st.rerun()
+    elif len(cursors) > 1:
+        st.info("No more restaurants.")
+        if st.button("← Back"):
+            cursors.pop()
+            st.rerun()
+    else:
+        st.info("No discoveries yet. The Sentinel hasn't run.")
+
+# TAB 3: What else is like X? (local TF-IDF index, no API calls)
+with tab3:
+    st.subheader("Places Like This")
+    col1, col2 = st.columns([3, 1])
+    place = col1.text_input("Restaurant or description", placeholder="e.g. Santouka, or hand-pulled noodles")
+    limit = col2.slider("How many", 1, 25, 5)
+
+    if place:
+        found = load_similar(db_version, place, limit)
+        if found["match"]:
+            st.caption(f"Similar to {found['match']['name']} ({found['match']['neighborhood']})")
+        if found["results"]:
+            st.dataframe(
+                pd.DataFrame(found["results"])[["name", "neighborhood", "taste_rating", "score", "notes"]],
+                use_container_width=True,
+                column_config={"score": st.column_config.ProgressColumn("Similarity", min_value=0, max_value=1)}
+            )
+        else:
+            st.info("Nothing similar in the Black Book yet.")
+
+# TAB 4: How is the hunt going? (charts read the Parquet snapshots, not SQLite)
+with tab4:
+    st.subheader("Trends")
+    ratings, discoveries, activity = load_trends(db_version)
+
+    if ratings.empty:
+        st.info("No history yet. Trends appear once the Sentinel has exported its first snapshot.")
     else:
-        st.info("No discoveries yet. The Sentinel hasn't run.")
\ No newline at end of file
+        col1, col2 = st.columns(2)
+        col1.markdown("**Average rating by neighborhood**")
+        col1.bar_chart(ratings.set_index("neighborhood")["avg_rating"])
+        col2.markdown("**Discoveries per month**")
+        col2.bar_chart(discoveries.set_index("month")["discoveries"])
+
+        if not activity.empty:
+            st.markdown("**New search hits per watchlist target (weekly)**")
+            st.line_chart(activity.pivot(index="period", columns="target", values="new_hits").fillna(0))
+        st.caption(f"Snapshots: `{snapshots.snapshot_dir()}`")
@@ -1,19 +1,44 @@
 import os
 import json
+import re
+import hashlib
 import sqlite3
+import threading
 import time  # <--- NEW: Added for rate limiting
-from typing import List, Optional
+import db
+import dedupe
+import quota
+import search_cache
+import memo
+import compaction
+import jsonstream
+import metrics
+import clients
+import scheduler
+import similarity
+import lazy
+import router
+from datetime import datetime, timezone
+from typing import Generator, List, Optional, Tuple
 from dotenv import load_dotenv
-from tavily import TavilyClient
-from google import genai
-from google.genai import types
+
+# The Gemini SDK is only imported when the LLM is first called (see lazy.py)
+genai = lazy.module("google.genai")
 
 # Load environment variables
 load_dotenv()
 
 TAVILY_API_KEY = os.getenv("TAVILY_API_KEY")
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-DB_NAME = "foodie_memory.db"
+DB_PATH = db.DB_PATH
+
+# The primary model (see router.py for the fallbacks). Memo lookups are keyed on it;
+# answers are stored under the model that actually gave them, so a fallback's
+# extraction is never replayed as if the primary had written it.
+MODEL_NAME = router.MODELS[0]
+# Bump this when the prompt template or the parsing rules change.
+# Memoized extractions from older versions are then ignored.
+PROMPT_VERSION = "v1"
 
 # --- DATA STRUCTURES ---
 class RestaurantCandidate:
@@ -26,22 +51,107 @@ class RestaurantCandidate:
 
 # --- HELPER FUNCTIONS ---
 
+# The targets the sentinel starts with on a fresh DB
+DEFAULT_WATCHLIST = [
+    {"food_item": "Pizza", "location": "Markham"},
+    {"food_item": "Dim Sum", "location": "Richmond Hill"},
+    {"food_item": "Ramen", "location": "North York"},
+    {"food_item": "Burger", "location": "Vaughan"}
+]
+
+WATCHLIST_COLUMNS = ["id", "food_item", "location", "last_checked", "min_interval_hours",
+                     "max_interval_hours", "recent_yield", "scan_count", "total_found", "last_found_at"]
+
 def get_watchlist():
     """
-    Returns the list of food items to track.
+    Returns the list of food items to track (with their scan stats).
     FIXED: Uses 'food_item' key to match sentinel.py
     """
-    return [
-        {"food_item": "Pizza", "location": "Markham"},
-        {"food_item": "Dim Sum", "location": "Richmond Hill"},
-        {"food_item": "Ramen", "location": "North York"},
-        {"food_item": "Burger", "location": "Vaughan"}
-    ]
+    _ensure_schema()
+    conn = db.get_connection()
+    try:
+        rows = conn.execute(f"SELECT {', '.join(WATCHLIST_COLUMNS)} FROM watchlist ORDER BY id").fetchall()
+    finally:
+        conn.close()
+    return [dict(zip(WATCHLIST_COLUMNS, row)) for row in rows]
+
+def get_due_targets(budget: Optional[int] = None) -> List[dict]:
+    """The stale watchlist targets worth scanning this run, best first (see scheduler.py)."""
+    return scheduler.plan_run(get_watchlist(), budget=budget)
+
+def record_scan(food_item: str, location: str, found: int):
+    """Marks a target as scanned now and folds its discoveries into its recent yield."""
+    _ensure_schema()
+    conn = db.get_connection()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute(
+            "SELECT recent_yield FROM watchlist WHERE food_item = ? AND location = ?", (food_item, location)
+        ).fetchone()
+        if row is None:
+            conn.rollback()
+            return
+        conn.execute('''
+            UPDATE watchlist SET
+                last_checked = ?,
+                recent_yield = ?,
+                scan_count = COALESCE(scan_count, 0) + 1,
+                total_found = COALESCE(total_found, 0) + ?,
+                last_found_at = CASE WHEN ? > 0 THEN ? ELSE last_found_at END
+            WHERE food_item = ? AND location = ?
+        ''', (
+            datetime.now(timezone.utc).strftime(scheduler.TIME_FORMAT),
+            scheduler.updated_yield(row[0], found),
+            found, found, datetime.now(timezone.utc).strftime(scheduler.TIME_FORMAT),
+            food_item, location
+        ))
+        conn.commit()
+    finally:
+        conn.close()
+
+def add_to_watchlist(food_item: str, location: str, min_interval_hours: Optional[float] = None,
+                     max_interval_hours: Optional[float] = None) -> str:
+    """Adds a target for the sentinel. Returns a message for the UI."""
+    _ensure_schema()
+    food_item = food_item.strip()
+    location = location.strip()
+    try:
+        conn = db.get_connection()
+        try:
+            cur = conn.execute('''
+                INSERT OR IGNORE INTO watchlist (food_item, location, min_interval_hours, max_interval_hours)
+                VALUES (?, ?, ?, ?)
+            ''', (food_item, location, min_interval_hours, max_interval_hours))
+            conn.commit()
+        finally:
+            conn.close()
+    except Exception as e:
+        return f"❌ DB Error: {e}"
+
+    if cur.rowcount == 0:
+        return f"⚠️ Already watching {food_item} in {location}."
+    return f"✅ Now watching {food_item} in {location}."
+
+_schema_ready = set()
+# Stored in the DB's PRAGMA user_version once init_db has run on it. Bump it
+# whenever init_db changes, so existing DBs get upgraded on their next start.
+SCHEMA_VERSION = 3
+
+# Columns covered by the full-text index of each table
+FTS_TABLES = {
+    "restaurants": ["name", "neighborhood", "notes"],
+    "search_hits": ["title", "content"],
+}
 
 def init_db():
-    """Creates the database table if it doesn't exist."""
-    conn = sqlite3.connect(DB_NAME)
+    """Creates (or upgrades) the restaurants table. Safe to run on every start."""
+    conn = db.get_connection()
     c = conn.cursor()
+    # WAL lets the dashboard keep reading while the sentinel writes.
+    c.execute("PRAGMA journal_mode=WAL")
+    # One write transaction for the whole setup: workers starting together on a
+    # new DB would otherwise both see a column missing and both try to add it.
+    c.execute("BEGIN IMMEDIATE")
     c.execute('''
         CREATE TABLE IF NOT EXISTS restaurants (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -53,79 +163,756 @@ def init_db():
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
     ''')
+
+    # Older DBs were created by food_agent.py / setup_db.py without these columns
+    columns = {row[1] for row in c.execute("PRAGMA table_info(restaurants)")}
+    if "confidence_score" not in columns:
+        c.execute("ALTER TABLE restaurants ADD COLUMN confidence_score INTEGER")
+    if "created_at" not in columns:
+        c.execute("ALTER TABLE restaurants ADD COLUMN created_at TIMESTAMP")
+
+    # Upserts need a unique name. Merge any old duplicates into their first row
+    # (ratings and notes kept, as in compact_duplicates) before indexing.
+    merged = dedupe.merge_same_names(c)
+    if merged:
+        print(f"🧹 Merged {merged} duplicate restaurant rows.")
+    c.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_restaurants_name ON restaurants(name)")
+    # Blocking index for near-duplicate names (see dedupe.py)
+    dedupe.init_index(c)
+    dedupe.index_missing(c)
+    # Queue of places the similarity index is behind on (see similarity.py)
+    similarity.init_tables(c)
+    # Sort/filter indexes for the keyset-paginated readers. The expressions must
+    # match SORT_OPTIONS exactly or SQLite won't use them.
+    c.execute("CREATE INDEX IF NOT EXISTS idx_restaurants_created ON restaurants(COALESCE(created_at, ''), id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_restaurants_rating ON restaurants(COALESCE(taste_rating, -1), id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_restaurants_hood ON restaurants(neighborhood, COALESCE(taste_rating, -1), id)")
+
+    # The sentinel's targets. Seeded with the defaults only when first created.
+    has_watchlist = c.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'watchlist'"
+    ).fetchone()
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS watchlist (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            food_item TEXT,
+            location TEXT,
+            last_checked TEXT,
+            UNIQUE(food_item, location)
+        )
+    ''')
+    # Scheduling stats (older DBs only had last_checked). NULL = scheduler default.
+    columns = {row[1] for row in c.execute("PRAGMA table_info(watchlist)")}
+    for column, column_type in [("min_interval_hours", "REAL"), ("max_interval_hours", "REAL"),
+                                ("recent_yield", "REAL"), ("scan_count", "INTEGER"),
+                                ("total_found", "INTEGER"), ("last_found_at", "TEXT")]:
+        if column not in columns:
+            c.execute(f"ALTER TABLE watchlist ADD COLUMN {column} {column_type}")
+    if not has_watchlist:
+        c.executemany(
+            "INSERT INTO watchlist (food_item, location) VALUES (?, ?)",
+            [(t["food_item"], t["location"]) for t in DEFAULT_WATCHLIST]
+        )
+
+    # Raw search hits the sentinel has seen (one row per distinct url + content)
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS search_hits (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            url TEXT,
+            title TEXT,
+            content TEXT,
+            content_hash TEXT,
+            first_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(url, content_hash)
+        )
+    ''')
+
+    # Which hits each target was shown, and whether they've been through extraction yet
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS target_hits (
+            food_item TEXT,
+            location TEXT,
+            hit_id INTEGER,
+            first_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            analyzed_at TIMESTAMP,
+            seq INTEGER,
+            PRIMARY KEY (food_item, location, hit_id)
+        ) WITHOUT ROWID
+    ''')
+    # seq numbers rows in commit order (there's no rowid to do it), for the snapshot export
+    c.execute("CREATE INDEX IF NOT EXISTS idx_target_hits_seq ON target_hits(seq)")
+
+    _init_fts(c)
+    _init_neighborhood_summary(c)
+    c.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
     conn.commit()
     conn.close()
+    _schema_ready.add(db.DB_PATH)
 
-def save_restaurant(candidate: RestaurantCandidate):
-    """Saves a single restaurant to the database."""
-    try:
-        conn = sqlite3.connect(DB_NAME)
-        c = conn.cursor()
-        
-        # Check for duplicates
-        c.execute("SELECT id FROM restaurants WHERE name = ?", (candidate.name,))
-        if c.fetchone():
-            print(f"   ⚠️ Skipping {candidate.name} (Already in DB)")
-            conn.close()
-            return
+def _init_fts(c):
+    """
+    FTS5 full-text indexes over restaurants and search hits. They are
+    external-content tables kept in sync by triggers, so the text is stored once.
+    """
+    for table, columns in FTS_TABLES.items():
+        fts = f"{table}_fts"
+        exists = c.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (fts,)).fetchone()
+        cols = ", ".join(columns)
+        new_cols = ", ".join(f"new.{col}" for col in columns)
+        old_cols = ", ".join(f"old.{col}" for col in columns)
+        c.execute(f'''
+            CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+                {cols}, content='{table}', content_rowid='id',
+                tokenize='porter unicode61 remove_diacritics 2'
+            )
+        ''')
+        c.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} BEGIN
+                INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_cols});
+            END
+        ''')
+        c.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_cols});
+            END
+        ''')
+        c.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF {cols} ON {table} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_cols});
+                INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_cols});
+            END
+        ''')
+        if not exists:
+            # Index whatever was already in the table
+            c.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
 
+def _init_neighborhood_summary(c):
+    """
+    Per-neighborhood counts kept up to date by triggers, so the agent's memory
+    check reads one small row instead of aggregating the whole Black Book.
+    """
+    exists = c.execute("SELECT 1 FROM sqlite_master WHERE name = 'neighborhood_summary'").fetchone()
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS neighborhood_summary (
+            neighborhood TEXT PRIMARY KEY,
+            restaurants INTEGER DEFAULT 0,
+            rated INTEGER DEFAULT 0,
+            rating_sum INTEGER DEFAULT 0
+        )
+    ''')
+    add = '''
+        INSERT INTO neighborhood_summary (neighborhood, restaurants, rated, rating_sum)
+        VALUES (COALESCE(new.neighborhood, ''), 1, new.taste_rating IS NOT NULL, COALESCE(new.taste_rating, 0))
+        ON CONFLICT(neighborhood) DO UPDATE SET
+            restaurants = restaurants + 1,
+            rated = rated + excluded.rated,
+            rating_sum = rating_sum + excluded.rating_sum;
+    '''
+    remove = '''
+        UPDATE neighborhood_summary SET
+            restaurants = restaurants - 1,
+            rated = rated - (old.taste_rating IS NOT NULL),
+            rating_sum = rating_sum - COALESCE(old.taste_rating, 0)
+        WHERE neighborhood = COALESCE(old.neighborhood, '');
+    '''
+    c.execute(f"CREATE TRIGGER IF NOT EXISTS neighborhood_summary_insert AFTER INSERT ON restaurants BEGIN {add} END")
+    c.execute(f"CREATE TRIGGER IF NOT EXISTS neighborhood_summary_delete AFTER DELETE ON restaurants BEGIN {remove} END")
+    c.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS neighborhood_summary_update
+        AFTER UPDATE OF neighborhood, taste_rating ON restaurants BEGIN {remove} {add} END
+    ''')
+    if not exists:
         c.execute('''
-            INSERT INTO restaurants (name, neighborhood, taste_rating, notes, confidence_score)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (candidate.name, candidate.neighborhood, candidate.taste_rating, candidate.notes, candidate.confidence_score))
-        
-        conn.commit()
+            INSERT INTO neighborhood_summary (neighborhood, restaurants, rated, rating_sum)
+            SELECT COALESCE(neighborhood, ''), COUNT(*), COUNT(taste_rating), COALESCE(SUM(taste_rating), 0)
+            FROM restaurants GROUP BY COALESCE(neighborhood, '')
+        ''')
+
+def _ensure_schema():
+    """
+    Runs init_db only if this DB file hasn't been set up at the current
+    SCHEMA_VERSION yet. A fresh process just reads one pragma.
+    """
+    if db.DB_PATH in _schema_ready:
+        return
+    conn = db.get_connection()
+    try:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+    finally:
         conn.close()
-        print(f"   💾 Saved: {candidate.name}")
+    if version == SCHEMA_VERSION:
+        _schema_ready.add(db.DB_PATH)
+    else:
+        init_db()
+
+@metrics.span("save")
+def save_restaurants(candidates: List[RestaurantCandidate], update_existing: bool = True) -> List[tuple]:
+    """
+    Saves a whole run's candidates in ONE connection and ONE transaction.
+    Returns [(name, outcome)] in input order, outcome being:
+      'inserted'  - new restaurant
+      'updated'   - already known (exactly or as a near-duplicate name);
+                    rating/notes refreshed (only if the new mention is at
+                    least as confident as the stored one)
+      'duplicate' - already known, nothing changed
+      'error'     - the transaction failed and nothing was written
+    """
+    if not candidates:
+        return []
+    _ensure_schema()
+
+    conn = db.get_connection()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        # Rows inserted or renamed outside this function since the last save
+        dedupe.index_pending(conn)
+
+        # One indexed lookup for everything we already know by exact name
+        names = list({c.name for c in candidates})
+        known = {}
+        for i in range(0, len(names), 500):
+            chunk = names[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            for name, rating, notes, confidence in conn.execute(
+                f"SELECT name, taste_rating, notes, confidence_score FROM restaurants WHERE name IN ({placeholders})",
+                chunk
+            ):
+                known[name] = (rating, notes, confidence)
+
+        outcomes = []
+        changed_ids = []
+        for c in candidates:
+            # 'PIZZA NOVA' / 'Pizza Nova (Markham)' resolve to the row we already have
+            name = c.name
+            if name not in known:
+                match_id = dedupe.find_match(conn, c.name, c.neighborhood)
+                if match_id is not None:
+                    name, rating, notes, confidence = conn.execute(
+                        "SELECT name, taste_rating, notes, confidence_score FROM restaurants WHERE id = ?",
+                        (match_id,)
+                    ).fetchone()
+                    known[name] = (rating, notes, confidence)
+
+            old = known.get(name)
+            if old is None:
+                outcome = "inserted"
+            elif (update_existing
+                  and (c.taste_rating, c.notes) != old[:2]
+                  and (c.confidence_score or 0) >= (old[2] or 0)):
+                outcome = "updated"
+            else:
+                outcome = "duplicate"
+
+            if outcome != "duplicate":
+                restaurant_id = conn.execute('''
+                    INSERT INTO restaurants (name, neighborhood, taste_rating, notes, confidence_score)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT(name) DO UPDATE SET
+                        taste_rating = excluded.taste_rating,
+                        notes = excluded.notes,
+                        confidence_score = excluded.confidence_score
+                    RETURNING id
+                ''', (name, c.neighborhood, c.taste_rating, c.notes, c.confidence_score)).fetchone()[0]
+                if outcome == "inserted":
+                    # Index it now so later candidates in this batch can match it
+                    dedupe.index_name(conn, restaurant_id, name, c.neighborhood)
+                known[name] = (c.taste_rating, c.notes, c.confidence_score)
+                changed_ids.append(restaurant_id)
+            outcomes.append((c.name, outcome))
+
+        conn.commit()
+        try:
+            similarity.add_restaurants(conn, changed_ids)
+        except Exception as e:
+            # They stay queued, so the next sync() picks them up; the save itself succeeded
+            print(f"   ⚠️ Similarity index not updated: {e}")
+        for _, outcome in outcomes:
+            metrics.inc("restaurants_saved", outcome=outcome)
+        return outcomes
     except Exception as e:
+        conn.rollback()
         print(f"   ❌ DB Error: {e}")
+        metrics.inc("restaurants_saved", len(candidates), outcome="error")
+        return [(c.name, "error") for c in candidates]
+    finally:
+        conn.close()
+
+def save_restaurant(candidate: RestaurantCandidate) -> str:
+    """Saves a single restaurant. Returns the outcome from save_restaurants()."""
+    return save_restaurants([candidate])[0][1]
+
+def compact_duplicates() -> List[tuple]:
+    """One-off pass that merges near-duplicate rows already in the DB. Returns [(kept, merged)]."""
+    _ensure_schema()
+    conn = db.get_connection()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        merged = dedupe.compact(conn)
+        conn.commit()
+        return merged
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+# --- READ API ---
+RESTAURANT_COLUMNS = ["id", "name", "neighborhood", "taste_rating", "notes", "confidence_score", "created_at"]
+
+# sort name -> (SQL sort expression, descending?)
+SORT_OPTIONS = {
+    "newest": ("COALESCE(created_at, '')", True),
+    "oldest": ("COALESCE(created_at, '')", False),
+    "top_rated": ("COALESCE(taste_rating, -1)", True),
+    "name": ("name", False),
+}
+
+def get_restaurants_page(neighborhood: Optional[str] = None, min_rating: Optional[int] = None,
+                         since: Optional[str] = None, until: Optional[str] = None,
+                         sort: str = "newest", limit: int = 50, after: Optional[tuple] = None):
+    """
+    One page of restaurants using keyset pagination (no OFFSET, so page 1000
+    costs the same as page 1). Returns (rows, next_cursor); pass next_cursor
+    back as `after` to get the following page. next_cursor is None at the end.
+    since/until filter on created_at ('YYYY-MM-DD' or full timestamps).
+    """
+    _ensure_schema()
+    sort_expr, descending = SORT_OPTIONS[sort]
+
+    where = []
+    params = []
+    if neighborhood:
+        where.append("neighborhood = ?")
+        params.append(neighborhood)
+    if min_rating is not None:
+        where.append("taste_rating >= ?")
+        params.append(min_rating)
+    if since:
+        where.append("created_at >= ?")
+        params.append(str(since))
+    if until:
+        where.append("created_at <= ?")
+        params.append(str(until))
+    if after is not None:
+        # Strictly past the last row of the previous page. Written as a range on
+        # the sort expression (+ id tiebreak) so SQLite can seek the index.
+        op = "<" if descending else ">"
+        where.append(f"{sort_expr} {op}= ? AND ({sort_expr} {op} ? OR id {op} ?)")
+        params.extend([after[0], after[0], after[1]])
+
+    direction = "DESC" if descending else "ASC"
+    sql = f"SELECT {', '.join(RESTAURANT_COLUMNS)}, {sort_expr} FROM restaurants"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += f" ORDER BY {sort_expr} {direction}, id {direction} LIMIT ?"
+    params.append(limit)
+
+    conn = db.get_connection()
+    try:
+        fetched = conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+    rows = [dict(zip(RESTAURANT_COLUMNS, r[:-1])) for r in fetched]
+    next_cursor = (fetched[-1][-1], fetched[-1][0]) if len(fetched) == limit else None
+    return rows, next_cursor
+
+def count_restaurants(neighborhood: Optional[str] = None, min_rating: Optional[int] = None) -> int:
+    """How many restaurants match (uses the same indexes as the page reader)."""
+    _ensure_schema()
+    sql = "SELECT COUNT(*) FROM restaurants WHERE 1 = 1"
+    params = []
+    if neighborhood:
+        sql += " AND neighborhood = ?"
+        params.append(neighborhood)
+    if min_rating is not None:
+        sql += " AND taste_rating >= ?"
+        params.append(min_rating)
+    conn = db.get_connection()
+    try:
+        return conn.execute(sql, params).fetchone()[0]
+    finally:
+        conn.close()
+
+def get_neighborhoods() -> List[str]:
+    """Distinct neighborhoods (for filter dropdowns)."""
+    _ensure_schema()
+    conn = db.get_connection()
+    try:
+        rows = conn.execute(
+            "SELECT DISTINCT neighborhood FROM restaurants WHERE neighborhood IS NOT NULL ORDER BY neighborhood"
+        ).fetchall()
+    finally:
+        conn.close()
+    return [r[0] for r in rows]
+
+def get_all_restaurants() -> List[dict]:
+    """Every restaurant as a list of dicts (newest first). Prefer iter_restaurants for big tables."""
+    return list(iter_restaurants())
+
+class ChangeWatcher:
+    """
+    Tells caches whether the DB changed, without reading any table.
+    Holds one connection open: SQLite bumps that connection's
+    PRAGMA data_version every time ANY other connection (the sentinel,
+    an MCP agent, the dashboard's own writes) commits.
+    """
+    def __init__(self):
+        _ensure_schema()
+        self.conn = sqlite3.connect(db.DB_PATH, check_same_thread=False)
+        self.lock = threading.Lock()
+
+    def version(self) -> int:
+        with self.lock:
+            return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+def iter_restaurants(page_size: int = 500, **filters):
+    """
+    Streams every matching restaurant as a dict, one page at a time.
+    Memory stays bounded by page_size and no read transaction is held
+    between pages, so the sentinel can keep writing.
+    Accepts the same filters/sort as get_restaurants_page().
+    """
+    after = None
+    while True:
+        rows, after = get_restaurants_page(limit=page_size, after=after, **filters)
+        yield from rows
+        if after is None:
+            return
+
+# --- FULL-TEXT SEARCH ---
+# Words that only add noise to an OR query ("ramen near highway 7")
+_SEARCH_STOPWORDS = {"a", "an", "the", "in", "on", "at", "near", "around", "and", "or",
+                     "of", "for", "with", "best", "good", "place", "places", "spot", "spots"}
+
+def _fts_query(text: str) -> str:
+    """Turns free text into a safe FTS5 query: quoted terms OR'ed together, ranked by bm25."""
+    terms = [t for t in re.findall(r"\w+", text.lower()) if t not in _SEARCH_STOPWORDS]
+    return " OR ".join(f'"{t}"' for t in terms)
+
+def search_memory(query: str, limit: int = 10) -> dict:
+    """
+    Ranked full-text search over the Black Book and the raw snippets the
+    sentinel has seen. Returns {"restaurants": [...], "snippets": [...]},
+    best matches first. Uses the FTS5 index, so it doesn't scan the tables.
+    """
+    _ensure_schema()
+    fts_query = _fts_query(query)
+    if not fts_query:
+        return {"restaurants": [], "snippets": []}
+
+    conn = db.get_connection()
+    try:
+        # Name hits count more than neighborhood hits, which count more than notes
+        restaurants = conn.execute('''
+            SELECT r.id, r.name, r.neighborhood, r.taste_rating, r.notes,
+                   bm25(restaurants_fts, 10.0, 4.0, 1.0) AS rank
+            FROM restaurants_fts JOIN restaurants r ON r.id = restaurants_fts.rowid
+            WHERE restaurants_fts MATCH ?
+            ORDER BY rank LIMIT ?
+        ''', (fts_query, limit)).fetchall()
+        snippets = conn.execute('''
+            SELECT h.url, h.title, snippet(search_hits_fts, 1, '[', ']', '…', 16),
+                   bm25(search_hits_fts, 3.0, 1.0) AS rank
+            FROM search_hits_fts JOIN search_hits h ON h.id = search_hits_fts.rowid
+            WHERE search_hits_fts MATCH ?
+            ORDER BY rank LIMIT ?
+        ''', (fts_query, limit)).fetchall()
+    finally:
+        conn.close()
+
+    return {
+        "restaurants": [
+            {"id": r[0], "name": r[1], "neighborhood": r[2], "taste_rating": r[3], "notes": r[4]}
+            for r in restaurants
+        ],
+        "snippets": [{"url": r[0], "title": r[1], "snippet": r[2]} for r in snippets],
+    }
+
+# --- AGENT MEMORY ---
+# Hard cap on rows the agent can pull into its context in one call
+MAX_RECALL = 25
+# Best-rated places listed per neighborhood in its summary
+SUMMARY_TOP = 3
+
+def get_neighborhood_summaries(location: str = "", limit: int = 5) -> List[dict]:
+    """
+    Precomputed stats for the neighborhoods matching `location` (all of them
+    if empty), biggest first: count, average rating and the top-rated names.
+    Reads the trigger-maintained summary table plus SUMMARY_TOP index rows per
+    neighborhood, so the cost doesn't grow with the number of restaurants.
+    """
+    _ensure_schema()
+    conn = db.get_connection()
+    try:
+        rows = conn.execute('''
+            SELECT neighborhood, restaurants, rated, rating_sum FROM neighborhood_summary
+            WHERE restaurants > 0 AND (? = '' OR neighborhood LIKE '%' || ? || '%')
+            ORDER BY neighborhood = ? COLLATE NOCASE DESC, restaurants DESC LIMIT ?
+        ''', (location, location, location, limit)).fetchall()
+        summaries = []
+        for neighborhood, count, rated, rating_sum in rows:
+            # Walks idx_restaurants_hood backwards: best ratings first
+            top = conn.execute('''
+                SELECT name FROM restaurants WHERE neighborhood = ?
+                ORDER BY COALESCE(taste_rating, -1) DESC, id DESC LIMIT ?
+            ''', (neighborhood, SUMMARY_TOP)).fetchall()
+            summaries.append({
+                "neighborhood": neighborhood,
+                "restaurants": count,
+                "avg_rating": round(rating_sum / rated, 1) if rated else None,
+                "top": [t[0] for t in top],
+            })
+    finally:
+        conn.close()
+    return summaries
+
+def recall_restaurants(dish: str = "", location: str = "", limit: int = 10) -> List[dict]:
+    """
+    The `limit` remembered restaurants most relevant to a dish in a location
+    (at most MAX_RECALL). The dish has to match a name or notes; places whose
+    neighborhood matches the location come first, each group ranked by bm25.
+    With no dish, returns the best-rated places in the location.
+    """
+    _ensure_schema()
+    limit = max(1, min(limit, MAX_RECALL))
+    # Column filters: dish words only match name/notes, location words only neighborhood.
+    # Places in the location come first, then bm25 within each group.
+    dish_query, location_query = _fts_query(dish), _fts_query(location)
+    in_location = "r.id IN (SELECT rowid FROM restaurants_fts WHERE restaurants_fts MATCH ?) DESC," if location_query else ""
+    params = [f"{{name notes}} : ({dish_query})"] + ([f"neighborhood : ({location_query})"] if location_query else [])
+    conn = db.get_connection()
+    try:
+        if dish_query:
+            rows = conn.execute(f'''
+                SELECT r.id, r.name, r.neighborhood, r.taste_rating, r.notes
+                FROM restaurants_fts JOIN restaurants r ON r.id = restaurants_fts.rowid
+                WHERE restaurants_fts MATCH ?
+                ORDER BY {in_location} bm25(restaurants_fts, 10.0, 4.0, 2.0) LIMIT ?
+            ''', (*params, limit)).fetchall()
+        else:
+            rows = conn.execute('''
+                SELECT id, name, neighborhood, taste_rating, notes FROM restaurants
+                WHERE ? = '' OR neighborhood LIKE '%' || ? || '%'
+                ORDER BY COALESCE(taste_rating, -1) DESC, id DESC LIMIT ?
+            ''', (location, location, limit)).fetchall()
+    finally:
+        conn.close()
+    return [{"id": r[0], "name": r[1], "neighborhood": r[2], "taste_rating": r[3], "notes": r[4]} for r in rows]
+
+# --- "PLACES LIKE THIS" ---
+
+def find_similar_restaurants(place: str, limit: int = 5) -> dict:
+    """
+    Restaurants most like `place`, by cosine similarity of local TF-IDF
+    vectors (name, neighborhood, notes and snippets that mention them).
+    `place` is a remembered restaurant's name, or any description
+    ("cheap late night congee"). No LLM or network call.
+    Returns {"match": the restaurant `place` resolved to (or None), "results": [...]}.
+    """
+    _ensure_schema()
+    limit = max(1, min(limit, MAX_RECALL))
+    conn = db.get_connection()
+    try:
+        similarity.sync(conn)
+        index = similarity.get_index()
+        match = conn.execute(
+            "SELECT id, name, neighborhood FROM restaurants WHERE name = ? COLLATE NOCASE", (place.strip(),)
+        ).fetchone()
+        if match is None:
+            match_id = dedupe.find_match(conn, place, None)
+            if match_id is not None:
+                match = conn.execute("SELECT id, name, neighborhood FROM restaurants WHERE id = ?", (match_id,)).fetchone()
+        row = index.row_of(match[0]) if match else None
+        if row is not None:
+            columns, values = index.row_vector(row)
+        else:
+            columns, values = index.query_vector(similarity.term_counts({"notes": place}))
+
+        # A few spare hits in case some were deleted since they were indexed
+        scored = index.top_k(columns, values, limit + 5, exclude_id=match[0] if match else None)
+        rows = {}
+        if scored:
+            ids = [restaurant_id for restaurant_id, _ in scored]
+            for r in conn.execute(
+                f"SELECT id, name, neighborhood, taste_rating, notes FROM restaurants WHERE id IN ({','.join('?' * len(ids))})", ids
+            ):
+                rows[r[0]] = r
+    finally:
+        conn.close()
+
+    results = [
+        {"id": r[0], "name": r[1], "neighborhood": r[2], "taste_rating": r[3], "notes": r[4], "score": round(score, 3)}
+        for r, score in ((rows.get(i), s) for i, s in scored) if r
+    ][:limit]
+    return {"match": {"id": match[0], "name": match[1], "neighborhood": match[2]} if match else None,
+            "results": results}
 
 def get_trusted_sources():
     return ["reddit.com", "blogto.com", "yelp.ca", "torontolife.com", "eater.com"]
 
-def verify_is_open(name: str, location: str, client: genai.Client) -> bool:
+def verify_is_open(name: str, location: str, client: Optional["genai.Client"] = None) -> bool:
     # PERMANENT FIX: Disable this check to save API Quota
     return True 
 
-# --- MAIN INTELLIGENCE FUNCTION ---
-# --- MAIN INTELLIGENCE FUNCTION (With Smart Retry) ---
-def search_and_analyze(food_item: str, location: str) -> List[RestaurantCandidate]:
-    MODEL_NAME = 'gemini-2.0-flash' 
-    
-    if not TAVILY_API_KEY or not GOOGLE_API_KEY:
-        print("❌ Missing API Keys.")
-        return []
+# --- MAIN INTELLIGENCE FUNCTIONS ---
+# The pipeline is split into two stages (search, analyze) so the sentinel can
+# run them concurrently with a separate limit for each upstream.
 
-    t_client = TavilyClient(api_key=TAVILY_API_KEY)
+@metrics.span("search")
+def search_sources(food_item: str, location: str, bypass_cache: bool = False) -> Optional[List[dict]]:
+    """
+    Stage 1: Asks Tavily for fresh articles about a dish in an area. None if the search failed.
+    bypass_cache skips the search cache (the answer still refreshes it).
+    """
+    t_client = clients.tavily_client(TAVILY_API_KEY)
     sources = get_trusted_sources()
-    
-    # 1. SEARCH
+
     query = f"best {food_item} in {location} area and nearby"
     print(f"🔎 Searching: {query}...")
-    
+
     try:
-        search_result = t_client.search(
+        # Cached: repeat lookups of the same target don't pay for the search again
+        search_result = search_cache.search(
+            t_client,
             query, 
             max_results=5, 
-            include_domains=sources
+            include_domains=sources,
+            bypass=bypass_cache
         )
         hits = search_result['results']
-        
-        if not hits:
-            return []
-            
-        raw_context = "\n".join([f"Source: {r['title']}\nContent: {r['content']}" for r in hits])
-        
     except Exception as e:
         print(f"❌ Search failed: {e}")
+        return None
+
+    try:
+        record_search_hits(hits, food_item, location)
+    except Exception as e:
+        print(f"   ⚠️ Could not store search hits: {e}")
+    return hits
+
+def search_new_hits(food_item: str, location: str, bypass_cache: bool = False) -> Optional[List[dict]]:
+    """
+    Stage 1 for the sentinel: searches, then keeps only the hits this target
+    hasn't had extracted yet (new URLs, or known URLs whose content changed).
+    An empty list means nothing changed and the LLM call can be skipped;
+    None means the search itself failed.
+    """
+    hits = search_sources(food_item, location, bypass_cache)
+    if hits is None:
+        return None
+    fresh = unseen_hits(food_item, location, hits)
+    if hits and not fresh:
+        print(f"♻️  Sources unchanged for {food_item}. Skipping analysis.")
+    elif len(fresh) < len(hits):
+        print(f"   {len(hits) - len(fresh)} of {len(hits)} hits already analyzed. Sending {len(fresh)}.")
+    return fresh
+
+def _hit_key(hit: dict) -> tuple:
+    """(url, content_hash) - the identity of a stored search hit."""
+    content = hit.get('content') or ''
+    return hit.get('url') or hit.get('title'), hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+def record_search_hits(hits: List[dict], food_item: Optional[str] = None, location: Optional[str] = None):
+    """
+    Keeps every distinct snippet we were shown, so it can be searched and
+    replayed later. With a target, also remembers that the target saw them.
+    """
+    if not hits:
+        return
+    _ensure_schema()
+    conn = db.get_connection()
+    try:
+        hit_ids = []
+        for r in hits:
+            url, content_hash = _hit_key(r)
+            hit_ids.append(conn.execute('''
+                INSERT INTO search_hits (url, title, content, content_hash) VALUES (?, ?, ?, ?)
+                ON CONFLICT(url, content_hash) DO UPDATE SET last_seen = CURRENT_TIMESTAMP
+                RETURNING id
+            ''', (url, r.get('title'), r.get('content') or '', content_hash)).fetchone()[0])
+        if food_item is not None:
+            # Writers are serialized, so MAX(seq) + 1 grows in commit order
+            conn.executemany('''
+                INSERT INTO target_hits (food_item, location, hit_id, seq)
+                VALUES (?, ?, ?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM target_hits))
+                ON CONFLICT(food_item, location, hit_id) DO UPDATE SET last_seen = CURRENT_TIMESTAMP
+            ''', [(food_item, location, hit_id) for hit_id in hit_ids])
+        conn.commit()
+    finally:
+        conn.close()
+
+def unseen_hits(food_item: str, location: str, hits: List[dict]) -> List[dict]:
+    """The hits that haven't been through extraction for this target yet."""
+    if not hits:
         return []
+    _ensure_schema()
+    conn = db.get_connection()
+    try:
+        analyzed = set(conn.execute('''
+            SELECT h.url, h.content_hash FROM target_hits t JOIN search_hits h ON h.id = t.hit_id
+            WHERE t.food_item = ? AND t.location = ? AND t.analyzed_at IS NOT NULL
+        ''', (food_item, location)).fetchall())
+    finally:
+        conn.close()
+    return [r for r in hits if _hit_key(r) not in analyzed]
 
-    # 2. ANALYZE (With Retry Logic)
-    print(f"🧠 Analyzing with {MODEL_NAME}...")
-    
-    client = genai.Client(api_key=GOOGLE_API_KEY)
-    
-    prompt = f"""
+def mark_hits_analyzed(food_item: str, location: str, hits: List[dict]):
+    """Records that extraction succeeded over these hits for this target."""
+    if not hits:
+        return
+    _ensure_schema()
+    conn = db.get_connection()
+    try:
+        for r in hits:
+            conn.execute('''
+                UPDATE target_hits SET analyzed_at = CURRENT_TIMESTAMP
+                WHERE food_item = ? AND location = ?
+                  AND hit_id = (SELECT id FROM search_hits WHERE url = ? AND content_hash = ?)
+            ''', (food_item, location, *_hit_key(r)))
+        conn.commit()
+    finally:
+        conn.close()
+
+def get_stored_hits(food_item: str, location: str) -> List[dict]:
+    """Latest stored version of every hit a target has been shown (for replays)."""
+    _ensure_schema()
+    conn = db.get_connection()
+    try:
+        rows = conn.execute('''
+            SELECT h.url, h.title, h.content FROM target_hits t JOIN search_hits h ON h.id = t.hit_id
+            WHERE t.food_item = ? AND t.location = ?
+            ORDER BY h.last_seen DESC, h.id DESC
+        ''', (food_item, location)).fetchall()
+    finally:
+        conn.close()
+
+    latest = {}
+    for url, title, content in rows:
+        latest.setdefault(url, {"url": url, "title": title, "content": content})
+    return list(latest.values())
+
+def get_hit_targets() -> List[tuple]:
+    """Every (food_item, location) that has stored hits."""
+    _ensure_schema()
+    conn = db.get_connection()
+    try:
+        return conn.execute(
+            "SELECT DISTINCT food_item, location FROM target_hits ORDER BY food_item, location"
+        ).fetchall()
+    finally:
+        conn.close()
+
+def format_hits(hits: List[dict]) -> str:
+    return "\n".join([f"Source: {r['title']}\nContent: {r['content']}" for r in hits])
+
+def build_prompt(food_item: str, hits: List[dict]) -> str:
+    """The extraction prompt is built only from the dish and the search snippets."""
+    raw_context = format_hits(hits)
+
+    return f"""
     Analyze these search results and extract ANY restaurant names that serve {food_item}.
     RETURN ONLY VALID JSON.
     
@@ -144,53 +931,409 @@ def search_and_analyze(food_item: str, location: str) -> List[RestaurantCandidat
     ]
     """
 
+def build_batch_prompt(groups: List[tuple]) -> str:
+    """
+    One prompt for several targets. groups = [(group_id, food_item, location, hits)].
+    The model answers with a JSON object keyed by group id.
+    """
+    sections = []
+    for group_id, food_item, location, hits in groups:
+        sections.append(f"=== GROUP {group_id} (dish: {food_item}, area: {location}) ===\n{format_hits(hits)}")
+    search_data = "\n\n".join(sections)
+
+    return f"""
+    Each GROUP below is an independent set of search results for one dish.
+    For EACH group, extract ANY restaurant names that serve that group's dish.
+    RETURN ONLY VALID JSON: one object with a key for every group id (use [] if none).
+    
+    SEARCH DATA:
+    {search_data}
+    
+    Output Format:
+    {{
+      "g0": [
+        {{
+          "name": "Restaurant Name",
+          "neighborhood": "Area Name",
+          "taste_rating": 7,
+          "notes": "Brief mention",
+          "confidence_score": 6
+        }}
+      ],
+      "g1": []
+    }}
+    """
+
+def generate_with_retry(client: "genai.Client", prompt: str) -> Optional[Tuple[str, str]]:
+    """
+    Calls Gemini under the shared quota. Returns (model that answered, response text), or None on failure.
+    Identical prompts already in flight (another thread/target) share that call.
+    """
+    key = ("gemini", MODEL_NAME, hashlib.sha256(prompt.encode("utf-8")).hexdigest())
+    return clients.singleflight(key, lambda: _generate_with_retry(client, prompt))
+
+def _generate_with_retry(client: "genai.Client", prompt: str) -> Optional[Tuple[str, str]]:
     # --- THE NEW RETRY LOOP ---
     max_retries = 3
+    prompt_tokens = compaction.count_tokens(prompt)
     for attempt in range(max_retries):
+        def take_quota(model):
+            quota.acquire("gemini", tokens=prompt_tokens)
+            metrics.inc("api_calls", service="gemini")
+
+        def call(model):
+            with metrics.span("llm", model=model, attempt=attempt):
+                return client.models.generate_content(
+                    model=model,
+                    contents=prompt
+                )
+
         try:
-            response = client.models.generate_content(
-                model=MODEL_NAME,
-                contents=prompt
-            )
-            # If we get here, it worked! Break the loop.
+            # Best available model first; falls back (and hedges, if enabled) per router.py
+            model, response = router.call(call, prepare=take_quota)
+            # If we get here, it worked!
             text = response.text.strip()
-            break 
-            
+            _log_usage(response, prompt_tokens, text)
+            return model, text
+
+        except router.CircuitOpen as e:
+            print(f"   🔌 Skipping analysis: {e}")
+            return None
         except Exception as e:
-            error_msg = str(e)
-            if "429" in error_msg or "RESOURCE_EXHAUSTED" in error_msg:
-                wait_time = 60
-                print(f"   ⏳ Quota hit (Attempt {attempt+1}/{max_retries}). Sleeping {wait_time}s...")
+            if quota.is_quota_error(e):
+                # Tell every process the bucket is empty, then back off with jitter.
+                # The next acquire() waits only as long as the budget needs.
+                quota.penalize("gemini")
+                metrics.inc("retries", service="gemini")
+                wait_time = quota.backoff_delay(attempt)
+                print(f"   ⏳ Quota hit (Attempt {attempt+1}/{max_retries}). Backing off {wait_time:.1f}s...")
                 time.sleep(wait_time)
             else:
                 # If it's a real error (not quota), crash usually.
                 print(f"❌ Analysis Logic Failed: {e}")
-                return []
-    else:
-        # If we loop 3 times and still fail
-        print("❌ Gave up after 3 retries.")
+                return None
+
+    # If we loop 3 times and still fail
+    print("❌ Gave up after 3 retries.")
+    return None
+
+def _log_usage(response, prompt_tokens: int, text: str):
+    """Prints and counts tokens in/out for one call (Gemini's own counts when it reports them)."""
+    usage = getattr(response, "usage_metadata", None)
+    tokens_in = getattr(usage, "prompt_token_count", None)
+    tokens_out = getattr(usage, "candidates_token_count", None)
+    if not isinstance(tokens_in, int):
+        tokens_in = prompt_tokens
+    if not isinstance(tokens_out, int):
+        tokens_out = compaction.count_tokens(text)
+    compaction.record_call(tokens_in, tokens_out)
+    metrics.inc("llm_tokens", tokens_in, direction="in")
+    metrics.inc("llm_tokens", tokens_out, direction="out")
+    print(f"   🧮 Tokens: {tokens_in} in / {tokens_out} out")
+
+def parse_candidates_json(text: str):
+    """
+    Strips markdown code fences and parses the model's JSON (array, or object in batch mode).
+    If the array is broken (trailing prose, a bad object), the well-formed objects are kept.
+    """
+    return parse_candidates(text)[0]
+
+def parse_candidates(text: str) -> Tuple[object, bool]:
+    """parse_candidates_json, plus whether the JSON was complete (False = only salvaged objects)."""
+    if text.startswith("```json"): text = text[7:]
+    if text.startswith("```"): text = text[3:]
+    if text.endswith("```"): text = text[:-3]
+    try:
+        return json.loads(text), True
+    except ValueError:
+        salvaged = jsonstream.parse_objects(text)
+        if not salvaged:
+            raise
+        print(f"   ⚠️ Malformed JSON from the model. Kept {len(salvaged)} complete objects.")
+        return salvaged, False
+
+def generate_stream_with_retry(client: "genai.Client", prompt: str) -> Generator[str, None, Optional[str]]:
+    """
+    Streaming twin of generate_with_retry: yields the response text chunk by chunk.
+    Quota errors are retried only before the first chunk; once text has been
+    handed out, a failure just ends the stream. The generator's return value is
+    the model that answered, or None if the stream failed.
+    """
+    max_retries = 3
+    prompt_tokens = compaction.count_tokens(prompt)
+    for attempt in range(max_retries):
+        started = False
+        model = None
+        start = None
+        recorded = False
+        try:
+            # A stream can't switch models part-way, so it gets the route's best model
+            model = router.pick()
+            quota.acquire("gemini", tokens=prompt_tokens)
+            metrics.inc("api_calls", service="gemini")
+            start = time.perf_counter()
+            received = []
+            last_chunk = None
+            for chunk in client.models.generate_content_stream(model=model, contents=prompt):
+                last_chunk = chunk
+                if chunk.text:
+                    started = True
+                    received.append(chunk.text)
+                    yield chunk.text
+            router.record(model, time.perf_counter() - start)
+            recorded = True
+            # usage_metadata arrives with the last chunk
+            _log_usage(last_chunk, prompt_tokens, "".join(received))
+            return model
+        except router.CircuitOpen as e:
+            print(f"   🔌 Skipping analysis: {e}")
+            return
+        except Exception as e:
+            if start is not None:
+                router.record(model, time.perf_counter() - start, e)
+                recorded = True
+            if started:
+                print(f"   ⚠️ Stream broke off: {e}")
+                return
+            if quota.is_quota_error(e):
+                quota.penalize("gemini")
+                metrics.inc("retries", service="gemini")
+                wait_time = quota.backoff_delay(attempt)
+                print(f"   ⏳ Quota hit (Attempt {attempt+1}/{max_retries}). Backing off {wait_time:.1f}s...")
+                time.sleep(wait_time)
+            else:
+                print(f"❌ Analysis Logic Failed: {e}")
+                return
+        finally:
+            # Consumer stopped early (GeneratorExit) or the call never went out:
+            # give back a half-open probe instead of holding it forever
+            if model is not None and not recorded:
+                router.release(model)
+
+    print("❌ Gave up after 3 retries.")
+
+# The fields RestaurantCandidate takes; anything else the model adds (e.g. "address") is dropped
+CANDIDATE_FIELDS = ("name", "neighborhood", "taste_rating", "notes", "confidence_score")
+
+def to_candidates(data: List[dict], location: str, client: Optional["genai.Client"] = None) -> List[RestaurantCandidate]:
+    """Keeps only confident candidates from the parsed model output. Malformed items are skipped."""
+    found_places = []
+    for item in data:
+        try:
+            name = item.get('name')
+            confident = bool(name) and item.get('confidence_score', 0) >= 5
+        except (AttributeError, TypeError):
+            # Not an object, or a score that isn't a number
+            print(f"   ⚠️ Skipping bad candidate: {item!r:.80}")
+            metrics.inc("candidates", outcome="malformed")
+            continue
+
+        if confident and verify_is_open(name, location, client):
+            # verify_is_open is disabled (returns True) to save quota
+            found_places.append(RestaurantCandidate(**{f: item.get(f) for f in CANDIDATE_FIELDS}))
+            metrics.inc("candidates", outcome="accepted")
+        else:
+            metrics.inc("candidates", outcome="rejected")
+
+    return found_places
+
+def analyze_hits(food_item: str, location: str, hits: List[dict]) -> Optional[List[RestaurantCandidate]]:
+    """
+    Stage 2: Extracts restaurant candidates from search hits (With Smart Retry).
+    None if the model gave no usable answer (the hits stay unanalyzed for next time).
+    """
+    if not hits:
+        return []
+
+    with metrics.span("prompt_build"):
+        compacted = compaction.compact_hits(hits, food_item, location)
+        prompt = build_prompt(food_item, compacted)
+    if not compacted:
+        print(f"   Nothing but boilerplate in the sources for {food_item}.")
+        mark_hits_analyzed(food_item, location, hits)
         return []
 
-    # 3. PARSE RESULTS
-    try:
-        if text.startswith("```json"): text = text[7:]
-        if text.startswith("```"): text = text[3:]
-        if text.endswith("```"): text = text[:-3]
-        
-        data = json.loads(text)
-        
-        found_places = []
-        for item in data:
-            score = item.get('confidence_score', 0)
-            name = item.get('name', 'Unknown')
-            
-            if score >= 5:
-                # verify_is_open is disabled (returns True) to save quota
-                if verify_is_open(name, location, client):
-                    found_places.append(RestaurantCandidate(**item))
-
-        return found_places
+    # Same model + same prompt => same answer. Skip the LLM if we've seen it.
+    model, complete = None, True
+    data = memo.lookup(MODEL_NAME, prompt, PROMPT_VERSION)
+    if data is not None:
+        print(f"♻️  Sources unchanged for {food_item}. Reusing previous analysis.")
+    else:
+        print(f"🧠 Analyzing with {MODEL_NAME}...")
+        client = clients.gemini_client(GOOGLE_API_KEY)
+        reply = generate_with_retry(client, prompt)
+        if reply is None:
+            return None
+        model, text = reply
+
+        try:
+            with metrics.span("parse"):
+                data, complete = parse_candidates(text)
+        except Exception as e:
+            print(f"❌ Parsing Logic Failed: {e}")
+            return None
 
+    # Convert first: the answer is only memoized and the hits retired once it's usable
+    try:
+        candidates = to_candidates(data, location)
     except Exception as e:
         print(f"❌ Parsing Logic Failed: {e}")
-        return []
\ No newline at end of file
+        return None
+    if not complete:
+        # Use what was salvaged, but neither replay it nor retire the hits:
+        # the next run asks again (as stream_hits does with a broken stream)
+        return candidates
+    if model is not None:
+        memo.store(model, prompt, PROMPT_VERSION, data)
+    mark_hits_analyzed(food_item, location, hits)
+    return candidates
+
+def stream_hits(food_item: str, location: str, hits: List[dict]) -> Generator[RestaurantCandidate, None, bool]:
+    """
+    Streaming version of analyze_hits: yields each confident candidate as soon
+    as the model has finished writing its JSON object, so callers can save and
+    display results before generation ends. Objects before a malformed tail
+    are kept. Only complete answers are memoized.
+    The generator's return value is False if the answer broke off or never came.
+    """
+    if not hits:
+        return True
+    with metrics.span("prompt_build"):
+        compacted = compaction.compact_hits(hits, food_item, location)
+        prompt = build_prompt(food_item, compacted)
+    if not compacted:
+        mark_hits_analyzed(food_item, location, hits)
+        return True
+
+    data = memo.lookup(MODEL_NAME, prompt, PROMPT_VERSION)
+    if data is not None:
+        print(f"♻️  Sources unchanged for {food_item}. Reusing previous analysis.")
+        try:
+            candidates = to_candidates(data, location)
+        except Exception as e:
+            print(f"❌ Parsing Logic Failed: {e}")
+            return False
+        # Only retired once the memoized answer has converted
+        mark_hits_analyzed(food_item, location, hits)
+        yield from candidates
+        return True
+
+    print(f"🧠 Streaming analysis with {MODEL_NAME}...")
+    client = clients.gemini_client(GOOGLE_API_KEY)
+    parser = jsonstream.ArrayObjectParser()
+    data = []
+    stream = generate_stream_with_retry(client, prompt)
+    while True:
+        try:
+            chunk = next(stream)
+        except StopIteration as done:
+            model = done.value
+            break
+        for item in parser.feed(chunk):
+            data.append(item)
+            try:
+                yield from to_candidates([item], location)
+            except Exception as e:
+                print(f"   ⚠️ Skipping bad candidate: {e}")
+
+    if parser.skipped:
+        print(f"   ⚠️ Skipped {parser.skipped} malformed objects.")
+    complete = parser.finished and model is not None
+    if complete:
+        memo.store(model, prompt, PROMPT_VERSION, data)
+        mark_hits_analyzed(food_item, location, hits)
+    return complete
+
+def analyze_batch(targets: List[tuple]) -> List[Optional[List[RestaurantCandidate]]]:
+    """
+    Batched version of analyze_hits. targets = [(food_item, location, hits)].
+    Packs every target that isn't already memoized into ONE Gemini request,
+    then splits the answer back out per target. Any group the model got wrong
+    falls back to its own analyze_hits call. Returns candidates in input order
+    (None for a target whose analysis failed, as in analyze_hits). If the batch
+    call itself failed (quota, open circuit), nothing falls back: N more calls
+    would hit the same wall, so those targets are None and retried next run.
+    """
+    results = [[] for _ in targets]
+    pending = []  # (group_id, index, food_item, location, hits, compacted_hits, single_prompt)
+
+    for i, (food_item, location, hits) in enumerate(targets):
+        if not hits:
+            continue
+        # Memo is keyed on the single-target prompt, so both modes share it
+        with metrics.span("prompt_build"):
+            compacted = compaction.compact_hits(hits, food_item, location)
+            prompt = build_prompt(food_item, compacted)
+        if not compacted:
+            mark_hits_analyzed(food_item, location, hits)
+            continue
+        data = memo.lookup(MODEL_NAME, prompt, PROMPT_VERSION)
+        if data is not None:
+            print(f"♻️  Sources unchanged for {food_item}. Reusing previous analysis.")
+            try:
+                results[i] = to_candidates(data, location)
+            except Exception as e:
+                print(f"❌ Parsing Logic Failed: {e}")
+                results[i] = None
+                continue
+            mark_hits_analyzed(food_item, location, hits)
+        else:
+            pending.append((f"g{len(pending)}", i, food_item, location, hits, compacted, prompt))
+
+    if len(pending) == 1:
+        _, i, food_item, location, hits, _, _ = pending[0]
+        results[i] = analyze_hits(food_item, location, hits)
+        return results
+    if not pending:
+        return results
+
+    print(f"🧠 Analyzing {len(pending)} targets in one call with {MODEL_NAME}...")
+    client = clients.gemini_client(GOOGLE_API_KEY)
+    with metrics.span("prompt_build", batch=len(pending)):
+        batch_prompt = build_batch_prompt([(g, food, loc, compacted) for g, _, food, loc, _, compacted, _ in pending])
+    reply = generate_with_retry(client, batch_prompt)
+    if reply is None:
+        for _, i, *_ in pending:
+            results[i] = None
+        return results
+
+    model, text = reply
+    try:
+        with metrics.span("parse", batch=len(pending)):
+            answer = parse_candidates_json(text)
+        if not isinstance(answer, dict):
+            raise ValueError("expected a JSON object keyed by group id")
+    except Exception as e:
+        print(f"❌ Batch parsing failed ({e}). Falling back to one call per target.")
+        answer = {}
+
+    for group_id, i, food_item, location, hits, _, prompt in pending:
+        data = answer.get(group_id)
+        try:
+            if not isinstance(data, list):
+                raise ValueError(f"group {group_id} missing from batch answer")
+            results[i] = to_candidates(data, location)
+            memo.store(model, prompt, PROMPT_VERSION, data)
+            mark_hits_analyzed(food_item, location, hits)
+        except Exception as e:
+            if answer:
+                print(f"   ⚠️ {food_item}: {e}. Retrying on its own...")
+            results[i] = analyze_hits(food_item, location, hits)
+
+    return results
+
+def search_and_analyze(food_item: str, location: str) -> List[RestaurantCandidate]:
+    """Runs search then analysis for a single target (blocking)."""
+    if not TAVILY_API_KEY or not GOOGLE_API_KEY:
+        print("❌ Missing API Keys.")
+        return []
+
+    hits = search_new_hits(food_item, location)
+    return analyze_hits(food_item, location, hits or []) or []
+
+def replay_target(food_item: str, location: str) -> List[RestaurantCandidate]:
+    """
+    Re-runs extraction over a target's stored hits without searching again
+    (e.g. after a PROMPT_VERSION bump). Unchanged prompts come from the memo.
+    """
+    return analyze_hits(food_item, location, get_stored_hits(food_item, location)) or []
@@ -0,0 +1,384 @@
+# Offline end-to-end benchmark for the sentinel pipeline.
+#
+# Tavily and Gemini are replaced by local fakes with configurable latency,
+# 429 rate and response size, so whole-pipeline throughput can be measured
+# without keys or quota. Everything runs against a throwaway database.
+#
+#   python benchmark.py --targets 1000 --time-scale 0.01
+#   python benchmark.py --targets 100 --mode search_and_analyze --rate-429 0.05
+#   python benchmark.py --targets 1000 --save-baseline   # record the numbers to beat
+#
+# Baselines are timings from the machine they were recorded on, so they
+# live in an untracked benchmark_baselines.json rather than in the repo.
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import random
+import re
+import statistics
+import tempfile
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional
+from unittest.mock import patch
+
+import backend
+import clients
+import db
+import quota
+import router
+import sentinel
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baselines.json")
+# A run is flagged when it is this much worse than its baseline
+REGRESSION_TOLERANCE = 0.15
+
+# --- FAKE UPSTREAMS ---
+
+class FakeQuotaError(Exception):
+    """Looks like the SDKs' rate-limit errors to quota.is_quota_error."""
+    def __init__(self, service: str):
+        super().__init__(f"429 RESOURCE_EXHAUSTED ({service}, simulated)")
+
+class Upstream:
+    """
+    Latency/error model for one fake API.
+    Latency is lognormal around `median_ms` (long right tail, like real APIs),
+    multiplied by `time_scale` so big watchlists finish in reasonable time.
+    """
+    def __init__(self, name: str, median_ms: float, sigma: float = 0.5, rate_429: float = 0.0,
+                 time_scale: float = 1.0, seed: int = 0):
+        self.name = name
+        self.median_ms = median_ms
+        self.sigma = sigma
+        self.rate_429 = rate_429
+        self.time_scale = time_scale
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+
+    def call(self):
+        with self.lock:
+            self.calls += 1
+            delay = self.rng.lognormvariate(0, self.sigma) * self.median_ms / 1000 * self.time_scale
+            throttled = self.rng.random() < self.rate_429
+            if throttled:
+                self.errors += 1
+        time.sleep(delay)
+        if throttled:
+            raise FakeQuotaError(self.name)
+
+# Synthetic restaurant names ("Golden Lotus Kitchen"...). Distinct enough that
+# the fuzzy de-duplicator doesn't merge them the way "Spot 12"/"Spot 123" would.
+_NAME_WORDS = (
+    ["Golden", "Crimson", "Jade", "Silver", "Lucky", "Humble", "Little", "Royal", "Happy", "Twin",
+     "Blue", "Old", "Urban", "Sunny", "Bamboo", "Maple", "Copper", "Velvet", "Wild", "Hidden"],
+    ["Lotus", "Dragon", "Garden", "Harbour", "Lantern", "Tiger", "Orchard", "Bridge", "Ember", "Crane",
+     "Pepper", "Willow", "Anchor", "Saffron", "Falcon", "Pearl", "Olive", "Basil", "Monsoon", "Fig"],
+    ["Kitchen", "House", "Bistro", "Noodle Bar", "Grill", "Eatery", "Canteen", "Diner", "Cafe", "Tavern"],
+)
+_NAME_PATTERN = re.compile(r"\b(?:{})\b".format(" ".join("(?:" + "|".join(words) + ")" for words in _NAME_WORDS)))
+
+def restaurant_name(i: int) -> str:
+    a, b, c = _NAME_WORDS
+    return f"{a[i % len(a)]} {b[(i // len(a)) % len(b)]} {c[(i // (len(a) * len(b))) % len(c)]}"
+
+class FakeTavily:
+    """Stands in for clients.TavilySearch. Each hit mentions a few synthetic restaurants."""
+    def __init__(self, upstream: Upstream, hit_chars: int, restaurant_pool: int):
+        self.upstream = upstream
+        self.hit_chars = hit_chars
+        self.restaurant_pool = restaurant_pool
+
+    def __call__(self, api_key=None):
+        return self
+
+    def search(self, query: str, max_results: int = 5, **kwargs) -> dict:
+        self.upstream.call()
+        rng = random.Random(query)
+        results = []
+        for i in range(max_results):
+            spots = [restaurant_name(rng.randrange(self.restaurant_pool)) for _ in range(2)]
+            text = f"{spots[0]} serves the best food in town. Locals also recommend {spots[1]}. "
+            filler = "The room was busy and the service was friendly. "
+            text += filler * max(0, (self.hit_chars - len(text)) // len(filler))
+            results.append({"url": f"https://bench.example/{zlib.crc32(query.encode())}/{i}",
+                            "title": f"Guide {i} for {query}", "content": text})
+        return {"results": results}
+
+class _FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+        self.usage_metadata = None
+
+class FakeGemini:
+    """Stands in for genai.Client. 'Extracts' every synthetic restaurant named in the prompt."""
+    _group = re.compile(r"=== GROUP (g\d+) .*?===\n(.*?)(?==== GROUP|\n\s*Output Format)", re.S)
+
+    def __init__(self, upstream: Upstream, stats: "StageStats"):
+        self.upstream = upstream
+        self.stats = stats
+        self.models = self
+
+    def __call__(self, api_key=None):
+        return self
+
+    def _answer(self, text: str) -> list:
+        names = dict.fromkeys(_NAME_PATTERN.findall(text))
+        return [{"name": n, "neighborhood": "Bench", "taste_rating": 7,
+                 "notes": "Benchmark", "confidence_score": 8} for n in names]
+
+    def generate_content(self, model=None, contents=""):
+        with self.stats.span("llm"):
+            self.upstream.call()
+        groups = self._group.findall(contents)
+        if groups:
+            return _FakeResponse(json.dumps({g: self._answer(body) for g, body in groups}))
+        return _FakeResponse(json.dumps(self._answer(contents)))
+
+    def generate_content_stream(self, model=None, contents=""):
+        text = self.generate_content(model, contents).text
+        for i in range(0, len(text), 64):
+            yield _FakeResponse(text[i:i + 64])
+
+# --- MEASUREMENT ---
+
+class StageStats:
+    """Collects durations per pipeline stage (thread-safe)."""
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    @contextlib.contextmanager
+    def span(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.samples.setdefault(stage, []).append(time.perf_counter() - start)
+
+    def wrap(self, stage: str, fn, outermost_only: bool = False):
+        """Times every call of fn. outermost_only skips calls made from inside another timed call of the stage."""
+        def timed(*args, **kwargs):
+            depth = getattr(self.local, stage, 0)
+            if outermost_only and depth:
+                return fn(*args, **kwargs)
+            setattr(self.local, stage, depth + 1)
+            try:
+                with self.span(stage):
+                    return fn(*args, **kwargs)
+            finally:
+                setattr(self.local, stage, depth)
+        return timed
+
+    def summary(self) -> dict:
+        out = {}
+        for stage, values in sorted(self.samples.items()):
+            values = sorted(values)
+            out[stage] = {
+                "count": len(values),
+                "p50_ms": round(_percentile(values, 50) * 1000, 2),
+                "p95_ms": round(_percentile(values, 95) * 1000, 2),
+                "p99_ms": round(_percentile(values, 99) * 1000, 2),
+                "mean_ms": round(statistics.fmean(values) * 1000, 2),
+            }
+        return out
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+# --- RUNNER ---
+
+def _seed_watchlist(n: int):
+    backend.init_db()
+    conn = db.get_connection()
+    try:
+        conn.execute("DELETE FROM watchlist")
+        conn.executemany(
+            "INSERT INTO watchlist (food_item, location) VALUES (?, ?)",
+            [(f"Dish {i}", f"Area {i % 50}") for i in range(n)]
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+def run_benchmark(targets: int = 100, mode: str = "sentinel", time_scale: float = 1.0,
+                  search_ms: float = 800, llm_ms: float = 2500, rate_429: float = 0.0,
+                  hit_chars: int = 1500, restaurant_pool: Optional[int] = None,
+                  batch_size: int = 1, tavily_concurrency: Optional[int] = None,
+                  gemini_concurrency: Optional[int] = None, hedge: bool = False, seed: int = 0,
+                  verbose: bool = False) -> dict:
+    """Runs one scenario on a scratch DB and returns the report dict."""
+    stats = StageStats()
+    tavily_up = Upstream("tavily", search_ms, rate_429=rate_429, time_scale=time_scale, seed=seed)
+    gemini_up = Upstream("gemini", llm_ms, rate_429=rate_429, time_scale=time_scale, seed=seed + 1)
+    fake_tavily = FakeTavily(tavily_up, hit_chars, min(restaurant_pool or targets * 3, 4000))
+    fake_gemini = FakeGemini(gemini_up, stats)
+    # Fakes don't have quotas; only simulated 429s should slow things down
+    unlimited = {service: {"rpm": 10 ** 9, "tpm": None} for service in quota.LIMITS}
+    scaled_backoff = quota.backoff_delay
+    # Fresh latency stats and closed breakers for every scenario
+    router.reset()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        with patch.object(db, "DB_PATH", os.path.join(scratch, "bench.db")), \
+             patch.dict(quota.LIMITS, unlimited), \
+             patch.object(quota, "backoff_delay", lambda attempt: scaled_backoff(attempt) * time_scale), \
+             patch.object(clients, "TavilySearch", fake_tavily), \
+             patch.object(backend.genai, "Client", fake_gemini), \
+             patch.object(router, "HEDGE", hedge), \
+             patch.object(router, "HEDGE_MIN_DELAY", router.HEDGE_MIN_DELAY * time_scale), \
+             patch.object(backend, "TAVILY_API_KEY", "bench"), \
+             patch.object(backend, "GOOGLE_API_KEY", "bench"), \
+             patch.object(backend, "search_sources", stats.wrap("search", backend.search_sources)), \
+             patch.object(backend, "analyze_hits", stats.wrap("extract", backend.analyze_hits, outermost_only=True)), \
+             patch.object(backend, "analyze_batch", stats.wrap("extract", backend.analyze_batch, outermost_only=True)), \
+             patch.object(backend, "save_restaurants", stats.wrap("save", backend.save_restaurants)):
+            _seed_watchlist(targets)
+            log = io.StringIO()
+            out = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(log)
+
+            start = time.perf_counter()
+            with out:
+                if mode == "sentinel":
+                    discoveries = asyncio.run(sentinel.run_sentinel_async(
+                        tavily_concurrency=tavily_concurrency,
+                        gemini_concurrency=gemini_concurrency,
+                        batch_size=batch_size,
+                    ))
+                else:
+                    discoveries = 0
+                    for target in backend.get_watchlist():
+                        found = backend.search_and_analyze(target["food_item"], target["location"])
+                        discoveries += sum(1 for _, o in backend.save_restaurants(found) if o == "inserted")
+            elapsed = time.perf_counter() - start
+            rows_written = backend.count_restaurants()
+
+    api_calls = tavily_up.calls + gemini_up.calls
+    saves = stats.samples.get("save", [])
+    return {
+        "scenario": {
+            "targets": targets, "mode": mode, "time_scale": time_scale, "search_ms": search_ms,
+            "llm_ms": llm_ms, "rate_429": rate_429, "hit_chars": hit_chars, "batch_size": batch_size,
+            "hedge": hedge,
+        },
+        "elapsed_s": round(elapsed, 3),
+        "targets_per_min": round(targets / elapsed * 60, 1),
+        "discoveries": discoveries,
+        "api_calls": {"tavily": tavily_up.calls, "gemini": gemini_up.calls,
+                      "tavily_429": tavily_up.errors, "gemini_429": gemini_up.errors},
+        "api_calls_per_discovery": round(api_calls / discoveries, 3) if discoveries else None,
+        "db_rows_written": rows_written,
+        "db_writes_per_s": round(rows_written / elapsed, 1),
+        "db_save_calls_per_s": round(len(saves) / sum(saves), 1) if saves else None,
+        "stages": stats.summary(),
+        "models": router.get_stats(),
+    }
+
+# --- BASELINES ---
+
+def scenario_key(report: dict) -> str:
+    s = report["scenario"]
+    key = f"{s['mode']}:{s['targets']}:b{s['batch_size']}:429={s['rate_429']}:x{s['time_scale']}"
+    return key + ":hedge" if s.get("hedge") else key
+
+def load_baselines(path: str = BASELINE_PATH) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def save_baseline(report: dict, path: str = BASELINE_PATH):
+    baselines = load_baselines(path)
+    baselines[scenario_key(report)] = report
+    with open(path, "w") as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+
+def compare(report: dict, baseline: dict) -> List[str]:
+    """Human-readable regressions of `report` against `baseline` (empty list = fine)."""
+    problems = []
+    if report["targets_per_min"] < baseline["targets_per_min"] * (1 - REGRESSION_TOLERANCE):
+        problems.append(f"throughput {report['targets_per_min']} < baseline {baseline['targets_per_min']} targets/min")
+    for stage, numbers in report["stages"].items():
+        old = baseline["stages"].get(stage)
+        if old and numbers["p95_ms"] > old["p95_ms"] * (1 + REGRESSION_TOLERANCE) and numbers["p95_ms"] - old["p95_ms"] > 1:
+            problems.append(f"{stage} p95 {numbers['p95_ms']}ms > baseline {old['p95_ms']}ms")
+    old_cpd, new_cpd = baseline.get("api_calls_per_discovery"), report.get("api_calls_per_discovery")
+    if old_cpd and new_cpd and new_cpd > old_cpd * (1 + REGRESSION_TOLERANCE):
+        problems.append(f"API calls per discovery {new_cpd} > baseline {old_cpd}")
+    return problems
+
+def print_report(report: dict):
+    print(f"\n📊 {scenario_key(report)}")
+    print(f"   {report['targets_per_min']} targets/min ({report['elapsed_s']}s), "
+          f"{report['discoveries']} discoveries, {report['api_calls_per_discovery']} API calls/discovery")
+    print(f"   API calls: {report['api_calls']}")
+    print(f"   DB: {report['db_rows_written']} rows, {report['db_writes_per_s']} rows/s")
+    for stage, n in report["stages"].items():
+        print(f"   {stage:<8} n={n['count']:<6} p50={n['p50_ms']}ms p95={n['p95_ms']}ms p99={n['p99_ms']}ms")
+    for model, m in report.get("models", {}).items():
+        if m["calls"]:
+            print(f"   {model}: {m['calls']} calls, {m['errors'] + m['rate_limited']} failed, "
+                  f"{m['hedges']} hedged ({m['hedge_wins']} won), p95={m['p95_ms']}ms, circuit {m['state']}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline sentinel benchmark with fake Tavily/Gemini")
+    parser.add_argument("--targets", type=int, nargs="+", default=[10, 100, 1000],
+                        help="watchlist sizes to run (10 to 10000)")
+    parser.add_argument("--mode", choices=["sentinel", "search_and_analyze"], default="sentinel")
+    parser.add_argument("--time-scale", type=float, default=0.01,
+                        help="multiplier on simulated latencies (1.0 = real-world speed)")
+    parser.add_argument("--search-ms", type=float, default=800, help="median fake Tavily latency")
+    parser.add_argument("--llm-ms", type=float, default=2500, help="median fake Gemini latency")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="fraction of calls answered with 429")
+    parser.add_argument("--hit-chars", type=int, default=1500, help="size of each fake search hit")
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--tavily-concurrency", type=int)
+    parser.add_argument("--gemini-concurrency", type=int)
+    parser.add_argument("--hedge", action="store_true", help="hedge slow Gemini calls (see router.py)")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--json", action="store_true", help="print the raw report as JSON")
+    parser.add_argument("--verbose", action="store_true", help="keep the pipeline's own log output")
+    args = parser.parse_args(argv)
+
+    baselines = load_baselines()
+    regressions = 0
+    for n in args.targets:
+        report = run_benchmark(
+            targets=n, mode=args.mode, time_scale=args.time_scale, search_ms=args.search_ms,
+            llm_ms=args.llm_ms, rate_429=args.rate_429, hit_chars=args.hit_chars,
+            batch_size=args.batch_size, tavily_concurrency=args.tavily_concurrency,
+            gemini_concurrency=args.gemini_concurrency, hedge=args.hedge, verbose=args.verbose,
+        )
+        print(json.dumps(report, indent=2) if args.json else "", end="")
+        print_report(report)
+
+        baseline = baselines.get(scenario_key(report))
+        if args.save_baseline:
+            save_baseline(report)
+            print("   💾 Saved as baseline.")
+        elif baseline:
+            problems = compare(report, baseline)
+            regressions += len(problems)
+            for p in problems:
+                print(f"   ⚠️ REGRESSION: {p}")
+            if not problems:
+                print("   ✅ Within baseline.")
+        else:
+            print("   ℹ️ No baseline for this scenario yet (record one with --save-baseline).")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,123 @@
+import os
+import threading
+from typing import Any, Callable, Hashable
+import lazy
+
+# Loaded on first use (see lazy.py)
+requests = lazy.module("requests")
+genai = lazy.module("google.genai")
+
+# Connections kept open per host (sentinel threads + agents share them)
+POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "16"))
+
+# --- TAVILY OVER KEEP-ALIVE ---
+# The Tavily SDK posts through the module-level requests.post(), which opens
+# a new TCP + TLS connection every call and has no hook for a Session. We only
+# use its /search endpoint, so this thin client calls it over one pooled
+# keep-alive Session of our own instead.
+TAVILY_URL = os.getenv("TAVILY_URL", "https://api.tavily.com")
+TAVILY_TIMEOUT = 60  # seconds, same as the SDK
+
+_session = None
+_session_lock = threading.Lock()
+
+def _http():
+    """The shared Session (created on first use)."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            session.mount("https://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE))
+            _session = session
+        return _session
+
+class TavilySearch:
+    """Drop-in for TavilyClient.search(), over the shared keep-alive Session."""
+
+    def __init__(self, api_key: str = None):
+        if not api_key:
+            raise ValueError("No Tavily API key (set TAVILY_API_KEY)")
+        self.api_key = api_key
+
+    def search(self, query: str, timeout: float = TAVILY_TIMEOUT, **params) -> dict:
+        payload = {"query": query, **{k: v for k, v in params.items() if v is not None}}
+        response = _http().post(f"{TAVILY_URL}/search", json=payload, timeout=timeout,
+                                headers={"Authorization": f"Bearer {self.api_key}"})
+        if response.status_code != 200:
+            # Keep Tavily's own explanation; the status stays in the message for quota.is_quota_error
+            try:
+                detail = response.json().get("detail", {}).get("error")
+            except (ValueError, AttributeError):
+                detail = None
+            raise requests.HTTPError(f"{response.status_code} from Tavily: {detail or response.reason}",
+                                     response=response)
+        return response.json()
+
+# --- SHARED CLIENTS ---
+# One long-lived client per (class, api key). Keyed on the class too, so a
+# test that patches TavilySearch/genai.Client gets its mock, not a stale client.
+_clients = {}
+_clients_lock = threading.Lock()
+
+def _get(factory, api_key: str):
+    key = (factory, api_key)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = factory(api_key=api_key)
+        return client
+
+def tavily_client(api_key: str = None) -> TavilySearch:
+    """The shared Tavily client."""
+    return _get(TavilySearch, api_key or os.getenv("TAVILY_API_KEY"))
+
+def gemini_client(api_key: str = None) -> "genai.Client":
+    """The shared Gemini client (its httpx pool keeps connections alive)."""
+    return _get(genai.Client, api_key or os.getenv("GOOGLE_API_KEY"))
+
+def reset():
+    """Drops the cached clients (e.g. after rotating keys)."""
+    with _clients_lock:
+        _clients.clear()
+
+# --- SINGLEFLIGHT ---
+# Concurrent calls with the same key share ONE upstream request: the first
+# caller does the work, the others wait and get the same result (or error).
+# The result object is shared, so callers must treat it as read-only.
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+_inflight = {}
+_inflight_lock = threading.Lock()
+STATS = {"leaders": 0, "shared": 0}
+
+def singleflight(key: Hashable, fn: Callable[[], Any]) -> Any:
+    with _inflight_lock:
+        call = _inflight.get(key)
+        leader = call is None
+        if leader:
+            call = _inflight[key] = _Call()
+            STATS["leaders"] += 1
+        else:
+            STATS["shared"] += 1
+
+    if not leader:
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    try:
+        call.result = fn()
+        return call.result
+    except BaseException as e:
+        call.error = e
+        raise
+    finally:
+        with _inflight_lock:
+            del _inflight[key]
+        call.done.set()
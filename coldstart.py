@@ -0,0 +1,146 @@
+# Cold-start benchmark for the processes that start fresh all the time:
+# the MCP servers (one per client session), the dashboard and the sentinel.
+#
+# Each scenario runs in a new interpreter under `python -X importtime`: it
+# imports the entry module, then makes the first call a user would wait on
+# (e.g. the first MCP tool response). It fails if that takes longer than the
+# budget, or if an SDK that the call never uses got imported.
+#
+#   python coldstart.py                 # all scenarios, against the budgets
+#   python coldstart.py food_agent --top 15   # plus its 15 slowest packages
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# SDKs that must stay lazy: nothing measured here calls Gemini, Tavily, the similarity index or the snapshots
+HEAVY_MODULES = ["google.genai", "requests", "numpy", "pyarrow"]
+
+# name -> (module, first call, budget in ms from process start to first response)
+SCENARIOS = {
+    "food_agent": ("food_agent", "food_agent.check_my_food_history('ramen', 'Markham')", 1500),
+    "mcp_agent": ("mcp_agent", "mcp_agent.analyze_hype_level('You won\\'t believe this!')", 1500),
+    "backend": ("backend", "backend.get_neighborhoods()", 400),
+    "sentinel": ("sentinel", "sentinel.backend.get_watchlist()", 400),
+}
+
+_CHILD = '''
+import json, sys, time
+start = time.perf_counter()
+import {module}
+imported = time.perf_counter()
+{call}
+done = time.perf_counter()
+print(json.dumps({{"import_ms": (imported - start) * 1000, "call_ms": (done - imported) * 1000,
+                  "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+'''
+
+_IMPORTTIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+def parse_importtime(stderr: str) -> List[dict]:
+    """`-X importtime` lines as [{module, self_ms, cumulative_ms, depth}]."""
+    rows = []
+    for line in stderr.splitlines():
+        m = _IMPORTTIME.match(line)
+        if m:
+            rows.append({"module": m.group(4), "self_ms": int(m.group(1)) / 1000,
+                         "cumulative_ms": int(m.group(2)) / 1000, "depth": len(m.group(3)) // 2})
+    return rows
+
+def run_once(module: str, call: str, db_path: str) -> dict:
+    """One fresh interpreter: wall time to first response, plus the child's own timings."""
+    env = {**os.environ, "FOODIE_DB_PATH": db_path, "PYTHONDONTWRITEBYTECODE": "1"}
+    code = _CHILD.format(module=module, call=call, heavy=HEAVY_MODULES)
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, env=env,
+                          capture_output=True, text=True, timeout=120)
+    wall_ms = (time.perf_counter() - start) * 1000
+    if proc.returncode != 0:
+        raise RuntimeError(f"{module} failed to start:\n{proc.stderr[-2000:]}")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["wall_ms"] = wall_ms
+    result["imports"] = parse_importtime(proc.stderr)
+    return result
+
+def measure(name: str, runs: int = 3) -> dict:
+    """
+    Median over `runs` starts. The first start also sets up a new DB; the
+    later ones reuse it, like every session after the first.
+    """
+    module, call, budget_ms = SCENARIOS[name]
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "foodie_memory.db")
+        results = [run_once(module, call, db_path) for _ in range(runs)]
+
+    slowest = max(results, key=lambda r: r["wall_ms"])
+    return {
+        "scenario": name,
+        "budget_ms": budget_ms,
+        "first_response_ms": round(statistics.median(r["wall_ms"] for r in results), 1),
+        "import_ms": round(statistics.median(r["import_ms"] for r in results), 1),
+        "call_ms": round(statistics.median(r["call_ms"] for r in results), 1),
+        "cold_db_ms": round(results[0]["wall_ms"], 1),
+        "heavy_modules": sorted({m for r in results for m in r["heavy"]}),
+        "slowest_packages": by_package(slowest["imports"]),
+    }
+
+def by_package(imports: List[dict]) -> List[tuple]:
+    """Import time per top-level package ([(package, ms)], slowest first): self times summed, so nothing is counted twice."""
+    totals: Dict[str, float] = {}
+    for i in imports:
+        package = i["module"].split(".")[0]
+        totals[package] = totals.get(package, 0.0) + i["self_ms"]
+    return sorted(((p, round(ms, 1)) for p, ms in totals.items()), key=lambda t: -t[1])
+
+def check(report: dict) -> List[str]:
+    """Budget problems in a report (empty = OK)."""
+    problems = []
+    if report["first_response_ms"] > report["budget_ms"]:
+        problems.append(f"first response took {report['first_response_ms']:.0f}ms "
+                        f"(budget {report['budget_ms']}ms)")
+    if report["heavy_modules"]:
+        problems.append(f"imported {', '.join(report['heavy_modules'])} without needing it")
+    return problems
+
+def print_report(report: dict, top: int = 0):
+    print(f"\n🚀 {report['scenario']}: first response in {report['first_response_ms']:.0f}ms "
+          f"(import {report['import_ms']:.0f}ms + call {report['call_ms']:.0f}ms, "
+          f"new DB {report['cold_db_ms']:.0f}ms) · budget {report['budget_ms']}ms")
+    for package, ms in report["slowest_packages"][:top]:
+        print(f"   {ms:8.1f}ms  {package}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cold-start benchmark for the MCP servers, dashboard backend and sentinel")
+    parser.add_argument("scenarios", nargs="*", help=f"which to run: {', '.join(SCENARIOS)} (default: all)")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=0, help="list the N slowest packages to import")
+    parser.add_argument("--json", action="store_true", help="print the raw reports as JSON")
+    args = parser.parse_args(argv)
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+
+    failures = 0
+    for name in args.scenarios or list(SCENARIOS):
+        report = measure(name, runs=args.runs)
+        if args.json:
+            print(json.dumps(report, indent=2))
+        print_report(report, top=args.top)
+        problems = check(report)
+        failures += len(problems)
+        for p in problems:
+            print(f"   ⚠️ OVER BUDGET: {p}")
+        if not problems:
+            print("   ✅ Within budget.")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,124 @@
+import os
+import re
+from typing import List, Optional
+import quota
+
+# --- PROMPT BUDGET ---
+# Max tokens of search context pasted into one extraction prompt (per target)
+TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "1500"))
+# Sentences whose word sets overlap this much (Jaccard) count as the same sentence
+NEAR_DUP_THRESHOLD = 0.8
+# tiktoken encoding used for counting. Gemini's own tokenizer differs a little,
+# but this is close enough for budgeting.
+ENCODING_NAME = "cl100k_base"
+
+# Tokens saved / spent in this process (see get_stats)
+STATS = {"calls": 0, "raw_tokens": 0, "compacted_tokens": 0, "tokens_in": 0, "tokens_out": 0}
+
+# Sentences that are page furniture, not food writing (careful: 'cookies' alone is food)
+_BOILERPLATE = re.compile(
+    r"\b(cookie (policy|settings|preferences)|uses? cookies|accept (all )?cookies|"
+    r"privacy policy|terms of (use|service)|all rights reserved|subscribe|newsletter|"
+    r"sign (up|in)|log ?in|click here|read more|advertisement|sponsored|share (this|on)|"
+    r"follow us|related (posts|articles)|skip to (main )?content|javascript)\b|©",
+    re.IGNORECASE
+)
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+|\n+")
+_WORD = re.compile(r"[a-z0-9']+")
+# Capitalized words and numbers: the parts of a sentence that name a place
+_NAME_TOKEN = re.compile(r"\b(?:[A-Z][\w'&-]*|\d+)\b")
+# Words that suggest a sentence is actually recommending a place
+_SIGNAL_WORDS = {"best", "favourite", "favorite", "must", "try", "recommend", "delicious", "authentic",
+                 "opened", "new", "spot", "restaurant", "menu", "serves", "order", "located"}
+
+_encoding = None
+
+def count_tokens(text: str) -> int:
+    """Token count via tiktoken. Falls back to the ~4 chars/token estimate if the encoding can't load."""
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding(ENCODING_NAME)
+        except Exception as e:
+            # tiktoken downloads the encoding on first use; offline machines can't
+            print(f"   ⚠️ tiktoken unavailable ({type(e).__name__}). Estimating tokens instead.")
+            _encoding = False
+    if _encoding is False:
+        return quota.estimate_tokens(text)
+    return len(_encoding.encode(text, disallowed_special=()))
+
+def _words(text: str) -> set:
+    return set(_WORD.findall(text.lower()))
+
+def _relevance(words: set, query: set, position: int) -> float:
+    """Query-term hits count most, then recommendation words, then being early in the article."""
+    return 3 * len(words & query) + len(words & _SIGNAL_WORDS) + 1.0 / (1 + position)
+
+def compact_hits(hits: List[dict], food_item: str, location: str,
+                 budget: Optional[int] = None) -> List[dict]:
+    """
+    Shrinks search hits to fit `budget` tokens before they go into a prompt:
+      1. drops boilerplate sentences (cookie banners, "subscribe", nav text...)
+      2. drops near-duplicate sentences repeated across sources
+      3. keeps the sentences most relevant to the dish and location until the
+         budget is full, then puts them back in their original order
+    Returns hits of the same shape (title/content), minus any left empty.
+    """
+    budget = budget or TOKEN_BUDGET
+    query = _words(f"{food_item} {location}")
+
+    sentences = []  # (hit_index, position, text, tokens, score)
+    kept_word_sets = []
+    total_sentences = 0
+    for hit_index, hit in enumerate(hits):
+        for position, sentence in enumerate(_SENTENCE_SPLIT.split(hit.get('content') or '')):
+            sentence = " ".join(sentence.split())
+            total_sentences += 1 if sentence else 0
+            words = _words(sentence)
+            if not words or _BOILERPLATE.search(sentence):
+                continue
+            # Same wording about a DIFFERENT place ("X is great" / "Y is great") is not a duplicate
+            names = set(_NAME_TOKEN.findall(sentence))
+            if any(len(words & seen) / len(words | seen) >= NEAR_DUP_THRESHOLD and names <= seen_names
+                   for seen, seen_names in kept_word_sets):
+                continue
+            kept_word_sets.append((words, names))
+            sentences.append((hit_index, position, sentence, count_tokens(sentence) + 1,
+                              _relevance(words, query, position)))
+
+    # Titles are always sent; they're short and name the source
+    used = sum(count_tokens(f"Source: {h.get('title') or ''}\nContent: ") for h in hits)
+    chosen = []
+    for sentence in sorted(sentences, key=lambda s: -s[4]):
+        if used + sentence[3] > budget:
+            continue
+        used += sentence[3]
+        chosen.append(sentence)
+    chosen.sort(key=lambda s: (s[0], s[1]))
+
+    compacted = []
+    for hit_index, hit in enumerate(hits):
+        content = " ".join(s[2] for s in chosen if s[0] == hit_index)
+        if content:
+            compacted.append({**hit, 'content': content})
+
+    raw_tokens = sum(count_tokens(h.get('content') or '') for h in hits)
+    kept_tokens = sum(count_tokens(h['content']) for h in compacted)
+    STATS["raw_tokens"] += raw_tokens
+    STATS["compacted_tokens"] += kept_tokens
+    print(f"   ✂️  Context for {food_item}: {raw_tokens} -> {kept_tokens} tokens "
+          f"({len(chosen)} of {total_sentences} sentences)")
+    return compacted
+
+def record_call(tokens_in: int, tokens_out: int):
+    """Counts one LLM call's prompt and response tokens."""
+    STATS["calls"] += 1
+    STATS["tokens_in"] += tokens_in
+    STATS["tokens_out"] += tokens_out
+
+def get_stats() -> dict:
+    """Token counters for this process, plus how much compaction saved."""
+    saved = STATS["raw_tokens"] - STATS["compacted_tokens"]
+    ratio = saved / STATS["raw_tokens"] if STATS["raw_tokens"] else 0.0
+    return {**STATS, "saved_tokens": saved, "saved_ratio": round(ratio, 3)}
@@ -0,0 +1,11 @@
+import os
+import sqlite3
+
+# One database file shared by the sentinel, the dashboard and the MCP agents.
+# FOODIE_DB_PATH lets tests and benchmarks point everything at a scratch file.
+current_dir = os.path.dirname(os.path.abspath(__file__))
+DB_PATH = os.getenv("FOODIE_DB_PATH", os.path.join(current_dir, "foodie_memory.db"))
+
+def get_connection() -> sqlite3.Connection:
+    """Opens the shared DB. Waits up to 30s (instead of failing) while another process writes."""
+    return sqlite3.connect(DB_PATH, timeout=30)
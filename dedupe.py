@@ -0,0 +1,226 @@
+import re
+import math
+import unicodedata
+from typing import List, Optional, Set
+
+# Two names are the same place when their trigram sets overlap this much (Jaccard)
+MATCH_THRESHOLD = 0.75
+# Max candidates pulled from the blocking index per lookup
+MAX_CANDIDATES = 20
+
+# Words that don't help tell restaurants apart
+_FILLER_WORDS = {"the", "restaurant", "restaurants", "resto", "inc", "ltd"}
+
+def normalize_name(name: str, neighborhood: Optional[str] = None) -> str:
+    """
+    'PIZZA NOVA (Markham)', 'Pizza Nova - Markham' and 'pizza nova' all become 'pizza nova'.
+    Strips accents, case, parentheticals, punctuation, filler words and a
+    trailing neighborhood name.
+    """
+    text = unicodedata.normalize("NFKD", name or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).casefold()
+    text = re.sub(r"\(.*?\)", " ", text)
+    text = text.replace("&", " and ")
+    words = [w for w in re.sub(r"[^\w\s]", " ", text).split() if w not in _FILLER_WORDS]
+
+    if neighborhood and len(words) > 1:
+        hood = normalize_name(neighborhood).split()
+        if hood and words[-len(hood):] == hood and len(words) > len(hood):
+            words = words[:-len(hood)]
+    return " ".join(words)
+
+def name_grams(normalized: str) -> Set[str]:
+    """Character trigrams of a normalized name (padded so short names still get grams)."""
+    padded = f"  {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def init_index(conn):
+    """Creates the blocking index tables and keeps them in step with restaurants."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS restaurant_keys (
+            restaurant_id INTEGER PRIMARY KEY,
+            norm_name TEXT,
+            gram_count INTEGER
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_restaurant_keys_norm ON restaurant_keys(norm_name)")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS restaurant_grams (
+            gram TEXT,
+            restaurant_id INTEGER,
+            PRIMARY KEY (gram, restaurant_id)
+        ) WITHOUT ROWID
+    ''')
+    # Rows that still need (re-)indexing. Normalizing is Python, so triggers can't
+    # do it; they queue the id instead, and index_pending runs before every match.
+    conn.execute("CREATE TABLE IF NOT EXISTS restaurant_keys_pending (restaurant_id INTEGER PRIMARY KEY)")
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS restaurants_dedupe_insert AFTER INSERT ON restaurants BEGIN
+            INSERT OR IGNORE INTO restaurant_keys_pending (restaurant_id) VALUES (new.id);
+        END
+    ''')
+    # Deleted rows drop out of the index; renamed rows drop out and get queued
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS restaurants_dedupe_delete AFTER DELETE ON restaurants BEGIN
+            DELETE FROM restaurant_keys WHERE restaurant_id = old.id;
+            DELETE FROM restaurant_grams WHERE restaurant_id = old.id;
+            DELETE FROM restaurant_keys_pending WHERE restaurant_id = old.id;
+        END
+    ''')
+    conn.execute("DROP TRIGGER IF EXISTS restaurants_dedupe_rename")
+    conn.execute('''
+        CREATE TRIGGER restaurants_dedupe_rename AFTER UPDATE OF name, neighborhood ON restaurants BEGIN
+            DELETE FROM restaurant_keys WHERE restaurant_id = old.id;
+            DELETE FROM restaurant_grams WHERE restaurant_id = old.id;
+            INSERT OR IGNORE INTO restaurant_keys_pending (restaurant_id) VALUES (new.id);
+        END
+    ''')
+
+def index_name(conn, restaurant_id: int, name: str, neighborhood: Optional[str] = None):
+    """Adds one restaurant to the blocking index."""
+    normalized = normalize_name(name, neighborhood)
+    grams = name_grams(normalized)
+    conn.execute(
+        "INSERT OR REPLACE INTO restaurant_keys (restaurant_id, norm_name, gram_count) VALUES (?, ?, ?)",
+        (restaurant_id, normalized, len(grams))
+    )
+    conn.executemany(
+        "INSERT OR IGNORE INTO restaurant_grams (gram, restaurant_id) VALUES (?, ?)",
+        [(g, restaurant_id) for g in grams]
+    )
+    conn.execute("DELETE FROM restaurant_keys_pending WHERE restaurant_id = ?", (restaurant_id,))
+
+def index_pending(conn) -> int:
+    """Indexes the rows the triggers queued (inserted or renamed by anyone, e.g. the sqlite3 shell)."""
+    rows = conn.execute('''
+        SELECT r.id, r.name, r.neighborhood FROM restaurant_keys_pending p
+        JOIN restaurants r ON r.id = p.restaurant_id
+    ''').fetchall()
+    for restaurant_id, name, neighborhood in rows:
+        index_name(conn, restaurant_id, name, neighborhood)
+    return len(rows)
+
+def index_missing(conn) -> int:
+    """Indexes restaurants that aren't in the blocking index yet (rows from before it existed)."""
+    rows = conn.execute('''
+        SELECT id, name, neighborhood FROM restaurants
+        WHERE id NOT IN (SELECT restaurant_id FROM restaurant_keys)
+    ''').fetchall()
+    for restaurant_id, name, neighborhood in rows:
+        index_name(conn, restaurant_id, name, neighborhood)
+    return len(rows)
+
+def find_match(conn, name: str, neighborhood: Optional[str] = None,
+               threshold: float = MATCH_THRESHOLD, exclude_id: Optional[int] = None) -> Optional[int]:
+    """
+    Returns the id of an existing restaurant that is (nearly) the same place, or None.
+    Exact normalized-name hits come straight from an index. Otherwise only the
+    handful of rows sharing one of the name's RAREST trigrams are scored
+    (prefix filtering: any name with Jaccard >= threshold must share at least
+    one of them), so the cost doesn't grow with the table.
+    """
+    normalized = normalize_name(name, neighborhood)
+    if not normalized:
+        return None
+
+    row = conn.execute(
+        "SELECT restaurant_id FROM restaurant_keys WHERE norm_name = ? AND restaurant_id IS NOT ? ORDER BY restaurant_id LIMIT 1",
+        (normalized, exclude_id)
+    ).fetchone()
+    if row:
+        return row[0]
+
+    grams = sorted(name_grams(normalized))
+    placeholders = ",".join("?" * len(grams))
+    doc_freq = dict(conn.execute(
+        f"SELECT gram, COUNT(*) FROM restaurant_grams WHERE gram IN ({placeholders}) GROUP BY gram", grams
+    ).fetchall())
+    grams_by_rarity = sorted(grams, key=lambda g: doc_freq.get(g, 0))
+    probe = grams_by_rarity[:len(grams) - math.ceil(threshold * len(grams)) + 1]
+
+    # Rows sharing the most probe grams first, so a common gram can't crowd out the real match
+    probe_marks = ",".join("?" * len(probe))
+    candidates = [r[0] for r in conn.execute(f'''
+        SELECT restaurant_id FROM restaurant_grams WHERE gram IN ({probe_marks}) AND restaurant_id IS NOT ?
+        GROUP BY restaurant_id ORDER BY COUNT(*) DESC, restaurant_id LIMIT ?
+    ''', probe + [exclude_id, MAX_CANDIDATES])]
+    if not candidates:
+        return None
+
+    # Exact Jaccard for the few candidates
+    cand_marks = ",".join("?" * len(candidates))
+    best_id, best_score = None, 0.0
+    for restaurant_id, shared, gram_count in conn.execute(f'''
+        SELECT g.restaurant_id, COUNT(*), k.gram_count
+        FROM restaurant_grams g JOIN restaurant_keys k ON k.restaurant_id = g.restaurant_id
+        WHERE g.restaurant_id IN ({cand_marks}) AND g.gram IN ({placeholders})
+        GROUP BY g.restaurant_id
+    ''', candidates + grams):
+        score = shared / (len(grams) + gram_count - shared)
+        if score > best_score:
+            best_id, best_score = restaurant_id, score
+    return best_id if best_score >= threshold else None
+
+def compact(conn) -> List[tuple]:
+    """
+    One-off merge of near-duplicate rows already in the table.
+    Keeps the oldest row of each group, takes the best-confidence rating and
+    merges distinct notes into it, and deletes the rest.
+    Returns [(kept_name, merged_name)]. Caller owns the transaction.
+    """
+    index_missing(conn)
+    index_pending(conn)
+    merged = []
+    rows = conn.execute(
+        "SELECT id, name, neighborhood, taste_rating, notes, confidence_score FROM restaurants ORDER BY id"
+    ).fetchall()
+    for dup_id, name, neighborhood, rating, notes, confidence in rows:
+        keep_id = find_match(conn, name, neighborhood, exclude_id=dup_id)
+        if keep_id is None or keep_id > dup_id:
+            continue  # the later row will find this one instead
+        merged.append((merge_into(conn, keep_id, dup_id), name))
+    return merged
+
+def merge_into(conn, keep_id: int, dup_id: int) -> str:
+    """
+    Folds row dup_id into keep_id: the best-confidence rating wins (a missing
+    one is filled in), distinct notes are appended, and the duplicate is
+    deleted. Returns the kept name.
+    """
+    keep_name, keep_rating, keep_notes, keep_confidence = conn.execute(
+        "SELECT name, taste_rating, notes, confidence_score FROM restaurants WHERE id = ?", (keep_id,)
+    ).fetchone()
+    rating, notes, confidence = conn.execute(
+        "SELECT taste_rating, notes, confidence_score FROM restaurants WHERE id = ?", (dup_id,)
+    ).fetchone()
+    if (confidence or 0) > (keep_confidence or 0) or (keep_rating is None and rating is not None):
+        keep_rating, keep_confidence = rating, confidence
+    if notes and notes not in (keep_notes or ""):
+        keep_notes = f"{keep_notes} | {notes}" if keep_notes else notes
+
+    conn.execute("DELETE FROM restaurants WHERE id = ?", (dup_id,))
+    conn.execute(
+        "UPDATE restaurants SET taste_rating = ?, notes = ?, confidence_score = ? WHERE id = ?",
+        (keep_rating, keep_notes, keep_confidence, keep_id)
+    )
+    return keep_name
+
+def merge_same_names(conn) -> int:
+    """
+    Merges rows with exactly the same name into the oldest one, so the name
+    can get a unique index. Returns how many rows were folded in.
+    """
+    rows = conn.execute('''
+        SELECT r.id, first.id FROM restaurants r
+        JOIN (SELECT name, MIN(id) AS id FROM restaurants GROUP BY name HAVING COUNT(*) > 1) first
+          ON first.name = r.name
+        WHERE r.id != first.id ORDER BY r.id
+    ''').fetchall()
+    for dup_id, keep_id in rows:
+        merge_into(conn, keep_id, dup_id)
+    return len(rows)
+
+if __name__ == "__main__":
+    import backend
+    for kept, dup in backend.compact_duplicates():
+        print(f"   🔗 Merged '{dup}' into '{kept}'")
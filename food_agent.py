@@ -1,10 +1,12 @@
 import os
-import sqlite3
 from typing import Literal, List, Dict
 from dotenv import load_dotenv
 from mcp.server.fastmcp import FastMCP
-from tavily import TavilyClient
 from pydantic import BaseModel, Field
+import search_cache
+import clients
+import backend
+import db
 
 # 1. SETUP
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -14,26 +16,14 @@ API_KEY = os.getenv("TAVILY_API_KEY")
 
 # DATABASE SETUP
 # This creates a file 'foodie_memory.db' in your folder.
-DB_PATH = os.path.join(current_dir, "foodie_memory.db")
+DB_PATH = db.DB_PATH
 
 def init_db():
-    """Creates the table if it doesn't exist."""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS restaurants (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT UNIQUE,
-            neighborhood TEXT,
-            taste_rating INTEGER,
-            notes TEXT
-        )
-    ''')
-    conn.commit()
-    conn.close()
-
-# Initialize DB on startup
-init_db()
+    """Creates the table if it doesn't exist (same schema the sentinel uses)."""
+    backend.init_db()
+
+# No init_db() at import: the backend sets the schema up on the first tool
+# call, and only if this DB isn't at the current schema version yet.
 
 mcp = FastMCP("Markham Foodie Agent")
 
@@ -46,24 +36,70 @@ class RestaurantReview(BaseModel):
 
 # --- TOOL 1: THE MEMORY CHECK ---
 @mcp.tool()
-def check_my_food_history() -> str:
+def check_my_food_history(dish: str = "", location: str = "", limit: int = 10) -> str:
     """
-    Checks the local database to see what restaurants the user has already tracked.
+    Checks what we already know about a dish in a location: a short summary of
+    the neighborhood plus the `limit` most relevant remembered restaurants.
     Use this BEFORE searching to avoid repeating suggestions.
     """
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('SELECT name, taste_rating, notes FROM restaurants')
-    rows = cursor.fetchall()
-    conn.close()
-    
-    if not rows:
-        return "Memory is empty. No past restaurants found."
-    
-    history = "Here are the places we already know about:\n"
-    for row in rows:
-        history += f"- {row[0]}: Rated {row[1]}/10. Notes: {row[2]}\n"
-    return history
+    summaries = backend.get_neighborhood_summaries(location, limit=3)
+    rows = backend.recall_restaurants(dish, location, limit=limit)
+    if not summaries and not rows:
+        where = f" in {location}" if location else ""
+        return f"Memory has nothing{where} yet. No past restaurants found."
+
+    lines = []
+    for s in summaries:
+        avg = f", avg {s['avg_rating']}/10" if s["avg_rating"] is not None else ""
+        lines.append(f"{s['neighborhood'] or 'Unknown area'}: {s['restaurants']} places known{avg}. "
+                     f"Top: {', '.join(s['top'])}")
+    if rows:
+        lines.append(f"Most relevant places we already know{' for ' + dish if dish else ''}:")
+        for row in rows:
+            lines.append(f"- {row['name']} ({row['neighborhood']}): Rated {row['taste_rating']}/10. Notes: {row['notes']}")
+    return "\n".join(lines) + "\n"
+
+# --- TOOL 1b: THE MEMORY SEARCH ---
+@mcp.tool()
+def search_food_memory(query: str, limit: int = 5) -> str:
+    """
+    Full-text search over remembered restaurants AND the articles the sentinel has read.
+    Use this for specific questions like "hand-pulled noodles near Highway 7"
+    instead of dumping the whole history.
+    """
+    results = backend.search_memory(query, limit=limit)
+    if not results["restaurants"] and not results["snippets"]:
+        return f"Nothing in memory matches '{query}'."
+
+    lines = []
+    if results["restaurants"]:
+        lines.append("Known restaurants:")
+        for r in results["restaurants"]:
+            lines.append(f"- {r['name']} ({r['neighborhood']}): Rated {r['taste_rating']}/10. Notes: {r['notes']}")
+    if results["snippets"]:
+        lines.append("From articles we've read:")
+        for s in results["snippets"]:
+            lines.append(f"- {s['title']} ({s['url']}): {s['snippet']}")
+    return "\n".join(lines)
+
+# --- TOOL 1c: PLACES LIKE THIS ---
+@mcp.tool()
+def find_similar_places(place: str, limit: int = 5) -> str:
+    """
+    Finds remembered restaurants similar to a place we know (by name) or to a
+    description like "cheap late night congee". Runs locally, no web search.
+    Use this for "what else is like X?" questions.
+    """
+    found = backend.find_similar_restaurants(place, limit=limit)
+    if not found["results"]:
+        return f"Nothing in memory is similar to '{place}'."
+
+    like = found["match"]["name"] if found["match"] else f"'{place}'"
+    lines = [f"Places like {like}:"]
+    for r in found["results"]:
+        lines.append(f"- {r['name']} ({r['neighborhood']}): Rated {r['taste_rating']}/10, "
+                     f"similarity {r['score']:.2f}. Notes: {r['notes']}")
+    return "\n".join(lines)
 
 # --- TOOL 2: THE SCOUT (Web Search) ---
 @mcp.tool()
@@ -73,11 +109,12 @@ def search_new_spots(dish: str, location: str) -> str:
     Use 'check_my_food_history' first to know what to ignore.
     """
     if not API_KEY: return "Error: API Key missing."
-    client = TavilyClient(api_key=API_KEY)
+    client = clients.tavily_client(API_KEY)
 
     # Negative prompting to avoid generic lists
     query = f"best authentic {dish} in {location} reddit forum discussion -site:yelp.ca -site:tripadvisor.ca"
-    response = client.search(query, max_results=5)
+    # Cached + shares the Tavily budget with the sentinel
+    response = search_cache.search(client, query, max_results=5)
     
     results = []
     for r in response['results']:
@@ -91,18 +128,18 @@ def remember_restaurant(review: RestaurantReview) -> str:
     Saves a restaurant to the permanent database.
     Use this when you find a high-quality candidate worth remembering.
     """
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT OR IGNORE INTO restaurants (name, neighborhood, taste_rating, notes)
-            VALUES (?, ?, ?, ?)
-        ''', (review.name, review.neighborhood, review.taste_rating, review.notes))
-        conn.commit()
-        conn.close()
+    # Goes through the same writer as the sentinel, so 'PIZZA NOVA' or
+    # 'Pizza Nova (Markham)' is recognized as a place we already know.
+    outcome = backend.save_restaurant(backend.RestaurantCandidate(
+        review.name, review.neighborhood, review.taste_rating, review.notes, None
+    ))
+    if outcome == "inserted":
         return f"SUCCESS: I have memorized {review.name}."
-    except Exception as e:
-        return f"Error saving to DB: {e}"
+    if outcome == "updated":
+        return f"SUCCESS: I have updated my notes on {review.name}."
+    if outcome == "duplicate":
+        return f"ALREADY KNOWN: {review.name} is already in memory."
+    return "Error saving to DB. Check the server logs."
 
 if __name__ == "__main__":
     mcp.run()
\ No newline at end of file
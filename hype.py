@@ -0,0 +1,81 @@
+import re
+from typing import Dict, Iterable, List, Optional
+
+# 1. Define Hype Keywords (word -> points). Each word counts once per document.
+HYPE_WORDS = {
+    "revolutionary": 10,
+    "breakthrough": 10,
+    "agentic": 10,
+    "transform": 10,
+    "incredible": 10,
+    "boom": 10,
+    "future": 10,
+}
+MAX_SCORE = 100
+
+class HypeScorer:
+    """
+    Scores text for sensationalist language.
+    The lexicon is compiled ONCE into a single regex alternation, so a
+    document is scanned in one pass no matter how many keywords there are.
+
+    match controls word-boundary handling:
+      'prefix'    - keyword must start a word ("transform" hits "transformative")
+      'word'      - whole words only
+      'substring' - anywhere in the text (the original `in` check, keyword by
+                    keyword, so overlapping or nested keywords all count)
+    """
+    def __init__(self, weights: Optional[Dict[str, int]] = None, cap: int = MAX_SCORE, match: str = "prefix"):
+        self.weights = {w.lower(): points for w, points in (weights or HYPE_WORDS).items()}
+        self.cap = cap
+
+        # Longest first so a keyword is never shadowed by a shorter one it starts with.
+        # The lookahead on first letters lets the regex engine skip most positions
+        # without trying every alternative.
+        alternation = "|".join(re.escape(w) for w in sorted(self.weights, key=len, reverse=True))
+        first_letters = re.escape("".join(sorted({w[0] for w in self.weights})))
+        guarded = rf"(?=[{first_letters}])({alternation})"
+        patterns = {
+            "prefix": rf"\b{guarded}",
+            "word": rf"\b{guarded}\b",
+            # Zero-width, so matches can overlap ("transform" and "form" in "transform")
+            "substring": rf"(?={guarded})",
+        }
+        self.pattern = re.compile(patterns[match], re.IGNORECASE)
+        # Only the longest keyword is reported at each position; the shorter
+        # keywords it starts with ("trans" in "transform") matched there too.
+        # Whole-word matches can't contain another whole word.
+        self.covers = {w: [k for k in self.weights if w.startswith(k)] if match != "word" else [w]
+                       for w in self.weights}
+
+    def _total(self, matches) -> int:
+        covers = self.covers
+        found = set()
+        for m in {m.lower() for m in matches}:
+            found.update(covers.get(m, ()))
+        return min(sum(self.weights[w] for w in found), self.cap)
+
+    def score(self, text: Optional[str]) -> int:
+        """Hype score (0 to cap) for one document."""
+        if not text:
+            return 0
+        return self._total(self.pattern.findall(str(text)))
+
+    def score_batch(self, texts: Iterable[Optional[str]]) -> List[int]:
+        """
+        Scores many documents in one call (lists, tuples, NumPy/pandas arrays...).
+        Each document is one C-level findall over the compiled pattern; the
+        per-document Python work is just a set of the (few) matched keywords.
+        """
+        findall = self.pattern.findall
+        total = self._total
+        return [total(findall(str(text))) if text else 0 for text in texts]
+
+# Shared default scorer used by analyst.py, server.py and mcp_agent.py
+DEFAULT_SCORER = HypeScorer()
+
+def score_text(text: Optional[str]) -> int:
+    return DEFAULT_SCORER.score(text)
+
+def score_batch(texts: Iterable[Optional[str]]) -> List[int]:
+    return DEFAULT_SCORER.score_batch(texts)
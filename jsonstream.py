@@ -0,0 +1,85 @@
+import json
+from typing import Iterable, Iterator, List
+
+class ArrayObjectParser:
+    """
+    Incremental parser for a JSON array of objects arriving in pieces
+    (e.g. a streamed LLM answer). feed() returns every object that has
+    become complete since the last call.
+
+    Anything before the first '[' (code fences, "Here you go:") and after the
+    closing ']' (trailing prose) is ignored. An object that isn't valid JSON
+    is skipped without losing the ones around it, and an unfinished object at
+    the end simply never comes out.
+    """
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0            # next char of buffer to scan
+        self.started = False    # seen the opening '['
+        self.finished = False   # seen the closing ']'
+        self.depth = 0          # nesting depth inside the array
+        self.in_string = False
+        self.escaped = False
+        self.obj_start = None   # buffer index where the current top-level object began
+        self.skipped = 0        # malformed objects dropped
+
+    def feed(self, text: str) -> List[dict]:
+        if self.finished:
+            return []
+        self.buffer += text
+        found = []
+        buf = self.buffer
+        i = self.pos
+        while i < len(buf):
+            ch = buf[i]
+            if not self.started:
+                if ch == "[":
+                    self.started = True
+            elif self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == "\\":
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch in "{[":
+                if self.depth == 0 and ch == "{":
+                    self.obj_start = i
+                self.depth += 1
+            elif ch in "}]":
+                if self.depth == 0:
+                    # closing bracket of the array itself
+                    self.finished = True
+                    break
+                self.depth -= 1
+                if self.depth == 0 and self.obj_start is not None:
+                    try:
+                        obj = json.loads(buf[self.obj_start:i + 1])
+                        if isinstance(obj, dict):
+                            found.append(obj)
+                    except ValueError:
+                        self.skipped += 1
+                    self.obj_start = None
+            i += 1
+
+        # Drop what's been consumed so the buffer stays about one object long
+        keep_from = self.obj_start if self.obj_start is not None else i
+        self.buffer = buf[keep_from:]
+        self.pos = i - keep_from
+        if self.obj_start is not None:
+            self.obj_start = 0
+        return found
+
+def iter_objects(chunks: Iterable[str]) -> Iterator[dict]:
+    """Yields each object of a streamed JSON array as soon as it is complete."""
+    parser = ArrayObjectParser()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+        if parser.finished:
+            return
+
+def parse_objects(text: str) -> List[dict]:
+    """Salvages the well-formed objects from a (possibly broken) JSON array."""
+    return ArrayObjectParser().feed(text)
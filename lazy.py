@@ -0,0 +1,35 @@
+import importlib
+import threading
+from typing import Dict
+
+# --- LAZY IMPORTS ---
+# google.genai alone takes ~1.5s to import, requests and numpy a few
+# hundred ms more. The MCP servers and the dashboard start fresh all the time
+# and often never touch them, so they're imported on first attribute access.
+
+_modules: Dict[str, "LazyModule"] = {}
+_lock = threading.Lock()
+
+class LazyModule:
+    """Stands in for a module until something is looked up on it."""
+
+    def __init__(self, name: str):
+        self._name = name
+
+    def __getattr__(self, attr: str):
+        # Only called for names not set on the proxy itself (mock.patch sets them there)
+        return getattr(importlib.import_module(self._name), attr)
+
+    def __repr__(self):
+        return f"<lazy module '{self._name}'>"
+
+def module(name: str) -> LazyModule:
+    """
+    The proxy for a module. There is one per module name, so every importer
+    sees the same object, and patching e.g. genai.Client in a test reaches all of them.
+    """
+    with _lock:
+        proxy = _modules.get(name)
+        if proxy is None:
+            proxy = _modules[name] = LazyModule(name)
+        return proxy
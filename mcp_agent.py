@@ -1,7 +1,9 @@
 import os
 from dotenv import load_dotenv
 from mcp.server.fastmcp import FastMCP
-from tavily import TavilyClient
+import search_cache
+import clients
+import hype
 
 # 1. LOAD SECRETS (Bulletproof Method)
 # We tell Python: "Look for the .env file exactly where this script lives"
@@ -23,20 +25,15 @@ def analyze_hype_level(text: str) -> int:
     Analyzes text and returns a hype score from 0 to 100.
     Higher score means more sensationalist language.
     """
-    hype_words = ["revolutionary", "breakthrough", "agentic", "transform", "incredible", "boom", "future"]
-    score = 0
-    text_lower = text.lower()
-    for word in hype_words:
-        if word in text_lower:
-            score += 10
-    return min(score, 100)
+    return hype.score_text(text)
 
 # --- TOOL 2: Tavily Search (Secure) ---
 @mcp.tool()
-def web_search(query: str) -> str:
+def web_search(query: str, fresh: bool = False) -> str:
     """
     Search the real internet for current events, news, or facts using Tavily.
     Use this when the user asks about recent topics or live data.
+    Results are cached for a few minutes; set fresh=True to force a new search.
     """
     # Safety Check: Did the user forget the .env file?
     if not API_KEY:
@@ -44,10 +41,10 @@ def web_search(query: str) -> str:
 
     try:
         # Initialize Client
-        client = TavilyClient(api_key=API_KEY)
+        client = clients.tavily_client(API_KEY)
         
-        # Perform Search
-        response = client.search(query, topic="news", max_results=3)
+        # Perform Search (cached; misses wait for the shared Tavily budget)
+        response = search_cache.search(client, query, topic="news", max_results=3, bypass=fresh)
         
         # Format results
         formatted_results = []
@@ -0,0 +1,83 @@
+import os
+import json
+import time
+import hashlib
+from typing import List, Optional
+import db
+import metrics
+
+# Set EXTRACTION_MEMO_BYPASS=1 to always call the LLM (results are still stored).
+BYPASS = os.getenv("EXTRACTION_MEMO_BYPASS") == "1"
+
+_ready_dbs = set()
+
+def _ensure_table(conn):
+    """Creates the memo table once per DB file."""
+    if db.DB_PATH in _ready_dbs:
+        return
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS extraction_memo (
+            key TEXT PRIMARY KEY,
+            model TEXT,
+            prompt_version TEXT,
+            candidates TEXT,
+            created_at REAL,
+            hit_count INTEGER DEFAULT 0
+        )
+    ''')
+    conn.commit()
+    _ready_dbs.add(db.DB_PATH)
+
+def make_key(model: str, prompt: str, version: str) -> str:
+    """Content address of an extraction: hash of model, prompt version and the full prompt."""
+    raw = "\0".join([model, version, prompt])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def lookup(model: str, prompt: str, version: str) -> Optional[List[dict]]:
+    """Returns the parsed candidate list from a previous identical call, or None."""
+    if BYPASS:
+        return None
+    key = make_key(model, prompt, version)
+    conn = db.get_connection()
+    try:
+        _ensure_table(conn)
+        row = conn.execute("SELECT candidates FROM extraction_memo WHERE key = ?", (key,)).fetchone()
+        metrics.inc("cache_lookups", cache="memo", result="miss" if row is None else "hit")
+        if row is None:
+            return None
+        conn.execute("UPDATE extraction_memo SET hit_count = hit_count + 1 WHERE key = ?", (key,))
+        conn.commit()
+        return json.loads(row[0])
+    finally:
+        conn.close()
+
+def store(model: str, prompt: str, version: str, candidates: List[dict]):
+    """Remembers the parsed output of an LLM call."""
+    key = make_key(model, prompt, version)
+    conn = db.get_connection()
+    try:
+        _ensure_table(conn)
+        conn.execute('''
+            INSERT OR REPLACE INTO extraction_memo (key, model, prompt_version, candidates, created_at)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (key, model, version, json.dumps(candidates), time.time()))
+        conn.commit()
+    finally:
+        conn.close()
+
+def invalidate(keep_version: Optional[str] = None) -> int:
+    """
+    Deletes memoized extractions. With keep_version, only rows from other
+    prompt versions are dropped. Returns the number of rows removed.
+    """
+    conn = db.get_connection()
+    try:
+        _ensure_table(conn)
+        if keep_version is None:
+            cur = conn.execute("DELETE FROM extraction_memo")
+        else:
+            cur = conn.execute("DELETE FROM extraction_memo WHERE prompt_version != ?", (keep_version,))
+        conn.commit()
+        return cur.rowcount
+    finally:
+        conn.close()
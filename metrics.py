@@ -0,0 +1,214 @@
+import os
+import sys
+import json
+import time
+import threading
+import contextlib
+import cProfile
+import pstats
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+import db
+
+# --- SETTINGS ---
+# Structured JSON log of every span: a file path, "-" for stderr, unset = off
+LOG_TARGET = os.getenv("METRICS_LOG")
+# Where opt-in profiler dumps go (see RunProfiler)
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles"))
+PREFIX = "foodie_"
+# Histogram buckets for stage durations (seconds)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Changes since the last flush(): (series, labels) -> [family, kind, value]
+_pending: Dict[Tuple[str, str], list] = {}
+_lock = threading.Lock()
+_log_lock = threading.Lock()
+_ready_dbs = set()
+
+def _labels(labels: dict) -> str:
+    """Prometheus label string, sorted so the same labels always make the same series."""
+    return ",".join(f'{k}="{str(v)}"' for k, v in sorted(labels.items()))
+
+def _add(series: str, family: str, kind: str, labels: str, amount: float):
+    with _lock:
+        entry = _pending.setdefault((series, labels), [family, kind, 0.0])
+        entry[2] += amount
+
+def inc(name: str, amount: float = 1, **labels):
+    """Adds to a counter (exported as foodie_<name>_total)."""
+    family = PREFIX + name + "_total"
+    _add(family, family, "counter", _labels(labels), amount)
+
+def observe(name: str, seconds: float, **labels):
+    """Records one duration in a histogram (foodie_<name>_bucket/_sum/_count)."""
+    family = PREFIX + name
+    for bound in BUCKETS:
+        if seconds <= bound:
+            _add(family + "_bucket", family, "histogram", _labels({**labels, "le": bound}), 1)
+    _add(family + "_bucket", family, "histogram", _labels({**labels, "le": "+Inf"}), 1)
+    _add(family + "_sum", family, "histogram", _labels(labels), seconds)
+    _add(family + "_count", family, "histogram", _labels(labels), 1)
+
+def log_event(event: str, **fields):
+    """Writes one JSON log line (only when METRICS_LOG is set)."""
+    if not LOG_TARGET:
+        return
+    line = json.dumps({"ts": datetime.utcnow().isoformat(timespec="milliseconds") + "Z",
+                       "event": event, **fields}, default=str)
+    with _log_lock:
+        if LOG_TARGET == "-":
+            print(line, file=sys.stderr)
+        else:
+            with open(LOG_TARGET, "a") as f:
+                f.write(line + "\n")
+
+@contextlib.contextmanager
+def span(stage: str, **labels):
+    """
+    Times a pipeline stage: search, prompt_build, llm, parse, save...
+    Feeds the foodie_stage_seconds histogram and the JSON log. A stage
+    that raises is recorded with ok=false.
+    """
+    start = time.perf_counter()
+    ok = True
+    try:
+        yield
+    except BaseException:
+        ok = False
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        observe("stage_seconds", seconds, stage=stage)
+        if not ok:
+            inc("stage_errors", stage=stage)
+        log_event("span", stage=stage, seconds=round(seconds, 6), ok=ok, **labels)
+
+# --- SHARED STORE ---
+# The sentinel (cron) and server.py are different processes, so counters are
+# merged into SQLite on flush() and the /metrics endpoint reads them from there.
+
+def _ensure_table(conn):
+    if db.DB_PATH in _ready_dbs:
+        return
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS metrics (
+            series TEXT,
+            labels TEXT,
+            family TEXT,
+            kind TEXT,
+            value REAL,
+            PRIMARY KEY (series, labels)
+        )
+    ''')
+    conn.commit()
+    _ready_dbs.add(db.DB_PATH)
+
+def flush():
+    """Adds everything recorded in this process since the last flush to the DB."""
+    with _lock:
+        rows = [(series, labels, family, kind, value)
+                for (series, labels), (family, kind, value) in _pending.items()]
+        _pending.clear()
+    if not rows:
+        return
+    conn = db.get_connection()
+    try:
+        _ensure_table(conn)
+        conn.executemany('''
+            INSERT INTO metrics (series, labels, family, kind, value) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(series, labels) DO UPDATE SET value = value + excluded.value
+        ''', rows)
+        conn.commit()
+    finally:
+        conn.close()
+
+def render_prometheus() -> str:
+    """All stored metrics in the Prometheus text exposition format."""
+    flush()
+    conn = db.get_connection()
+    try:
+        _ensure_table(conn)
+        rows = conn.execute(
+            "SELECT family, kind, series, labels, value FROM metrics ORDER BY family, series, labels"
+        ).fetchall()
+    finally:
+        conn.close()
+
+    lines = []
+    current = None
+    for family, kind, series, labels, value in rows:
+        if family != current:
+            lines.append(f"# TYPE {family} {kind}")
+            current = family
+        value = int(value) if float(value).is_integer() else value
+        lines.append(f"{series}{{{labels}}} {value}" if labels else f"{series} {value}")
+    return "\n".join(lines) + "\n"
+
+def reset():
+    """Forgets everything (pending and stored). For tests."""
+    with _lock:
+        _pending.clear()
+    conn = db.get_connection()
+    try:
+        _ensure_table(conn)
+        conn.execute("DELETE FROM metrics")
+        conn.commit()
+    finally:
+        conn.close()
+
+# --- DEEP DIVES ---
+
+class RunProfiler:
+    """
+    Opt-in cProfile + tracemalloc for one sentinel run.
+    The sentinel's blocking work happens in worker threads, which cProfile
+    can't see from the main thread, so each job submitted through executor()
+    runs under a per-thread profiler and all of them are merged in dump().
+    """
+    def __init__(self, name: str = "sentinel"):
+        self.name = name
+        self.profiles = {}  # thread id -> cProfile.Profile
+        self.main = cProfile.Profile()
+
+    def start(self):
+        tracemalloc.start(25)
+        self.main.enable()
+
+    def _wrap(self, fn):
+        def profiled(*args, **kwargs):
+            profile = self.profiles.setdefault(threading.get_ident(), cProfile.Profile())
+            profile.enable()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                profile.disable()
+        return profiled
+
+    def executor(self, max_workers: int) -> ThreadPoolExecutor:
+        profiler = self
+
+        class ProfilingExecutor(ThreadPoolExecutor):
+            def submit(self, fn, *args, **kwargs):
+                return super().submit(profiler._wrap(fn), *args, **kwargs)
+
+        return ProfilingExecutor(max_workers=max_workers)
+
+    def dump(self) -> Optional[str]:
+        """Writes <name>-<timestamp>.prof (pstats) and .mem.txt (top allocations). Returns the path prefix."""
+        self.main.disable()
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        prefix = os.path.join(PROFILE_DIR, f"{self.name}-{datetime.now():%Y%m%d-%H%M%S}")
+        stats = pstats.Stats(self.main)
+        for profile in self.profiles.values():
+            stats.add(profile)
+        stats.dump_stats(prefix + ".prof")
+
+        with open(prefix + ".mem.txt", "w") as f:
+            for stat in snapshot.statistics("lineno")[:30]:
+                f.write(f"{stat}\n")
+        return prefix
@@ -0,0 +1,121 @@
+import os
+import random
+import time
+import db
+import metrics
+
+# --- QUOTA BUDGETS ---
+# Per-minute budgets for each upstream. 'tpm' is None when the API does not
+# meter tokens. Defaults match the Gemini free tier and Tavily's dev plan.
+LIMITS = {
+    "gemini": {
+        "rpm": int(os.getenv("GEMINI_RPM", "15")),
+        "tpm": int(os.getenv("GEMINI_TPM", "1000000")),
+    },
+    "tavily": {
+        "rpm": int(os.getenv("TAVILY_RPM", "100")),
+        "tpm": None,
+    },
+}
+
+_ready_dbs = set()
+
+def _ensure_table(conn):
+    """Creates the bucket table once per DB file."""
+    if db.DB_PATH in _ready_dbs:
+        return
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS quota_buckets (
+            name TEXT PRIMARY KEY,
+            tokens REAL,
+            updated_at REAL
+        )
+    ''')
+    conn.commit()
+    _ready_dbs.add(db.DB_PATH)
+
+def _buckets(service: str, tokens: int):
+    """Returns (bucket_name, capacity_per_minute, amount_to_take) for a service."""
+    limits = LIMITS[service]
+    buckets = [(f"{service}:requests", limits["rpm"], 1)]
+    if limits["tpm"] and tokens:
+        # A prompt bigger than the whole budget could never be granted; cap it.
+        buckets.append((f"{service}:tokens", limits["tpm"], min(tokens, limits["tpm"])))
+    return buckets
+
+def _level(conn, name: str, capacity: float, now: float) -> float:
+    """Current fill level of a bucket after refilling for the time that passed."""
+    row = conn.execute("SELECT tokens, updated_at FROM quota_buckets WHERE name = ?", (name,)).fetchone()
+    if row is None:
+        return capacity
+    refill = (now - row[1]) * capacity / 60.0
+    return min(capacity, row[0] + refill)
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) used to charge the TPM budget."""
+    return len(text) // 4 + 1
+
+def acquire(service: str, tokens: int = 0) -> float:
+    """
+    Blocks until `service` has budget for one request (and `tokens` tokens),
+    then spends it. Returns how many seconds the caller waited.
+    State lives in the shared SQLite DB, so every process draws from the same buckets.
+    """
+    waited = 0.0
+    while True:
+        conn = db.get_connection()
+        try:
+            _ensure_table(conn)
+            conn.execute("BEGIN IMMEDIATE")  # lock out other processes while we check + spend
+            now = time.time()
+            levels = []
+            wait = 0.0
+            for name, capacity, amount in _buckets(service, tokens):
+                level = _level(conn, name, capacity, now)
+                levels.append((name, level - amount))
+                if level < amount:
+                    wait = max(wait, (amount - level) * 60.0 / capacity)
+
+            if wait <= 0:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO quota_buckets (name, tokens, updated_at) VALUES (?, ?, ?)",
+                    [(name, level, now) for name, level in levels]
+                )
+                conn.commit()
+                if waited:
+                    metrics.inc("quota_wait_seconds", waited, service=service)
+                return waited
+            conn.rollback()
+        finally:
+            conn.close()
+
+        # Only wait as long as the budget needs, plus a little jitter so
+        # several waiting processes don't all wake up on the same tick.
+        wait += random.uniform(0, 0.1 * wait)
+        time.sleep(wait)
+        waited += wait
+
+def penalize(service: str):
+    """
+    Called after a 429. Empties the service's request bucket so every process
+    backs off until it refills, instead of each one discovering the limit alone.
+    """
+    conn = db.get_connection()
+    try:
+        _ensure_table(conn)
+        conn.execute(
+            "INSERT OR REPLACE INTO quota_buckets (name, tokens, updated_at) VALUES (?, 0, ?)",
+            (f"{service}:requests", time.time())
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+def backoff_delay(attempt: int, base: float = 2.0, cap: float = 60.0) -> float:
+    """Exponential backoff with full jitter: random between 0 and base * 2^attempt (capped)."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+def is_quota_error(error: Exception) -> bool:
+    """True if an exception from genai/Tavily means we hit a rate limit."""
+    error_msg = str(error)
+    return "429" in error_msg or "RESOURCE_EXHAUSTED" in error_msg
@@ -0,0 +1,33 @@
+import sys
+import backend
+from sentinel import _save_candidates
+
+def replay(food_item: str = None, location: str = None) -> int:
+    """
+    Re-extracts restaurants from the search hits already in the DB.
+    No Tavily calls. Run it after changing the prompt (bump PROMPT_VERSION
+    so the memo doesn't just hand back the old answers).
+    Returns the number of new spots.
+    """
+    if not backend.GOOGLE_API_KEY:
+        print("❌ Missing GOOGLE_API_KEY.")
+        return 0
+
+    targets = backend.get_hit_targets()
+    if food_item:
+        targets = [t for t in targets if t[0] == food_item and (not location or t[1] == location)]
+    if not targets:
+        print("💤 No stored hits to replay.")
+        return 0
+
+    total_new = 0
+    for food, loc in targets:
+        print(f"\n⏪ Replaying {food} in {loc}...")
+        total_new += _save_candidates(backend.replay_target(food, loc))
+
+    print(f"\n🏁 REPLAY FINISHED ({total_new} new spots)")
+    return total_new
+
+if __name__ == "__main__":
+    # python replay.py ["Food Item" ["Location"]]
+    replay(*sys.argv[1:3])
@@ -0,0 +1,270 @@
+import os
+import time
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import metrics
+import quota
+
+# --- ROUTING SETTINGS ---
+# Models to try, in order of preference. The first one is the primary (the
+# memo is keyed on it); the rest are fallbacks while it's slow or failing.
+MODELS = [m.strip() for m in os.getenv("GEMINI_MODELS", "gemini-2.0-flash,gemini-2.0-flash-lite").split(",") if m.strip()]
+# Hedged requests: if a call runs past the model's p95 latency, a second call
+# (to the next model in the route) is sent and whichever finishes first wins.
+# Costs extra quota on the slowest ~5% of calls, so it's opt-in.
+HEDGE = os.getenv("GEMINI_HEDGE", "0") == "1"
+# Latencies needed before the p95 is trusted for hedging
+HEDGE_MIN_SAMPLES = 20
+# Never hedge sooner than this, however fast the model has been
+HEDGE_MIN_DELAY = 0.5
+# Recent calls kept per model for latency percentiles
+LATENCY_WINDOW = 200
+# A model is routed behind the others while its p50 is this many times the best model's
+SLOW_FACTOR = 3.0
+
+# --- CIRCUIT BREAKER SETTINGS ---
+# Trips when at least BREAKER_ERROR_RATE of the last BREAKER_WINDOW calls
+# failed (errors and 429s both count), once there are BREAKER_MIN_CALLS of them.
+BREAKER_WINDOW = 20
+BREAKER_MIN_CALLS = 5
+BREAKER_ERROR_RATE = 0.5
+# How long a tripped model is skipped before one probe call is let through
+BREAKER_COOLDOWN = float(os.getenv("GEMINI_BREAKER_COOLDOWN", "60"))
+
+class CircuitOpen(Exception):
+    """Every model's breaker is open: fail fast instead of queueing on a dead upstream."""
+
+class ModelStats:
+    """Rolling latency and outcome stats plus the circuit breaker for one model."""
+
+    def __init__(self, model: str):
+        self.model = model
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.outcomes = deque(maxlen=BREAKER_WINDOW)  # True = ok
+        self.state = "closed"                          # closed | open | half_open
+        self.opened_at = 0.0
+        self.probing = False
+        self.counts = {"calls": 0, "errors": 0, "rate_limited": 0, "hedges": 0, "hedge_wins": 0}
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+    def available(self, now: float) -> bool:
+        """Whether a call may go to this model now (one probe at a time once the cooldown is over)."""
+        if self.state == "open" and now - self.opened_at >= BREAKER_COOLDOWN:
+            self.state = "half_open"
+        if self.state == "half_open":
+            return not self.probing
+        return self.state == "closed"
+
+    def record(self, seconds: float, ok: bool, rate_limited: bool = False):
+        self.counts["calls"] += 1
+        if ok:
+            self.latencies.append(seconds)
+        else:
+            self.counts["rate_limited" if rate_limited else "errors"] += 1
+        self.probing = False
+
+        if self.state == "half_open":
+            # The probe decides: back to normal, or another cooldown
+            self._set_state("closed" if ok else "open")
+            return
+        self.outcomes.append(ok)
+        failures = self.outcomes.count(False)
+        if (self.state == "closed" and len(self.outcomes) >= BREAKER_MIN_CALLS
+                and failures / len(self.outcomes) >= BREAKER_ERROR_RATE):
+            self._set_state("open")
+
+    def _set_state(self, state: str):
+        self.state = state
+        if state == "open":
+            self.opened_at = time.monotonic()
+            print(f"   🔌 Circuit OPEN for {self.model}: skipping it for {BREAKER_COOLDOWN:.0f}s.")
+        else:
+            self.outcomes.clear()
+            print(f"   🔌 Circuit closed for {self.model}.")
+        metrics.inc("circuit_changes", model=self.model, state=state)
+
+_stats: Dict[str, ModelStats] = {}
+_lock = threading.Lock()
+# Runs the calls of a hedged request (the waiting thread just picks the winner)
+_hedge_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hedge")
+
+def _model_stats(model: str) -> ModelStats:
+    stats = _stats.get(model)
+    if stats is None:
+        stats = _stats[model] = ModelStats(model)
+    return stats
+
+def route(models: Optional[List[str]] = None, claim: bool = False) -> List[str]:
+    """
+    The models to try for the next call, best first: configured order, minus
+    models whose breaker is open, with models that are currently much slower
+    than the fastest one moved to the back.
+    claim=True takes the probe of every half-open model returned, in the same
+    lock as the check, so concurrent callers never both get it. The caller must
+    then call each such model (record() gives the probe back) or release() it.
+    """
+    now = time.monotonic()
+    with _lock:
+        candidates = [_model_stats(m) for m in (models or MODELS)]
+        allowed = [s for s in candidates if s.available(now)]
+        if claim:
+            for s in allowed:
+                if s.state == "half_open":
+                    s.probing = True
+        medians = {s.model: s.percentile(0.5) for s in allowed}
+        known = [m for m in medians.values() if m is not None]
+        fastest = min(known) if known else None
+
+        def slow(s):
+            median = medians[s.model]
+            return fastest is not None and median is not None and median > SLOW_FACTOR * fastest
+
+        return [s.model for s in sorted(allowed, key=slow)]
+
+def record(model: str, seconds: float, error: Optional[Exception] = None):
+    """Feeds one call's outcome into the model's latency stats and breaker."""
+    rate_limited = error is not None and quota.is_quota_error(error)
+    with _lock:
+        _model_stats(model).record(seconds, error is None, rate_limited)
+    outcome = "ok" if error is None else ("rate_limited" if rate_limited else "error")
+    metrics.inc("model_calls", model=model, outcome=outcome)
+    if error is None:
+        metrics.observe("model_seconds", seconds, model=model)
+
+def release(model: str):
+    """Gives back a probe claimed by route()/pick() for a call that never reached the model or was cut short."""
+    with _lock:
+        stats = _model_stats(model)
+        if stats.state == "half_open":
+            stats.probing = False
+
+def _timed(model: str, call: Callable[[str], Any], prepare: Optional[Callable[[str], Any]] = None) -> Any:
+    start = None
+    try:
+        if prepare:
+            # e.g. waiting for quota: not the model's latency
+            prepare(model)
+        start = time.perf_counter()
+        result = call(model)
+    except BaseException as e:
+        if start is None or not isinstance(e, Exception):
+            # Never reached the model, or interrupted: says nothing about its health
+            release(model)
+        else:
+            record(model, time.perf_counter() - start, e)
+        raise
+    record(model, time.perf_counter() - start)
+    return result
+
+def hedge_delay(model: str) -> Optional[float]:
+    """Seconds to wait before hedging a call to `model` (its recent p95), or None if there's too little data."""
+    with _lock:
+        stats = _model_stats(model)
+        if len(stats.latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        return max(HEDGE_MIN_DELAY, stats.percentile(0.95))
+
+def _hedged(model: str, backup: str, delay: float, call: Callable[[str], Any],
+            prepare: Optional[Callable[[str], Any]] = None, used: Optional[set] = None) -> Tuple[str, Any]:
+    """
+    Runs `call` on `model`; if it's still going after `delay`, also on `backup`.
+    First success wins. Adds the models actually called to `used`.
+    """
+    used = set() if used is None else used
+    used.add(model)
+    futures = {_hedge_pool.submit(_timed, model, call, prepare): model}
+    done, _ = wait(futures, timeout=delay)
+    if not done:
+        with _lock:
+            _model_stats(model).counts["hedges"] += 1
+        metrics.inc("hedges", model=model)
+        print(f"   🏇 {model} slower than its p95 ({delay:.1f}s). Hedging with {backup}...")
+        used.add(backup)
+        futures[_hedge_pool.submit(_timed, backup, call, prepare)] = backup
+
+    pending = set(futures)
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                winner = futures[future]
+                if len(futures) > 1:
+                    with _lock:
+                        _model_stats(winner).counts["hedge_wins"] += 1
+                    metrics.inc("hedge_wins", model=winner)
+                # The loser keeps running in the background; its outcome still feeds the stats
+                return winner, future.result()
+            error = future.exception()
+    raise error
+
+def call(fn: Callable[[str], Any], prepare: Optional[Callable[[str], Any]] = None,
+         hedge: Optional[bool] = None) -> Tuple[str, Any]:
+    """
+    Calls fn(model) on the best available model, falling back down the route
+    when a model fails. Returns (model, result). Raises the last error if
+    every model failed, or CircuitOpen if none may be called at all.
+    prepare(model) runs before each call, outside the latency stats (quota waits).
+    hedge=None uses GEMINI_HEDGE.
+    """
+    models = route(claim=True)
+    if not models:
+        raise CircuitOpen(f"all models are circuit-open: {', '.join(MODELS)}")
+    hedge = HEDGE if hedge is None else hedge
+
+    used = set()
+    try:
+        for i, model in enumerate(models):
+            delay = hedge_delay(model) if hedge else None
+            try:
+                if delay is None:
+                    used.add(model)
+                    return model, _timed(model, fn, prepare)
+                backup = models[i + 1] if i + 1 < len(models) else model
+                return _hedged(model, backup, delay, fn, prepare, used)
+            except Exception as e:
+                if i + 1 == len(models):
+                    raise
+                print(f"   ↪️ {model} failed ({type(e).__name__}). Falling back to {models[i + 1]}...")
+    finally:
+        # Probes claimed for fallbacks we never needed
+        for model in set(models) - used:
+            release(model)
+
+def pick() -> str:
+    """
+    The model for a call that can't fall back or hedge part-way (streaming).
+    The caller must record() the outcome or release() the model, even if it stops early.
+    """
+    models = route(claim=True)
+    if not models:
+        raise CircuitOpen(f"all models are circuit-open: {', '.join(MODELS)}")
+    for model in models[1:]:
+        release(model)
+    return models[0]
+
+def get_stats() -> Dict[str, dict]:
+    """Per-model routing stats: breaker state, call counts, p50/p95 latency (ms)."""
+    with _lock:
+        report = {}
+        for model in MODELS + [m for m in _stats if m not in MODELS]:
+            stats = _model_stats(model)
+            p50, p95 = stats.percentile(0.5), stats.percentile(0.95)
+            report[model] = {
+                "state": stats.state, **stats.counts,
+                "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+                "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            }
+        return report
+
+def reset():
+    """Forgets all stats and closes every breaker (tests, benchmarks)."""
+    with _lock:
+        _stats.clear()
@@ -0,0 +1,63 @@
+import math
+from datetime import datetime, timezone
+from typing import List, Optional
+
+# --- SCHEDULING KNOBS ---
+# Default rescan window per target (hours). A target that keeps producing new
+# restaurants is rescanned close to the minimum; a dry one drifts to the maximum.
+DEFAULT_MIN_INTERVAL_HOURS = 24.0
+DEFAULT_MAX_INTERVAL_HOURS = 24.0 * 14
+# A target is due this fraction of its interval early, so a nightly cron that
+# starts a few minutes earlier than last time doesn't skip everything
+# (a 24h interval is due after 20h)
+INTERVAL_TOLERANCE = 1 / 6
+# Weight of the latest scan in the recent-yield moving average
+YIELD_ALPHA = 0.3
+# Yield a brand-new target starts with (optimistic, so it gets scanned early)
+INITIAL_YIELD = 1.0
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"  # same as SQLite's CURRENT_TIMESTAMP
+
+def updated_yield(old_yield: Optional[float], found: int) -> float:
+    """Exponential moving average of new restaurants per scan."""
+    if old_yield is None:
+        old_yield = INITIAL_YIELD
+    return YIELD_ALPHA * found + (1 - YIELD_ALPHA) * old_yield
+
+def target_interval_hours(recent_yield: float, min_hours: float, max_hours: float) -> float:
+    """High yield -> close to min_hours. Zero yield -> max_hours."""
+    return min_hours + (max_hours - min_hours) * math.exp(-max(recent_yield, 0.0))
+
+def plan_run(targets: List[dict], budget: Optional[int] = None, now: Optional[datetime] = None) -> List[dict]:
+    """
+    Picks which watchlist targets to scan this run.
+    Only stale targets (last scan older than their interval) are eligible.
+    Targets past their max interval go first so nothing starves; the rest are
+    ordered by yield x staleness. At most `budget` targets are returned.
+    """
+    now = now or datetime.now(timezone.utc)
+    if now.tzinfo is not None:
+        now = now.astimezone(timezone.utc).replace(tzinfo=None)  # last_checked is naive UTC
+    forced = []
+    due = []
+    for t in targets:
+        min_h = t.get("min_interval_hours") or DEFAULT_MIN_INTERVAL_HOURS
+        max_h = max(t.get("max_interval_hours") or DEFAULT_MAX_INTERVAL_HOURS, min_h)
+        recent_yield = t.get("recent_yield")
+        if recent_yield is None:
+            recent_yield = INITIAL_YIELD
+
+        if not t.get("last_checked"):
+            forced.append((math.inf, t))  # never scanned
+            continue
+
+        elapsed = (now - datetime.strptime(t["last_checked"], TIME_FORMAT)).total_seconds() / 3600
+        interval = target_interval_hours(recent_yield, min_h, max_h)
+        if elapsed >= max_h * (1 - INTERVAL_TOLERANCE):
+            forced.append((elapsed, t))
+        elif elapsed >= interval * (1 - INTERVAL_TOLERANCE):
+            due.append(((recent_yield + 0.1) * elapsed / interval, t))
+
+    ordered = [t for _, t in sorted(forced, key=lambda p: -p[0])]
+    ordered += [t for _, t in sorted(due, key=lambda p: -p[0])]
+    return ordered if budget is None else ordered[:budget]
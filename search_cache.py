@@ -0,0 +1,139 @@
+import os
+import json
+import time
+import hashlib
+from typing import List, Optional
+import db
+import metrics
+import clients
+import quota
+
+# --- SETTINGS ---
+# How long a cached search stays fresh, per Tavily topic (seconds).
+# News goes stale fast; restaurant guides barely change week to week.
+TOPIC_TTLS = {
+    "news": int(os.getenv("SEARCH_CACHE_NEWS_TTL", str(30 * 60))),
+    "general": int(os.getenv("SEARCH_CACHE_GENERAL_TTL", str(7 * 24 * 3600))),
+}
+MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "2000"))
+BYPASS = os.getenv("SEARCH_CACHE_BYPASS") == "1"
+
+# Hit/miss counters for this process
+STATS = {"hits": 0, "misses": 0}
+
+_ready_dbs = set()
+
+def _ensure_table(conn):
+    """Creates the cache table once per DB file."""
+    if db.DB_PATH in _ready_dbs:
+        return
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS search_cache (
+            key TEXT PRIMARY KEY,
+            query TEXT,
+            topic TEXT,
+            response TEXT,
+            expires_at REAL,
+            last_access REAL,
+            hit_count INTEGER DEFAULT 0
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_search_cache_access ON search_cache(last_access)")
+    conn.commit()
+    _ready_dbs.add(db.DB_PATH)
+
+def make_key(query: str, include_domains: Optional[List[str]], topic: Optional[str], max_results: int) -> str:
+    """Cache key: case/whitespace-normalized query + sorted domains + topic + max_results."""
+    normalized = " ".join(query.lower().split())
+    domains = sorted(d.lower() for d in include_domains or [])
+    raw = json.dumps([normalized, domains, topic or "general", max_results])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def search(client, query: str, max_results: int = 5, include_domains: Optional[List[str]] = None,
+           topic: Optional[str] = None, bypass: bool = False) -> dict:
+    """
+    Drop-in for TavilyClient.search() with an on-disk TTL/LRU cache in front of it.
+    Only cache misses spend Tavily quota. Pass bypass=True (or set SEARCH_CACHE_BYPASS=1)
+    to always go upstream; the fresh result still refreshes the cache.
+    """
+    key = make_key(query, include_domains, topic, max_results)
+    now = time.time()
+
+    conn = db.get_connection()
+    try:
+        _ensure_table(conn)
+        if not (bypass or BYPASS):
+            row = conn.execute(
+                "SELECT response FROM search_cache WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if row:
+                conn.execute(
+                    "UPDATE search_cache SET last_access = ?, hit_count = hit_count + 1 WHERE key = ?",
+                    (now, key)
+                )
+                conn.commit()
+                STATS["hits"] += 1
+                metrics.inc("cache_lookups", cache="search", result="hit")
+                return json.loads(row[0])
+    finally:
+        conn.close()
+
+    # MISS: go upstream (this is the slow part, so no DB connection held open).
+    # Identical searches already in flight wait for that one instead.
+    STATS["misses"] += 1
+    metrics.inc("cache_lookups", cache="search", result="miss")
+    return clients.singleflight(("tavily", key), lambda: _fetch(client, key, query, max_results, include_domains, topic))
+
+def _fetch(client, key: str, query: str, max_results: int, include_domains: Optional[List[str]],
+           topic: Optional[str]) -> dict:
+    """Goes upstream for a cache miss and stores the answer."""
+    now = time.time()
+    kwargs = {"max_results": max_results}
+    if include_domains:
+        kwargs["include_domains"] = include_domains
+    if topic:
+        kwargs["topic"] = topic
+    quota.acquire("tavily")
+    metrics.inc("api_calls", service="tavily")
+    with metrics.span("tavily"):
+        response = client.search(query, **kwargs)
+
+    ttl = TOPIC_TTLS.get(topic or "general", TOPIC_TTLS["general"])
+    conn = db.get_connection()
+    try:
+        conn.execute('''
+            INSERT OR REPLACE INTO search_cache (key, query, topic, response, expires_at, last_access)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (key, query, topic or "general", json.dumps(response), now + ttl, now))
+        # LRU eviction: keep only the MAX_ENTRIES most recently used searches
+        conn.execute('''
+            DELETE FROM search_cache WHERE key IN (
+                SELECT key FROM search_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?
+            )
+        ''', (MAX_ENTRIES,))
+        conn.commit()
+    finally:
+        conn.close()
+    return response
+
+def get_stats() -> dict:
+    """Hit/miss counters for this process plus the current cache size."""
+    conn = db.get_connection()
+    try:
+        _ensure_table(conn)
+        entries = conn.execute("SELECT COUNT(*) FROM search_cache").fetchone()[0]
+    finally:
+        conn.close()
+    total = STATS["hits"] + STATS["misses"]
+    hit_rate = STATS["hits"] / total if total else 0.0
+    return {**STATS, "entries": entries, "hit_rate": round(hit_rate, 3)}
+
+def clear():
+    """Empties the cache (e.g. after changing the trusted source list)."""
+    conn = db.get_connection()
+    try:
+        _ensure_table(conn)
+        conn.execute("DELETE FROM search_cache")
+        conn.commit()
+    finally:
+        conn.close()
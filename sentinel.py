@@ -1,40 +1,299 @@
 import backend
-import time
+import metrics
+import snapshots
+import workqueue
+import asyncio
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from typing import Optional
 
-def run_sentinel():
+# How many calls may be in flight at once against each upstream.
+# Tavily is cheap; Gemini is the quota bottleneck so keep it lower.
+TAVILY_CONCURRENCY = int(os.getenv("SENTINEL_TAVILY_CONCURRENCY", "4"))
+GEMINI_CONCURRENCY = int(os.getenv("SENTINEL_GEMINI_CONCURRENCY", "2"))
+# Targets packed into one Gemini request. 1 = one call per target.
+BATCH_SIZE = int(os.getenv("SENTINEL_BATCH_SIZE", "1"))
+# Stream single-target extractions and save each spot as soon as it's parsed
+STREAM = os.getenv("SENTINEL_STREAM", "0") == "1"
+# Max targets scanned per run (each costs ~1 Tavily + ~1 Gemini call). Unset = no cap.
+SCAN_BUDGET = int(os.getenv("SENTINEL_SCAN_BUDGET", "0")) or None
+# Dump a cProfile + tracemalloc report for each run into metrics.PROFILE_DIR
+PROFILE = os.getenv("SENTINEL_PROFILE", "0") == "1"
+# Append new rows to the Parquet snapshots after each run (see snapshots.py)
+SNAPSHOT = os.getenv("SENTINEL_SNAPSHOT", "1") == "1"
+
+def _save_candidates(candidates) -> int:
+    """Saves a target's candidates in one transaction and returns how many were new."""
+    new_count = 0
+    for spot, (name, outcome) in zip(candidates, backend.save_restaurants(candidates)):
+        if outcome == "inserted":
+            print(f"   ✅ DISCOVERED: {name} ({spot.taste_rating}/10)")
+            new_count += 1
+        elif outcome == "updated":
+            print(f"   🔄 Refreshed: {name} ({spot.taste_rating}/10)")
+        else:
+            print(f"   ({outcome}): {name}")
+    return new_count
+
+def _stream_and_save(food: str, loc: str, hits: list) -> Optional[int]:
+    """
+    Saves each candidate the moment the streamed answer produces it.
+    Returns how many were new, or None if the answer broke off (what arrived is still saved).
+    """
+    stream = backend.stream_hits(food, loc, hits)
+    new_count = 0
+    while True:
+        try:
+            spot = next(stream)
+        except StopIteration as done:
+            return new_count if done.value else None
+        new_count += _save_candidates([spot])
+
+async def _search(target: dict, limits: dict) -> Optional[list]:
+    food = target['food_item']
+    loc = target['location']
+    print(f"\n🔎 Hunting for: {food} in {loc}...")
+
+    # The backend calls are blocking, so each stage runs in a worker thread
+    # and only holds its upstream's slot while it is actually talking to it.
+    async with limits["tavily"]:
+        try:
+            # A scheduled scan has to look upstream: a cached answer would find
+            # nothing new and be recorded as a zero-yield scan
+            hits = await asyncio.to_thread(backend.search_new_hits, food, loc, True)
+        except Exception as e:
+            print(f"❌ Search for {food} in {loc} failed: {e}")
+            hits = None
+    if hits is None:
+        metrics.inc("target_errors", stage="search")
+    return hits  # None is not recorded as a scan, so the target stays due
+
+async def hunt_targets(targets: list, limits: dict) -> list:
+    """
+    Runs search -> analyze -> save for a chunk of watchlist targets.
+    Searches run concurrently; the chunk then shares one Gemini call
+    (or a plain per-target call when the chunk has a single target).
+    Returns the number of new spots per target. None where the search or the
+    analysis failed: those aren't recorded as scans, so an outage doesn't make
+    the scheduler back off (see scheduler.py).
+    """
+    hits_list = await asyncio.gather(*(_search(target, limits) for target in targets))
+    groups = [(t['food_item'], t['location'], hits or []) for t, hits in zip(targets, hits_list)]
+
+    if len(groups) == 1 and STREAM:
+        if hits_list[0] is None:
+            return [None]
+        async with limits["gemini"]:
+            new_count = await asyncio.to_thread(_stream_and_save, *groups[0])
+        if new_count is None:
+            metrics.inc("target_errors", stage="analyze")
+            print(f"   -> {groups[0][0]}: analysis broke off. Leaving it due.")
+            return [None]
+        await asyncio.to_thread(backend.record_scan, groups[0][0], groups[0][1], new_count)
+        print(f"   -> Finished {groups[0][0]}. Added {new_count} validated spots.")
+        return [new_count]
+
+    async with limits["gemini"]:
+        if len(groups) == 1:
+            candidates_list = [await asyncio.to_thread(backend.analyze_hits, *groups[0])]
+        else:
+            candidates_list = await asyncio.to_thread(backend.analyze_batch, groups)
+
+    counts = []
+    for target, hits, candidates in zip(targets, hits_list, candidates_list):
+        if hits is None:
+            counts.append(None)
+            continue
+        if candidates is None:
+            metrics.inc("target_errors", stage="analyze")
+            print(f"   -> {target['food_item']}: analysis failed. Leaving it due.")
+            counts.append(None)
+            continue
+        async with limits["db"]:
+            new_count = await asyncio.to_thread(_save_candidates, candidates)
+            await asyncio.to_thread(backend.record_scan, target['food_item'], target['location'], new_count)
+        print(f"   -> Finished {target['food_item']}. Added {new_count} validated spots.")
+        counts.append(new_count)
+    return counts
+
+def _setup(tavily_concurrency: Optional[int], gemini_concurrency: Optional[int], profile: Optional[bool]):
+    """Per-upstream semaphores and a matching thread pool for this event loop. Returns (limits, profiler)."""
+    tavily_concurrency = tavily_concurrency or TAVILY_CONCURRENCY
+    gemini_concurrency = gemini_concurrency or GEMINI_CONCURRENCY
+    limits = {
+        "tavily": asyncio.Semaphore(tavily_concurrency),
+        "gemini": asyncio.Semaphore(gemini_concurrency),
+        "db": asyncio.Semaphore(1),  # SQLite has a single writer anyway
+    }
+
+    # Size the thread pool so the semaphores, not the pool, are the limit.
+    workers = tavily_concurrency + gemini_concurrency + 1
+    profiler = metrics.RunProfiler() if (PROFILE if profile is None else profile) else None
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(profiler.executor(workers) if profiler else ThreadPoolExecutor(max_workers=workers))
+    return limits, profiler
+
+def _export_snapshot():
+    """The export stage. A failed export never fails the run; the next one picks up from the same mark."""
+    if not SNAPSHOT:
+        return
+    try:
+        with metrics.span("snapshot"):
+            snapshots.export()
+    except Exception as e:
+        print(f"⚠️ Snapshot export failed: {e}")
+
+async def run_sentinel_async(tavily_concurrency: int = None, gemini_concurrency: int = None,
+                             batch_size: int = None, budget: int = None, scan_all: bool = False,
+                             profile: bool = None) -> int:
+    """
+    Hunts the watchlist targets that are due (see scheduler.py) concurrently,
+    at most `budget` of them. scan_all=True ignores the schedule.
+    profile=True (or SENTINEL_PROFILE=1) writes cProfile/tracemalloc dumps.
+    Returns the number of new spots.
+    """
     print(f"🤖 SENTINEL V2 STARTING: {datetime.now()}")
-    
-    watchlist = backend.get_watchlist()
+
+    if not backend.TAVILY_API_KEY or not backend.GOOGLE_API_KEY:
+        print("❌ Missing API Keys.")
+        return 0
+
+    backend.init_db()
+    budget = budget or SCAN_BUDGET
+    if scan_all:
+        watchlist = backend.get_watchlist()[:budget]
+    else:
+        watchlist = backend.get_due_targets(budget=budget)
     if not watchlist:
-        print("💤 Watchlist is empty.")
-        return
+        print("💤 Nothing due on the watchlist.")
+        return 0
+
+    print(f"📋 {len(watchlist)} targets due for a scan.")
+
+    batch_size = max(1, batch_size or BATCH_SIZE)
+    limits, profiler = _setup(tavily_concurrency, gemini_concurrency, profile)
+
+    chunks = [watchlist[i:i + batch_size] for i in range(0, len(watchlist), batch_size)]
+    started = datetime.now()
+    if profiler:
+        profiler.start()
+    try:
+        with metrics.span("run", targets=len(watchlist)):
+            results = await asyncio.gather(
+                *(hunt_targets(chunk, limits) for chunk in chunks),
+                return_exceptions=True
+            )
+    finally:
+        if profiler:
+            print(f"🔬 Profile written to {profiler.dump()}.*")
+
+    total_new = 0
+    for chunk, result in zip(chunks, results):
+        if isinstance(result, Exception):
+            names = ", ".join(f"{t['food_item']} in {t['location']}" for t in chunk)
+            print(f"❌ {names} failed: {result}")
+        else:
+            total_new += sum(count or 0 for count in result)
+
+    metrics.inc("targets_scanned", len(watchlist))
+    metrics.inc("discoveries", total_new)
+    metrics.log_event("run_finished", targets=len(watchlist), new_spots=total_new,
+                      seconds=round((datetime.now() - started).total_seconds(), 3))
+    await asyncio.to_thread(_export_snapshot)
+    metrics.flush()
+    print(f"\n🏁 SENTINEL FINISHED ({total_new} new spots)")
+    return total_new
+
+def run_sentinel():
+    """Synchronous entry point used by cron / launchd."""
+    return asyncio.run(run_sentinel_async())
+
+# --- WORK-QUEUE MODE ---
+# Start any number of `python sentinel.py --worker` processes (same box or
+# several boxes sharing the DB file). The first one enqueues the due targets
+# as a run; all of them lease targets from it until the run is drained.
+
+async def _heartbeat(run_id: str, worker_id: str, targets: list):
+    """Keeps our leases alive while a chunk is being worked on."""
+    while True:
+        await asyncio.sleep(workqueue.LEASE_SECONDS / 3)
+        held = await asyncio.to_thread(workqueue.heartbeat, run_id, worker_id, targets)
+        if held < len(targets):
+            print(f"   ⚠️ Lost {len(targets) - held} lease(s); another worker took over.")
+
+async def _work_loop(run_id: str, worker_id: str, limits: dict, batch_size: int) -> int:
+    """One slot of a worker: claim a chunk, hunt it, report back, repeat until the run is drained."""
+    total_new = 0
+    while True:
+        targets = await asyncio.to_thread(workqueue.claim, run_id, worker_id, batch_size)
+        if not targets:
+            return total_new
+
+        beat = asyncio.create_task(_heartbeat(run_id, worker_id, targets))
+        try:
+            counts = await hunt_targets(targets, limits)
+        except Exception as e:
+            counts = [None] * len(targets)
+            print(f"❌ Chunk failed: {e}")
+        finally:
+            beat.cancel()
+
+        for target, count in zip(targets, counts):
+            if count is None:
+                await asyncio.to_thread(workqueue.release, run_id, worker_id, target, "search or analysis failed")
+            elif await asyncio.to_thread(workqueue.complete, run_id, worker_id, target, count):
+                total_new += count
+
+async def run_worker_async(worker_id: str = None, tavily_concurrency: int = None, gemini_concurrency: int = None,
+                           batch_size: int = None, budget: int = None, profile: bool = None) -> int:
+    """
+    Work-queue mode: joins (or enqueues) the current run and processes leased
+    targets until none are left. Each target is completed exactly once per run
+    no matter how many workers there are. Returns the new spots this worker found.
+    """
+    worker_id = worker_id or workqueue.make_worker_id()
+    print(f"🤖 SENTINEL WORKER {worker_id} STARTING: {datetime.now()}")
 
-    print(f"📋 Found {len(watchlist)} active targets.")
+    if not backend.TAVILY_API_KEY or not backend.GOOGLE_API_KEY:
+        print("❌ Missing API Keys.")
+        return 0
 
-    for target in watchlist:
-        food = target['food_item']
-        loc = target['location']
-        print(f"\n🔎 Hunting for: {food} in {loc}...")
+    backend.init_db()
+    budget = budget or SCAN_BUDGET
+    run_id = await asyncio.to_thread(workqueue.open_run, lambda: backend.get_due_targets(budget=budget))
+    if run_id is None:
+        print("💤 Nothing due on the watchlist.")
+        return 0
+    print(f"📋 Joined run {run_id}: {workqueue.run_status(run_id)}")
 
-        # CALL THE SMART FUNCTION
-        candidates = backend.search_and_analyze(food, loc)
-        
-        new_count = 0
-        for spot in candidates:
-            # logic is already inside 'save_restaurant' to handle duplicates
-            status = backend.save_restaurant(spot)
-            
-            if status == "Saved":
-                print(f"   ✅ DISCOVERED: {spot.name} ({spot.taste_rating}/10)")
-                new_count += 1
-            else:
-                print(f"   (duplicate): {spot.name}")
+    batch_size = max(1, batch_size or BATCH_SIZE)
+    limits, profiler = _setup(tavily_concurrency, gemini_concurrency, profile)
+    # Enough claim loops to keep every search slot busy
+    slots = max(1, (tavily_concurrency or TAVILY_CONCURRENCY) // batch_size)
+    if profiler:
+        profiler.start()
+    try:
+        with metrics.span("worker_run"):
+            found = await asyncio.gather(*(_work_loop(run_id, worker_id, limits, batch_size) for _ in range(slots)))
+    finally:
+        if profiler:
+            print(f"🔬 Profile written to {profiler.dump()}.*")
 
-        print(f"   -> Finished {food}. Added {new_count} validated spots.")
-        time.sleep(2) # Be polite
+    total_new = sum(found)
+    metrics.inc("discoveries", total_new)
+    await asyncio.to_thread(_export_snapshot)
+    metrics.flush()
+    print(f"\n🏁 WORKER FINISHED ({total_new} new spots). Run {run_id}: {workqueue.run_status(run_id)}")
+    return total_new
 
-    print(f"\n🏁 SENTINEL FINISHED")
+def run_worker():
+    """Synchronous entry point for `python sentinel.py --worker`."""
+    return asyncio.run(run_worker_async())
 
 if __name__ == "__main__":
-    run_sentinel()
\ No newline at end of file
+    if "--worker" in sys.argv:
+        run_worker()
+    else:
+        run_sentinel()
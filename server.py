@@ -1,32 +1,220 @@
-from fastapi import FastAPI
-from pydantic import BaseModel
+import os
+import json
+import zlib
+from typing import List
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, ValidationError
+import hype
+import metrics
+
+# Limits for the bulk endpoints
+MAX_BODY_BYTES = int(os.getenv("HYPE_MAX_BODY_BYTES", str(20 * 1024 * 1024)))  # after gunzip
+MAX_BATCH_DOCS = int(os.getenv("HYPE_MAX_BATCH_DOCS", "10000"))
+MAX_LINE_BYTES = int(os.getenv("HYPE_MAX_LINE_BYTES", str(1024 * 1024)))
+STREAM_CHUNK_DOCS = 500  # docs scored per threadpool hop in the streaming endpoint
+
+class StreamingAwareGZip(GZipMiddleware):
+    """
+    GZipMiddleware that leaves streaming routes alone. The gzip responder
+    holds output back until a compressed block fills up, so NDJSON scores
+    would arrive in large bursts instead of as each chunk is scored.
+    """
+    def __init__(self, app, exclude_paths=(), **kwargs):
+        super().__init__(app, **kwargs)
+        self.exclude_paths = set(exclude_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
 
 # 1. Create the App
 # Note: The variable is named 'app', not 'mcp'
 app = FastAPI()
+# Compress big responses for clients that send Accept-Encoding: gzip
+app.add_middleware(StreamingAwareGZip, minimum_size=1024, exclude_paths={"/analyze/stream"})
 
 # 2. Define the Input Format
 # We tell the server to expect a JSON like {"text": "some news"}
 class Input(BaseModel):
     text: str
 
+class BatchInput(BaseModel):
+    texts: List[str]
+
+# --- HELPERS ---
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse normally reads from `receive` to watch for client
+    disconnects, which would steal the request body we are still reading
+    while streaming results back. This one only streams; a client that
+    went away shows up as a failed send instead.
+    """
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+def _check_declared_size(request: Request):
+    """Rejects oversized bodies up front when the client tells us the size."""
+    declared = request.headers.get("content-length")
+    if not declared:
+        return
+    try:
+        size = int(declared)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Content-Length is not a number")
+    if size > MAX_BODY_BYTES:
+        raise HTTPException(status_code=413, detail=f"Body larger than {MAX_BODY_BYTES} bytes")
+
+async def _iter_body(request: Request):
+    """
+    Yields the raw request body chunk by chunk, transparently gunzipping
+    (Content-Encoding: gzip) and enforcing MAX_BODY_BYTES on the decoded size.
+    A body that isn't valid gzip is a 400.
+    """
+    gzipped = request.headers.get("content-encoding", "").lower() == "gzip"
+    decoder = zlib.decompressobj(16 + zlib.MAX_WBITS) if gzipped else None
+    received = 0
+    async for chunk in request.stream():
+        if decoder:
+            try:
+                # max_length caps how much a tiny gzip bomb can expand per chunk
+                chunk = decoder.decompress(chunk, MAX_BODY_BYTES - received + 1)
+            except zlib.error as e:
+                raise HTTPException(status_code=400, detail=f"Bad gzip body: {e}")
+        received += len(chunk)
+        if received > MAX_BODY_BYTES:
+            raise HTTPException(status_code=413, detail=f"Body larger than {MAX_BODY_BYTES} bytes")
+        if chunk:
+            yield chunk
+    if decoder and not decoder.eof:
+        raise HTTPException(status_code=400, detail="Bad gzip body: truncated")
+
+async def _started(chunks):
+    """
+    Pulls the first chunk before the response begins, so a body that's broken
+    from the start (bad gzip, too big) still gets a real status code.
+    """
+    try:
+        first = await chunks.__anext__()
+    except StopAsyncIteration:
+        first = None
+
+    async def rest():
+        if first is not None:
+            yield first
+        async for chunk in chunks:
+            yield chunk
+    return rest()
+
+def _parse_line(line: bytes) -> str:
+    """An NDJSON line is either {"text": "..."} or a bare JSON string."""
+    doc = json.loads(line)
+    if isinstance(doc, dict):
+        doc = doc["text"]
+    if not isinstance(doc, str):
+        raise ValueError("expected a JSON string or an object with a 'text' field")
+    return doc
+
 # 3. Define the Route
 # This creates a web link at http://.../analyze
 @app.post("/analyze")
 def analyze_hype(data: Input):
-    # LOGIC (Same as before)
-    hype_words = ["revolutionary", "breakthrough", "agentic", "transform", "incredible", "boom", "future"]
-    
-    score = 0
-    text_lower = data.text.lower()
-    
-    for word in hype_words:
-        if word in text_lower:
-            score += 10
-            
-    final_score = min(score, 100)
-    
+    # LOGIC (Shared scorer, see hype.py)
+    final_score = hype.score_text(data.text)
+    metrics.inc("hype_docs", endpoint="analyze")
+
     return {
         "hype_score": final_score,
         "status": "Processed by Local FastAPI"
-    }
\ No newline at end of file
+    }
+
+# Many documents in one request: {"texts": ["...", "..."]}
+@app.post("/analyze/batch")
+async def analyze_hype_batch(request: Request):
+    _check_declared_size(request)
+    body = b"".join([chunk async for chunk in _iter_body(request)])
+    try:
+        data = BatchInput.model_validate_json(body)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False))
+    if len(data.texts) > MAX_BATCH_DOCS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_DOCS} texts per batch")
+
+    # Scoring is CPU work; keep it off the event loop
+    scores = await run_in_threadpool(hype.score_batch, data.texts)
+    metrics.inc("hype_docs", len(scores), endpoint="batch")
+    return {
+        "hype_scores": scores,
+        "count": len(scores),
+        "status": "Processed by Local FastAPI"
+    }
+
+# NDJSON in, NDJSON out. One document per line; scores stream back as soon
+# as each received chunk is scored, so the backlog never sits in memory.
+@app.post("/analyze/stream")
+async def analyze_hype_stream(request: Request):
+    _check_declared_size(request)
+    body = await _started(_iter_body(request))
+
+    async def score_lines():
+        buffer = b""
+        index = 0
+        try:
+            async for chunk in body:
+                lines = (buffer + chunk).split(b"\n")
+                buffer = lines.pop()  # last piece may be an incomplete line
+                # Score everything up to the first line over the limit, then stop there
+                too_long = next((i for i, line in enumerate(lines) if len(line) > MAX_LINE_BYTES), None)
+                if too_long is not None:
+                    lines = lines[:too_long]
+                for start in range(0, len(lines), STREAM_CHUNK_DOCS):
+                    out, index = await _score_chunk(lines[start:start + STREAM_CHUNK_DOCS], index)
+                    yield out
+                if too_long is not None or len(buffer) > MAX_LINE_BYTES:
+                    raise HTTPException(status_code=413, detail=f"Line longer than {MAX_LINE_BYTES} bytes")
+        except HTTPException as e:
+            # Headers are already sent, so report the problem in-band and stop
+            yield json.dumps({"index": index, "error": e.detail}) + "\n"
+            return
+        if buffer.strip():
+            out, index = await _score_chunk([buffer], index)
+            yield out
+
+    return DuplexStreamingResponse(score_lines(), media_type="application/x-ndjson")
+
+async def _score_chunk(lines: List[bytes], index: int):
+    """Scores a chunk of NDJSON lines. Bad lines get an error record instead of killing the stream."""
+    texts = []
+    errors = {}
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            texts.append(_parse_line(line))
+        except (ValueError, KeyError) as e:
+            errors[len(texts)] = str(e)
+            texts.append(None)
+
+    scores = await run_in_threadpool(hype.score_batch, texts)
+    metrics.inc("hype_docs", len(scores), endpoint="stream")
+    records = []
+    for i, score in enumerate(scores):
+        if i in errors:
+            records.append(json.dumps({"index": index + i, "error": errors[i]}))
+        else:
+            records.append(json.dumps({"index": index + i, "hype_score": score}))
+    return "".join(r + "\n" for r in records), index + len(scores)
+
+# Prometheus scrape target. Includes what the sentinel recorded (it flushes
+# its counters into the shared SQLite DB at the end of every run).
+@app.get("/metrics")
+async def prometheus_metrics():
+    body = await run_in_threadpool(metrics.render_prometheus)
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
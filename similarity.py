@@ -0,0 +1,368 @@
+import os
+import re
+import math
+import uuid
+import threading
+import contextlib
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+import db
+import lazy
+
+# Only imported when the index is first used
+np = lazy.module("numpy")
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# --- INDEX SETTINGS ---
+# Where the index lives. Defaults to a folder next to the DB, so a scratch DB
+# (tests, benchmarks) gets a scratch index.
+INDEX_DIR = os.getenv("SIMILARITY_INDEX_DIR")
+# How much each field counts towards a place's vector
+FIELD_WEIGHTS = {"name": 1.0, "neighborhood": 1.0, "notes": 1.0, "snippets": 0.5}
+# Captured search snippets mentioning a place that are folded into its vector
+SNIPPETS_PER_PLACE = 3
+
+_STOPWORDS = {"a", "an", "the", "and", "or", "of", "in", "on", "at", "to", "for", "with", "is",
+              "it", "its", "this", "that", "are", "was", "be", "but", "so", "very", "really",
+              "their", "they", "you", "we", "i", "my", "our", "from", "by", "as", "has", "have"}
+
+# --- STORAGE ---
+# A CSR matrix (one row per indexed place version) in append-only raw files,
+# memory-mapped on load:
+#   data.f32     term weights (log-scaled field-weighted counts)
+#   indices.i32  term column of each weight
+#   ends.i64     where each row ends in data/indices
+#   ids.i64      restaurant id of each row (written last: it defines which rows exist)
+#   vocab.txt    one term per line, line number = column
+# Updating a place appends a new row; the last row for an id wins. IDF is
+# applied at query time, so appends never rewrite existing rows. A crash
+# part-way through an append leaves the files out of step; readers only use
+# the rows complete in all of them, and the next append cuts the rest off.
+#
+# Appends are serialized with flock. Windows has no flock, so there only the
+# threads of one process are serialized: don't share an index between
+# processes on Windows.
+_FILES = {"data": ("data.f32", "float32"), "indices": ("indices.i32", "int32"),
+          "ends": ("ends.i64", "int64"), "ids": ("ids.i64", "int64")}
+
+def index_dir() -> str:
+    return INDEX_DIR or db.DB_PATH + ".simindex"
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in re.findall(r"\w+", (text or "").lower()) if t not in _STOPWORDS and not t.isdigit()]
+
+def term_counts(fields: Dict[str, str]) -> Counter:
+    """Field-weighted term counts for one place."""
+    counts = Counter()
+    for field, text in fields.items():
+        weight = FIELD_WEIGHTS.get(field, 1.0)
+        for term in tokenize(text):
+            counts[term] += weight
+    return counts
+
+def _map(path: str, dtype, length: int) -> "np.ndarray":
+    if length == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=(length,))
+
+_thread_lock = threading.Lock()
+
+@contextlib.contextmanager
+def _locked(path: str):
+    """Exclusive lock on the index folder (see STORAGE above for Windows)."""
+    os.makedirs(path, exist_ok=True)
+    if fcntl is None:
+        with _thread_lock:
+            yield
+        return
+    with open(os.path.join(path, "lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+class Index:
+    """One process's view of the on-disk index. Re-maps the files when another process appended."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.vocab: Dict[str, int] = {}
+        self.rows = -1
+        self.generation = None
+        self._scoring = None
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, _FILES[name][0])
+
+    def _size(self, name: str) -> int:
+        try:
+            return os.path.getsize(self._file(name)) // np.dtype(_FILES[name][1]).itemsize
+        except FileNotFoundError:
+            return 0
+
+    def _read_vocab(self):
+        try:
+            with open(os.path.join(self.path, "vocab.txt")) as f:
+                # A line without its newline is still being written by another process
+                terms = f.read().split("\n")[:-1]
+        except FileNotFoundError:
+            terms = []
+        for term in terms[len(self.vocab):]:
+            self.vocab[term] = len(self.vocab)
+
+    def _complete_rows(self) -> int:
+        """How many rows are complete in every file (a crashed append can leave a torn tail)."""
+        rows = min(self._size("ids"), self._size("ends"))
+        entries = min(self._size("data"), self._size("indices"))
+        # ends only grows, so the complete rows are a prefix
+        return int(np.searchsorted(_map(self._file("ends"), np.int64, rows), entries, side="right"))
+
+    def _repair(self):
+        """Cuts every file back to the last complete row. Call with the lock held."""
+        rows = self._complete_rows()
+        nnz = int(np.fromfile(self._file("ends"), np.int64, count=1, offset=(rows - 1) * 8)[0]) if rows else 0
+        for name, length in (("ids", rows), ("ends", rows), ("data", nnz), ("indices", nnz)):
+            path = self._file(name)
+            size = length * np.dtype(_FILES[name][1]).itemsize
+            if os.path.exists(path) and os.path.getsize(path) != size:
+                os.truncate(path, size)
+        vocab = os.path.join(self.path, "vocab.txt")
+        if os.path.exists(vocab):
+            with open(vocab, "rb+") as f:
+                text = f.read()
+                if text and not text.endswith(b"\n"):
+                    f.truncate(text.rfind(b"\n") + 1)
+
+    def refresh(self) -> bool:
+        """Picks up rows appended since the last look. True if anything changed."""
+        rows = self._complete_rows()
+        try:
+            with open(os.path.join(self.path, "generation")) as f:
+                generation = f.read()
+        except FileNotFoundError:
+            generation = None
+        if rows == self.rows and generation == self.generation:
+            return False
+        if generation != self.generation:
+            # rebuild() replaced the files: the vocabulary starts over too
+            self.vocab = {}
+            self.generation = generation
+        self._read_vocab()
+        self.ids = _map(self._file("ids"), np.int64, rows)
+        self.ends = _map(self._file("ends"), np.int64, rows)
+        nnz = int(self.ends[-1]) if rows else 0
+        self.data = _map(self._file("data"), np.float32, nnz)
+        self.indices = _map(self._file("indices"), np.int32, nnz)
+        self.rows = rows
+        self._scoring = None
+        return True
+
+    def append(self, places: Iterable[Tuple[int, Counter]]):
+        """
+        Appends one row per (restaurant id, term counts). Safe across processes.
+        `places` is consumed under the lock, so a generator that reads the DB
+        there can't append an older version of a place after a newer one.
+        """
+        with _locked(self.path):
+            places = list(places)
+            if not places:
+                return
+            self._repair()
+            self._read_vocab()
+            new_terms = []
+            data, indices, ends, ids = [], [], [], []
+            nnz = self._size("data")
+            for restaurant_id, counts in places:
+                for term, count in sorted(counts.items()):
+                    column = self.vocab.get(term)
+                    if column is None:
+                        column = self.vocab[term] = len(self.vocab)
+                        new_terms.append(term)
+                    indices.append(column)
+                    data.append(math.log1p(count))
+                nnz += len(counts)
+                ends.append(nnz)
+                ids.append(restaurant_id)
+
+            if new_terms:
+                with open(os.path.join(self.path, "vocab.txt"), "a") as f:
+                    f.write("".join(t + "\n" for t in new_terms))
+            for name, values in (("data", data), ("indices", indices), ("ends", ends), ("ids", ids)):
+                with open(self._file(name), "ab") as f:
+                    f.write(np.asarray(values, dtype=_FILES[name][1]).tobytes())
+
+    def _prepare(self):
+        """
+        IDF weights and row norms for the current rows, computed once per
+        refresh in a few vectorized passes over the arrays.
+        """
+        if self._scoring is not None:
+            return self._scoring
+        rows = self.rows
+        starts = np.concatenate(([0], self.ends[:-1])) if rows else np.zeros(0, dtype=np.int64)
+        # Superseded versions of a place don't count (the last row per id wins)
+        _, last = np.unique(self.ids[::-1], return_index=True)
+        live = np.zeros(rows, dtype=bool)
+        live[rows - 1 - last] = True
+
+        row_of_entry = np.repeat(np.arange(rows), self.ends - starts)
+        live_entries = live[row_of_entry]
+        df = np.bincount(self.indices[live_entries], minlength=len(self.vocab))
+        n_live = int(live.sum())
+        idf = (np.log((1 + n_live) / (1 + df)) + 1).astype(np.float32)
+
+        weights = self.data * idf[self.indices]
+        norms = np.sqrt(_row_sums(weights * weights, starts, self.ends))
+        self._scoring = (starts, live, idf, weights, norms)
+        return self._scoring
+
+    def row_of(self, restaurant_id: int) -> Optional[int]:
+        """The latest row for a place (None if it isn't indexed)."""
+        matches = np.flatnonzero(self.ids == restaurant_id)
+        return int(matches[-1]) if len(matches) else None
+
+    def query_vector(self, counts: Counter) -> Tuple["np.ndarray", "np.ndarray"]:
+        _, _, idf, _, _ = self._prepare()
+        pairs = [(self.vocab[t], math.log1p(c)) for t, c in counts.items() if t in self.vocab]
+        if not pairs:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+        columns = np.array([p[0] for p in pairs], dtype=np.int32)
+        return columns, np.array([p[1] for p in pairs], dtype=np.float32) * idf[columns]
+
+    def row_vector(self, row: int) -> Tuple["np.ndarray", "np.ndarray"]:
+        starts, _, _, weights, _ = self._prepare()
+        return (np.asarray(self.indices[starts[row]:self.ends[row]]),
+                np.asarray(weights[starts[row]:self.ends[row]]))
+
+    def top_k(self, columns: "np.ndarray", values: "np.ndarray", k: int,
+              exclude_id: Optional[int] = None) -> List[Tuple[int, float]]:
+        """Cosine top-k over live rows: [(restaurant id, score)], best first, scores > 0."""
+        if self.rows <= 0 or len(columns) == 0:
+            return []
+        starts, live, _, weights, norms = self._prepare()
+        query = np.zeros(len(self.vocab), dtype=np.float32)
+        query[columns] = values
+        dots = _row_sums(weights * query[self.indices], starts, self.ends)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            scores = np.where(live & (norms > 0), dots / (norms * np.linalg.norm(values)), 0.0)
+        if exclude_id is not None:
+            scores[self.ids == exclude_id] = 0.0
+
+        k = min(k, self.rows)
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return [(int(self.ids[i]), float(scores[i])) for i in best if scores[i] > 0]
+
+def _row_sums(values: "np.ndarray", starts: "np.ndarray", ends: "np.ndarray") -> "np.ndarray":
+    """Sum of each CSR row (empty rows give 0, unlike np.add.reduceat)."""
+    totals = np.concatenate(([0.0], np.cumsum(values, dtype=np.float64)))
+    return totals[ends] - totals[starts]
+
+# --- PUBLIC API ---
+_indexes: Dict[str, Index] = {}
+
+def get_index() -> Index:
+    """This process's index for the current DB, caught up with other processes' appends."""
+    path = index_dir()
+    index = _indexes.get(path)
+    if index is None:
+        index = _indexes[path] = Index(path)
+    index.refresh()
+    return index
+
+def init_tables(conn):
+    """
+    Creates the queue of places whose indexed version is out of date. Triggers
+    fill it on every insert or edit, whoever makes it (the writer, dedupe
+    merges, the sqlite3 shell); it's emptied once the new version is appended.
+    seq orders the edits, so finishing an old one never drops a newer one.
+    (Delete + insert rather than INSERT OR REPLACE: an upsert's ON CONFLICT
+    would override the trigger's conflict clause.)
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS similarity_pending (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            restaurant_id INTEGER UNIQUE
+        )
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS restaurants_similarity_insert AFTER INSERT ON restaurants BEGIN
+            DELETE FROM similarity_pending WHERE restaurant_id = new.id;
+            INSERT INTO similarity_pending (restaurant_id) VALUES (new.id);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS restaurants_similarity_update AFTER UPDATE OF name, neighborhood, notes ON restaurants BEGIN
+            DELETE FROM similarity_pending WHERE restaurant_id = new.id;
+            INSERT INTO similarity_pending (restaurant_id) VALUES (new.id);
+        END
+    ''')
+
+def _place_fields(conn, restaurant_ids: List[int]) -> Iterable[Tuple[int, Counter]]:
+    """Term counts for places straight from the DB (plus snippets that mention them), as they're read."""
+    for i in range(0, len(restaurant_ids), 500):
+        chunk = restaurant_ids[i:i + 500]
+        placeholders = ",".join("?" * len(chunk))
+        for restaurant_id, name, neighborhood, notes in conn.execute(
+            f"SELECT id, name, neighborhood, notes FROM restaurants WHERE id IN ({placeholders})", chunk
+        ).fetchall():
+            phrase = " ".join(tokenize(name))
+            snippets = conn.execute('''
+                SELECT h.content FROM search_hits_fts JOIN search_hits h ON h.id = search_hits_fts.rowid
+                WHERE search_hits_fts MATCH ? ORDER BY bm25(search_hits_fts) LIMIT ?
+            ''', (f'"{phrase}"', SNIPPETS_PER_PLACE)).fetchall() if phrase else []
+            yield restaurant_id, term_counts({
+                "name": name, "neighborhood": neighborhood, "notes": notes,
+                "snippets": " ".join(s[0] or "" for s in snippets),
+            })
+
+def _index(conn, restaurant_ids: List[int]):
+    """Appends the current version of these places, then clears the queue entries that covers."""
+    queued = []
+    for i in range(0, len(restaurant_ids), 500):
+        chunk = restaurant_ids[i:i + 500]
+        queued += conn.execute(
+            f"SELECT restaurant_id, seq FROM similarity_pending WHERE restaurant_id IN ({','.join('?' * len(chunk))})", chunk
+        ).fetchall()
+    # Fields are read after the queue (and under the index lock), so they're at least that new
+    get_index().append(_place_fields(conn, restaurant_ids))
+    conn.executemany("DELETE FROM similarity_pending WHERE restaurant_id = ? AND seq <= ?", queued)
+    conn.commit()
+
+def add_restaurants(conn, restaurant_ids: List[int]):
+    """
+    (Re)indexes these places. Called by the writer after new or changed rows
+    commit. If it fails, they stay queued for the next sync().
+    """
+    if restaurant_ids:
+        _index(conn, list(restaurant_ids))
+
+def sync(conn) -> int:
+    """
+    Indexes every queued place (failed appends, edits made outside the writer)
+    plus any row newer than the index (DBs from before the queue). Returns how many.
+    """
+    index = get_index()
+    indexed = int(index.ids.max()) if index.rows > 0 else 0
+    missing = [r[0] for r in conn.execute('''
+        SELECT restaurant_id FROM similarity_pending
+        UNION SELECT id FROM restaurants WHERE id > ?
+    ''', (indexed,))]
+    if missing:
+        _index(conn, missing)
+    return len(missing)
+
+def rebuild(conn) -> int:
+    """Rewrites the index from scratch (drops superseded rows and deleted places). Returns the row count."""
+    path = index_dir()
+    with _locked(path):
+        for filename in [f for f, _ in _FILES.values()] + ["vocab.txt"]:
+            if os.path.exists(os.path.join(path, filename)):
+                os.remove(os.path.join(path, filename))
+        # Tells other processes their vocabulary is stale
+        with open(os.path.join(path, "generation"), "w") as f:
+            f.write(uuid.uuid4().hex)
+    _indexes.pop(path, None)
+    return sync(conn)
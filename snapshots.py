@@ -0,0 +1,250 @@
+import os
+import glob
+import math
+import fcntl
+import time
+import uuid
+from typing import Dict, List, Optional
+import db
+import lazy
+
+# Only imported when a snapshot is written or read (see lazy.py)
+pa = lazy.module("pyarrow")
+pq = lazy.module("pyarrow.parquet")
+pc = lazy.module("pyarrow.compute")
+ds = lazy.module("pyarrow.dataset")
+
+# --- SNAPSHOT SETTINGS ---
+# Where the Parquet files go. Defaults to a folder next to the DB, so a
+# scratch DB (tests, benchmarks) gets scratch snapshots.
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR")
+# Rows fetched from SQLite (and written per file) at a time
+BATCH_ROWS = 50_000
+# Each export adds a file to every month it touches; past this many a month is merged into one file
+MAX_FILES_PER_PARTITION = 16
+
+# What gets exported. Each table is append-only in the snapshot: rows past the
+# high-water mark are added, rows already exported are never rewritten (so a
+# restaurant's later rating changes don't show up here; the DB stays the source
+# of truth for current values).
+#   mark: the column the high-water mark is on. It must grow in commit order
+#         (ids, target_hits.seq), so "mark > last" never misses a row. A
+#         timestamp wouldn't: a row stamped at T can commit after an export
+#         that already moved the mark past T. A mark column that isn't
+#         exported is selected last.
+#   float64 columns hold model output (ratings, scores). Anything that isn't a
+#   number ("8/10", "n/a") is exported as NULL rather than failing the export.
+EXPORTS = {
+    "restaurants": {
+        "sql": '''SELECT id, name, neighborhood, taste_rating, notes, confidence_score, created_at
+                  FROM restaurants WHERE id > ? ORDER BY id''',
+        "mark": "id", "time": "created_at",
+        "columns": [("id", "int64"), ("name", "string"), ("neighborhood", "string"), ("taste_rating", "float64"),
+                    ("notes", "string"), ("confidence_score", "float64"), ("created_at", "timestamp")],
+    },
+    "search_hits": {
+        "sql": '''SELECT id, url, title, content, content_hash, first_seen
+                  FROM search_hits WHERE id > ? ORDER BY id''',
+        "mark": "id", "time": "first_seen",
+        "columns": [("id", "int64"), ("url", "string"), ("title", "string"), ("content", "string"),
+                    ("content_hash", "string"), ("first_seen", "timestamp")],
+    },
+    # Which target each hit first turned up for: new hits per watchlist target over time
+    "target_hits": {
+        "sql": '''SELECT food_item, location, hit_id, first_seen, seq FROM target_hits
+                  WHERE seq > ? ORDER BY seq''',
+        "mark": "seq", "time": "first_seen",
+        "columns": [("food_item", "string"), ("location", "string"), ("hit_id", "int64"), ("first_seen", "timestamp")],
+    },
+}
+
+_ready_dbs = set()
+
+def snapshot_dir() -> str:
+    return SNAPSHOT_DIR or db.DB_PATH + ".parquet"
+
+def _table_dir(name: str) -> str:
+    return os.path.join(snapshot_dir(), name)
+
+def _schema(name: str):
+    types = {"int64": pa.int64(), "float64": pa.float64(), "string": pa.string(), "timestamp": pa.timestamp("s")}
+    return pa.schema([(column, types[kind]) for column, kind in EXPORTS[name]["columns"]])
+
+def _ensure_table(conn):
+    """Creates the high-water mark table once per DB file."""
+    if db.DB_PATH in _ready_dbs:
+        return
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS snapshot_marks (
+            table_name TEXT PRIMARY KEY,
+            high_water TEXT,
+            rows INTEGER DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.commit()
+    _ready_dbs.add(db.DB_PATH)
+
+def get_marks() -> Dict[str, dict]:
+    """{table: {"high_water", "rows", "updated_at"}} for every table exported so far."""
+    conn = db.get_connection()
+    try:
+        _ensure_table(conn)
+        rows = conn.execute("SELECT table_name, high_water, rows, updated_at FROM snapshot_marks").fetchall()
+    finally:
+        conn.close()
+    return {r[0]: {"high_water": r[1], "rows": r[2], "updated_at": r[3]} for r in rows}
+
+# --- EXPORT ---
+
+def _number(value) -> Optional[float]:
+    """value as a float, or None if it isn't a (finite) number."""
+    if isinstance(value, bool):
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+def _write_batch(name: str, rows: List[tuple], first_mark: int):
+    """Appends one batch as new files in its month partitions (month=YYYY-MM, or 'unknown' for NULL times)."""
+    spec = EXPORTS[name]
+    schema = _schema(name)
+    columns = list(zip(*rows))
+    arrays = []
+    for (column, kind), values in zip(spec["columns"], columns):
+        if kind == "timestamp":
+            arrays.append(pa.array(values, pa.string()).cast(schema.field(column).type))
+        elif kind == "float64":
+            arrays.append(pa.array([_number(v) for v in values], pa.float64()))
+        else:
+            arrays.append(pa.array(values, schema.field(column).type))
+    table = pa.Table.from_arrays(arrays, schema=schema)
+    month = pc.fill_null(pc.strftime(table[spec["time"]], format="%Y-%m"), "unknown")
+    table = table.append_column("month", month)
+
+    # Named after the batch's first mark. Batches start right after the saved
+    # mark, so a batch repeated after a crash (file written, mark not saved)
+    # replaces its own files with the same rows, or a superset, instead of
+    # adding duplicates.
+    pq.write_to_dataset(table, _table_dir(name), partition_cols=["month"],
+                        basename_template=f"part-{first_mark:012d}-{{i}}.parquet",
+                        existing_data_behavior="overwrite_or_ignore")
+    return set(month.unique().to_pylist())
+
+def export_table(name: str) -> int:
+    """Appends the table's rows past its high-water mark to the snapshot. Returns how many."""
+    spec = EXPORTS[name]
+    conn = db.get_connection()
+    try:
+        _ensure_table(conn)
+        row = conn.execute("SELECT high_water FROM snapshot_marks WHERE table_name = ?", (name,)).fetchone()
+        mark = row[0] if row else "0"
+        names = [c for c, _ in spec["columns"]]
+        mark_index = names.index(spec["mark"]) if spec["mark"] in names else len(names)
+
+        exported = 0
+        touched = set()
+        cursor = conn.execute(spec["sql"], (int(mark),))
+        while True:
+            rows = cursor.fetchmany(BATCH_ROWS)
+            if not rows:
+                break
+            touched |= _write_batch(name, rows, int(rows[0][mark_index]))
+            exported += len(rows)
+            last = rows[-1][mark_index]
+            # The mark moves after each batch (a crash can at worst repeat the batch in flight)
+            conn.execute('''
+                INSERT INTO snapshot_marks (table_name, high_water, rows, updated_at)
+                VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(table_name) DO UPDATE SET
+                    high_water = excluded.high_water,
+                    rows = rows + excluded.rows,
+                    updated_at = excluded.updated_at
+            ''', (name, str(last), len(rows)))
+            conn.commit()
+    finally:
+        conn.close()
+
+    for month in touched:
+        _compact_partition(name, month)
+    return exported
+
+def export() -> Dict[str, int]:
+    """
+    The export stage: appends new rows of every table. Returns {table: rows added}.
+    Exporters in other processes (e.g. several sentinel workers) wait their turn,
+    so no rows are written twice.
+    """
+    os.makedirs(snapshot_dir(), exist_ok=True)
+    with open(os.path.join(snapshot_dir(), "lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        counts = {name: export_table(name) for name in EXPORTS}
+    added = sum(counts.values())
+    if added:
+        print(f"📦 Snapshot: +{added} rows ({', '.join(f'{n} {c}' for n, c in counts.items() if c)})")
+    return counts
+
+def _compact_partition(name: str, month: str):
+    """Merges a month's files into one once there are too many (keeps scans from opening hundreds of files)."""
+    folder = os.path.join(_table_dir(name), f"month={month}")
+    files = sorted(glob.glob(os.path.join(folder, "*.parquet")))
+    if len(files) <= MAX_FILES_PER_PARTITION:
+        return
+    table = pa.concat_tables([pq.read_table(f, schema=_schema(name), memory_map=True) for f in files])
+    merged = os.path.join(folder, f"part-{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}-merged.parquet")
+    pq.write_table(table, merged + ".tmp")
+    os.replace(merged + ".tmp", merged)
+    for f in files:
+        os.remove(f)
+
+# --- READ ---
+
+def read(name: str, columns: Optional[List[str]] = None, filters=None):
+    """
+    One snapshot table as a pyarrow Table, memory-mapped (pages are read on
+    demand, only for the requested columns). `month` is available as a column
+    and as a filter, e.g. filters=[("month", ">=", "2026-01")] skips older files entirely.
+    """
+    path = _table_dir(name)
+    if not glob.glob(os.path.join(path, "month=*", "*.parquet")):
+        schema = _schema(name).append(pa.field("month", pa.string()))
+        table = schema.empty_table()
+        return table.select(columns) if columns else table
+    partitioning = ds.partitioning(pa.schema([("month", pa.string())]), flavor="hive")
+    return pq.read_table(path, columns=columns, filters=filters, memory_map=True, partitioning=partitioning)
+
+# --- CHART DATA ---
+# Columnar aggregations for the dashboard: each reads only the columns it needs.
+
+def _named(grouped, columns: Dict[str, str]):
+    """Picks and renames group_by output columns ({new name: pyarrow's name})."""
+    return pa.table({new: grouped[old] for new, old in columns.items()})
+
+def ratings_by_neighborhood():
+    """neighborhood, places, rated, avg_rating (as first discovered), busiest first."""
+    table = read("restaurants", columns=["neighborhood", "taste_rating"])
+    table = table.filter(pc.is_valid(table["neighborhood"]))
+    grouped = table.group_by("neighborhood").aggregate([
+        ("neighborhood", "count"), ("taste_rating", "count"), ("taste_rating", "mean"),
+    ])
+    grouped = _named(grouped, {"neighborhood": "neighborhood", "places": "neighborhood_count",
+                               "rated": "taste_rating_count", "avg_rating": "taste_rating_mean"})
+    return grouped.sort_by([("places", "descending"), ("neighborhood", "ascending")])
+
+def discoveries_by_month():
+    """month, discoveries: new restaurants per month."""
+    table = read("restaurants", columns=["month"])
+    grouped = table.group_by("month").aggregate([("month", "count")])
+    return _named(grouped, {"month": "month", "discoveries": "month_count"}).sort_by("month")
+
+def target_activity(unit: str = "week"):
+    """target ("food @ location"), period, new_hits: fresh search hits per watchlist target over time."""
+    table = read("target_hits", columns=["food_item", "location", "first_seen"])
+    target = pc.binary_join_element_wise(table["food_item"], table["location"], " @ ")
+    period = pc.floor_temporal(table["first_seen"], unit=unit, week_starts_monday=True)
+    table = pa.table({"target": target, "period": period})
+    grouped = table.group_by(["target", "period"]).aggregate([("target", "count")])
+    grouped = _named(grouped, {"target": "target", "period": "period", "new_hits": "target_count"})
+    return grouped.sort_by([("period", "ascending"), ("target", "ascending")])
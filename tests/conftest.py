@@ -0,0 +1,14 @@
+import sys
+import os
+import pytest
+
+# Add parent folder to path so we can import the app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+
+@pytest.fixture(autouse=True)
+def scratch_db(tmp_path, monkeypatch):
+    """Points every module at a throwaway foodie_memory.db so tests never touch the real one."""
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "foodie_memory.db"))
+    return db.DB_PATH
@@ -1,9 +1,11 @@
 import sys
 import os
+import sqlite3
 import unittest
 from unittest.mock import patch, MagicMock
 
 # Add parent folder to path so we can import backend
+import db
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import backend
@@ -12,7 +14,7 @@ class TestFoodieBrain(unittest.TestCase):
 
     # TEST 1: The "Happy Path" (Everything works)
     @patch('backend.genai.Client') 
-    @patch('backend.TavilyClient')
+    @patch('clients.TavilySearch')
     def test_search_and_analyze_success(self, mock_tavily, mock_genai_client):
         """
         Test updated for Google GenAI SDK v1.0+
@@ -62,5 +64,284 @@ class TestFoodieBrain(unittest.TestCase):
             # Should return empty list, not crash
             self.assertEqual(results, [])
 
+    # TEST 3: Memoized extraction (Same sources -> no second LLM call)
+    @patch('backend.quota.acquire', return_value=0)
+    @patch('backend.genai.Client')
+    def test_unchanged_prompt_skips_llm(self, mock_genai_client, mock_acquire):
+        mock_models = mock_genai_client.return_value.models
+        mock_response = MagicMock()
+        mock_response.text = '[{"name": "Pizza Nova", "neighborhood": "Markham", "taste_rating": 8, "notes": "Classic", "confidence_score": 9}]'
+        mock_models.generate_content.return_value = mock_response
+        hits = [{'title': 'Pizza Guide', 'content': 'Pizza Nova is the best.'}]
+
+        first = backend.analyze_hits("Pizza", "Markham", hits)
+        second = backend.analyze_hits("Pizza", "Markham", hits)
+        self.assertEqual(mock_models.generate_content.call_count, 1)
+        self.assertEqual([c.name for c in second], [c.name for c in first])
+
+        # Changing the prompt version invalidates the memo
+        with patch('backend.PROMPT_VERSION', 'v-next'):
+            backend.analyze_hits("Pizza", "Markham", hits)
+        self.assertEqual(mock_models.generate_content.call_count, 2)
+
+        # A truncated answer is used, but not memoized: the same prompt asks again
+        mock_response.text = mock_response.text[:-1] + ', {"name": "Broken'
+        other = [{'title': 'Pizza Guide', 'content': 'Pizza Nova and more.'}]
+        self.assertEqual([c.name for c in backend.analyze_hits("Pizza", "Markham", other)], ["Pizza Nova"])
+        backend.analyze_hits("Pizza", "Markham", other)
+        self.assertEqual(mock_models.generate_content.call_count, 4)
+        self.assertEqual(backend.unseen_hits("Pizza", "Markham", other), other)
+
+        # Extra keys and malformed items don't cost the rest of the answer
+        mock_response.text = ('[{"name": "Pizza Nova", "neighborhood": "Markham", "taste_rating": 8, "notes": "Classic",'
+                              ' "confidence_score": 9, "address": "1 Main St"}, "oops",'
+                              ' {"name": "Odd", "confidence_score": "high"}]')
+        third = [{'url': 'https://pizza', 'title': 'Pizza Guide', 'content': 'Pizza Nova, again.'}]
+        backend.record_search_hits(third, "Pizza", "Markham")
+        self.assertEqual([c.name for c in backend.analyze_hits("Pizza", "Markham", third)], ["Pizza Nova"])
+        self.assertEqual(backend.unseen_hits("Pizza", "Markham", third), [])
+
+    # TEST 4: Batched extraction (One call for several targets, per-target fallback)
+    @patch('backend.quota.acquire', return_value=0)
+    @patch('backend.genai.Client')
+    def test_batch_extraction_splits_and_falls_back(self, mock_genai_client, mock_acquire):
+        mock_models = mock_genai_client.return_value.models
+        batch_response = MagicMock()
+        batch_response.text = """```json
+        {"g0": [{"name": "Pizza Nova", "neighborhood": "Markham", "taste_rating": 8, "notes": "Classic", "confidence_score": 9}],
+         "g1": [{"name": "Yang's", "neighborhood": "Richmond Hill", "taste_rating": 9, "notes": "Har gow", "confidence_score": 8}]}
+        ```"""
+        single_response = MagicMock()
+        single_response.text = '[{"name": "Kinton", "neighborhood": "North York", "taste_rating": 7, "notes": "Pork", "confidence_score": 7}]'
+        mock_models.generate_content.side_effect = [batch_response, single_response]
+
+        results = backend.analyze_batch([
+            ("Pizza", "Markham", [{'title': 'a', 'content': 'Pizza Nova'}]),
+            ("Dim Sum", "Richmond Hill", [{'title': 'b', 'content': "Yang's"}]),
+            ("Burger", "Vaughan", []),
+            ("Ramen", "North York", [{'title': 'c', 'content': 'Kinton'}]),  # g2 missing -> own call
+        ])
+
+        self.assertEqual([[c.name for c in r] for r in results],
+                         [["Pizza Nova"], ["Yang's"], [], ["Kinton"]])
+        self.assertEqual(mock_models.generate_content.call_count, 2)
+
+        # A refused batch call (quota, open circuit) isn't retried target by target
+        targets = [("Pho", "Markham", [{'title': 'd', 'content': 'Pho Hung'}]),
+                   ("Tacos", "Vaughan", [{'title': 'e', 'content': 'La Carnita'}])]
+        with patch('backend.generate_with_retry', return_value=None) as generate:
+            self.assertEqual(backend.analyze_batch(targets), [None, None])
+        self.assertEqual(generate.call_count, 1)
+
+    # TEST 5: Bulk writer (one transaction, per-row outcomes, upserts)
+    def test_save_restaurants_reports_outcomes(self):
+        first = backend.save_restaurants([
+            backend.RestaurantCandidate("Pizza Nova", "Markham", 7, "Classic slice", 6),
+            backend.RestaurantCandidate("Yang's", "Richmond Hill", 9, "Har gow", 9),
+        ])
+        self.assertEqual(first, [("Pizza Nova", "inserted"), ("Yang's", "inserted")])
+
+        second = backend.save_restaurants([
+            backend.RestaurantCandidate("Pizza Nova", "Markham", 8, "Better crust now", 8),
+            backend.RestaurantCandidate("Yang's", "Richmond Hill", 9, "Har gow", 9),
+            backend.RestaurantCandidate("Yang's", "Richmond Hill", 4, "One bad visit", 5),  # less confident
+        ])
+        self.assertEqual([o for _, o in second], ["updated", "duplicate", "duplicate"])
+        self.assertEqual(backend.save_restaurant(backend.RestaurantCandidate("Kinton", "North York", 7, "Pork", 7)), "inserted")
+
+    def test_init_db_upgrades_legacy_table(self):
+        # The table food_agent.py used to create: no confidence_score / created_at
+        conn = sqlite3.connect(db.DB_PATH)
+        conn.execute("CREATE TABLE restaurants (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, neighborhood TEXT, taste_rating INTEGER, notes TEXT)")
+        conn.executemany("INSERT INTO restaurants (name, taste_rating, notes) VALUES (?, ?, ?)",
+                         [("Pizza Nova", None, "Cheap"), ("Pizza Nova", 7, "Good crust")])
+        conn.commit()
+        conn.close()
+
+        backend.init_db()
+        # Duplicates are merged, not dropped: the later row's rating and notes survive
+        rows = backend.get_all_restaurants()
+        self.assertEqual([(r["taste_rating"], r["notes"]) for r in rows], [(7, "Cheap | Good crust")])
+        outcome = backend.save_restaurant(backend.RestaurantCandidate("Pizza Nova", "Markham", 8, "Slice", 9))
+        self.assertEqual(outcome, "updated")
+
+    # TEST 6: Keyset-paginated reads
+    def test_keyset_pages_cover_everything_once(self):
+        spots = [backend.RestaurantCandidate(f"Spot {i:02d}", "Markham" if i % 2 else "Vaughan", i % 10, "n", 9)
+                 for i in range(25)]
+        backend.save_restaurants(spots)
+
+        seen = []
+        rows, cursor = backend.get_restaurants_page(sort="top_rated", limit=10)
+        seen.extend(rows)
+        while cursor:
+            rows, cursor = backend.get_restaurants_page(sort="top_rated", limit=10, after=cursor)
+            seen.extend(rows)
+        self.assertEqual(len({r["name"] for r in seen}), 25)
+        ratings = [r["taste_rating"] for r in seen]
+        self.assertEqual(ratings, sorted(ratings, reverse=True))
+
+        markham = list(backend.iter_restaurants(page_size=4, neighborhood="Markham", min_rating=5, sort="name"))
+        self.assertEqual([r["name"] for r in markham], ["Spot 05", "Spot 07", "Spot 09", "Spot 15", "Spot 17", "Spot 19"])
+
+    # TEST 7: DB-backed watchlist + change detection for the dashboard cache
+    def test_watchlist_and_change_watcher(self):
+        watcher = backend.ChangeWatcher()
+        before = watcher.version()
+        self.assertEqual(len(backend.get_watchlist()), len(backend.DEFAULT_WATCHLIST))
+        self.assertEqual(watcher.version(), before)  # reads don't count as changes
+
+        self.assertIn("✅", backend.add_to_watchlist("Omakase", "Markham"))
+        self.assertIn("⚠️", backend.add_to_watchlist("Omakase", "Markham"))
+        self.assertEqual(backend.get_watchlist()[-1]["food_item"], "Omakase")
+        self.assertGreater(watcher.version(), before)
+
+    # TEST 8: Full-text search over restaurants + captured snippets
+    def test_search_memory_ranks_fts_matches(self):
+        backend.save_restaurants([
+            backend.RestaurantCandidate("Chef's Noodle House", "Richmond Hill", 8, "Hand-pulled noodles, lamb", 8),
+            backend.RestaurantCandidate("Pizza Nova", "Markham", 7, "Classic slice", 7),
+        ])
+        backend.record_search_hits([
+            {"url": "https://blogto.com/a", "title": "Noodles on Highway 7", "content": "The hand pulled noodles at this Highway 7 plaza are worth the trip."},
+            {"url": "https://blogto.com/b", "title": "Pizza guide", "content": "Thin crust everywhere."},
+        ])
+
+        results = backend.search_memory("hand-pulled noodles near Highway 7")
+        self.assertEqual([r["name"] for r in results["restaurants"]], ["Chef's Noodle House"])
+        self.assertEqual(results["snippets"][0]["url"], "https://blogto.com/a")
+        self.assertIn("[", results["snippets"][0]["snippet"])
+
+        # Triggers keep the index in sync with updates
+        backend.save_restaurant(backend.RestaurantCandidate("Pizza Nova", "Markham", 8, "Now with noodles?", 9))
+        self.assertEqual(len(backend.search_memory("noodles")["restaurants"]), 2)
+        self.assertEqual(backend.search_memory("the near"), {"restaurants": [], "snippets": []})
+
+    # TEST 9: Stored hits (only new/changed hits go to the LLM, replay needs no search)
+    @patch('backend.quota.acquire', return_value=0)
+    @patch('backend.genai.Client')
+    @patch('backend.search_sources')
+    def test_unchanged_hits_skip_llm_and_replay(self, mock_search, mock_genai_client, mock_acquire):
+        mock_models = mock_genai_client.return_value.models
+        mock_response = MagicMock()
+        mock_response.text = '[{"name": "Kinton Ramen", "neighborhood": "North York", "taste_rating": 8, "notes": "Pork", "confidence_score": 9}]'
+        mock_models.generate_content.return_value = mock_response
+
+        hits = [{"url": "https://a", "title": "A", "content": "Kinton Ramen is great."},
+                {"url": "https://b", "title": "B", "content": "Nothing here."}]
+        mock_search.side_effect = lambda food, loc, bypass=False: (backend.record_search_hits(hits, food, loc), hits)[1]
+
+        backend.analyze_hits("Ramen", "North York", backend.search_new_hits("Ramen", "North York"))
+        self.assertEqual(backend.search_new_hits("Ramen", "North York"), [])
+
+        # Same URL, new content -> only that hit is sent
+        hits[1] = {"url": "https://b", "title": "B", "content": "Now Santouka too."}
+        self.assertEqual(backend.search_new_hits("Ramen", "North York"), [hits[1]])
+
+        stored = backend.get_stored_hits("Ramen", "North York")
+        self.assertEqual(sorted(h["content"] for h in stored), ["Kinton Ramen is great.", "Now Santouka too."])
+        self.assertEqual(backend.get_hit_targets(), [("Ramen", "North York")])
+
+        calls = mock_models.generate_content.call_count
+        with patch('backend.PROMPT_VERSION', 'v2'):
+            replayed = backend.replay_target("Ramen", "North York")
+        self.assertEqual([c.name for c in replayed], ["Kinton Ramen"])
+        self.assertEqual(mock_models.generate_content.call_count, calls + 1)
+        self.assertEqual(mock_search.call_count, 3)  # replay never searched
+
+    # TEST 10: Streaming extraction (candidates arrive one by one, broken tail tolerated)
+    @patch('backend.quota.acquire', return_value=0)
+    @patch('backend.genai.Client')
+    def test_stream_hits_yields_before_a_broken_tail(self, mock_genai_client, mock_acquire):
+        chunks = ['```json\n[{"name": "Kinton Ramen", "neighborhood": "North York", "taste_rating": 8, ',
+                  '"notes": "Pork", "confidence_score": 9}, {"name": "Santouka", "neigh',
+                  'borhood": "North York", "taste_rating": 9, "notes": "Shio", "confidence_score": 8},',
+                  ' {"name": "Broken", "taste_']
+        mock_genai_client.return_value.models.generate_content_stream.return_value = \
+            [MagicMock(text=c, usage_metadata=None) for c in chunks]
+        hits = [{"url": "https://a", "title": "A", "content": "Kinton Ramen and Santouka are great."}]
+
+        stream = backend.stream_hits("Ramen", "North York", hits)
+        self.assertEqual(next(stream).name, "Kinton Ramen")
+        self.assertEqual([c.name for c in stream], ["Santouka"])
+
+        # A memoized answer that doesn't convert leaves the hits for the next run
+        backend.record_search_hits(hits, "Ramen", "North York")
+        prompt = backend.build_prompt("Ramen", backend.compaction.compact_hits(hits, "Ramen", "North York"))
+        backend.memo.store(backend.MODEL_NAME, prompt, backend.PROMPT_VERSION, 42)
+        self.assertEqual(list(backend.stream_hits("Ramen", "North York", hits)), [])
+        self.assertEqual(backend.unseen_hits("Ramen", "North York", hits), hits)
+
+        # Non-streaming parse salvages the same objects
+        salvaged = backend.parse_candidates_json("".join(chunks) + "\nSorry, ran out of space!")
+        self.assertEqual([d["name"] for d in salvaged], ["Kinton Ramen", "Santouka"])
+    # TEST 11: Bounded agent memory (top-k recall + trigger-maintained neighborhood summary)
+    def test_recall_is_ranked_and_summary_stays_in_sync(self):
+        backend.save_restaurants([
+            backend.RestaurantCandidate("Santouka", "Markham", 9, "Shio ramen, rich broth", 8),
+            backend.RestaurantCandidate("Kinton Ramen", "North York", 8, "Pork ramen", 8),
+            backend.RestaurantCandidate("Pizza Nova", "Markham", 6, "Classic slice", 7),
+            backend.RestaurantCandidate("Congee Queen", "Markham", None, "Late night congee", 5),
+        ])
+
+        rows = backend.recall_restaurants("ramen", "Markham", limit=2)
+        self.assertEqual([r["name"] for r in rows], ["Santouka", "Kinton Ramen"])
+        self.assertEqual(len(backend.recall_restaurants("ramen", "Markham", limit=1)), 1)
+        # A location word in the notes or a dish word in the neighborhood doesn't count
+        backend.save_restaurants([
+            backend.RestaurantCandidate("Hot Pot Hero", "Ramen Alley", 9, "Best in Markham, they say", 8),
+        ])
+        self.assertEqual([r["name"] for r in backend.recall_restaurants("ramen", "Markham", limit=2)],
+                         ["Santouka", "Kinton Ramen"])
+        self.assertNotIn("Hot Pot Hero", [r["name"] for r in backend.recall_restaurants("ramen", "", limit=5)])
+        self.assertEqual([r["name"] for r in backend.recall_restaurants("", "Markham", limit=5)],
+                         ["Santouka", "Pizza Nova", "Congee Queen"])
+
+        summary = backend.get_neighborhood_summaries("markham")[0]
+        self.assertEqual(summary, {"neighborhood": "Markham", "restaurants": 3,
+                                   "avg_rating": 7.5, "top": ["Santouka", "Pizza Nova", "Congee Queen"]})
+
+        # Updates and deletes adjust the counts in place
+        backend.save_restaurant(backend.RestaurantCandidate("Pizza Nova", "Markham", 8, "Better crust now", 9))
+        conn = db.get_connection()
+        conn.execute("DELETE FROM restaurants WHERE name = 'Congee Queen'")
+        conn.commit()
+        conn.close()
+        summary = backend.get_neighborhood_summaries("Markham")[0]
+        self.assertEqual((summary["restaurants"], summary["avg_rating"]), (2, 8.5))
+
+        # Existing DBs get their summary backfilled on upgrade
+        conn = db.get_connection()
+        for trigger in ("insert", "delete", "update"):
+            conn.execute(f"DROP TRIGGER neighborhood_summary_{trigger}")
+        conn.execute("DROP TABLE neighborhood_summary")
+        conn.commit()
+        conn.close()
+        backend.init_db()
+        self.assertEqual(backend.get_neighborhood_summaries("North York")[0]["restaurants"], 1)
+
+    # TEST 12: A fallback model's answer is memoized under its own name, not the primary's
+    @patch('backend.quota.acquire', return_value=0)
+    @patch('backend.genai.Client')
+    def test_fallback_answer_not_memoized_as_primary(self, mock_genai_client, mock_acquire):
+        fallback = "gemini-fallback"
+        answer = MagicMock(text='[{"name": "Pizza Nova", "neighborhood": "Markham", "taste_rating": 8, "notes": "Classic", "confidence_score": 9}]')
+
+        def generate(model, contents):
+            if model == backend.MODEL_NAME:
+                raise RuntimeError("primary is down")
+            return answer
+
+        mock_genai_client.return_value.models.generate_content.side_effect = generate
+        hits = [{'title': 'Pizza Guide', 'content': 'Pizza Nova is the best.'}]
+        backend.router.reset()
+        with patch.object(backend.router, "MODELS", [backend.MODEL_NAME, fallback]):
+            self.assertEqual([c.name for c in backend.analyze_hits("Pizza", "Markham", hits)], ["Pizza Nova"])
+        backend.router.reset()
+
+        prompt = backend.build_prompt("Pizza", backend.compaction.compact_hits(hits, "Pizza", "Markham"))
+        self.assertIsNone(backend.memo.lookup(backend.MODEL_NAME, prompt, backend.PROMPT_VERSION))
+        self.assertIsNotNone(backend.memo.lookup(fallback, prompt, backend.PROMPT_VERSION))
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,34 @@
+import sys
+import os
+import unittest
+
+# Add parent folder to path so we can import benchmark
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import benchmark
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_offline_run_reports_every_stage(self):
+        report = benchmark.run_benchmark(targets=10, time_scale=0, rate_429=0.2, batch_size=2)
+
+        self.assertEqual(report["api_calls"]["tavily"], 10)
+        self.assertGreater(report["discoveries"], 0)
+        self.assertEqual(report["db_rows_written"], report["discoveries"])
+        for stage in ["search", "extract", "llm", "save"]:
+            self.assertIn("p99_ms", report["stages"][stage])
+
+        single = benchmark.run_benchmark(targets=3, mode="search_and_analyze", time_scale=0)
+        self.assertEqual(single["api_calls"]["gemini"], 3)
+
+    def test_baseline_comparison(self):
+        baseline = {"targets_per_min": 1000, "api_calls_per_discovery": 1.0,
+                    "stages": {"llm": {"p95_ms": 100}}}
+        same = {"targets_per_min": 990, "api_calls_per_discovery": 1.0, "stages": {"llm": {"p95_ms": 105}}}
+        worse = {"targets_per_min": 500, "api_calls_per_discovery": 2.0, "stages": {"llm": {"p95_ms": 300}}}
+
+        self.assertEqual(benchmark.compare(same, baseline), [])
+        self.assertEqual(len(benchmark.compare(worse, baseline)), 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import sys
+import os
+import time
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+# Add parent folder to path so we can import clients
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import clients
+import quota
+import search_cache
+import requests
+
+def run_threads(n, fn):
+    results = [None] * n
+    def worker(i):
+        try:
+            results[i] = fn()
+        except Exception as e:
+            results[i] = e
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+class TestClients(unittest.TestCase):
+
+    def test_clients_are_reused(self):
+        with patch('clients.TavilySearch') as factory:
+            self.assertIs(clients.tavily_client("k1"), clients.tavily_client("k1"))
+            clients.tavily_client("k2")
+            self.assertEqual(factory.call_count, 2)
+
+    def test_tavily_search_uses_pooled_session(self):
+        response = MagicMock(status_code=200)
+        response.json.return_value = {"results": []}
+        with patch.object(clients._http(), "post", return_value=response) as post:
+            client = clients.TavilySearch("key")
+            self.assertEqual(client.search("ramen", max_results=3, topic=None), {"results": []})
+            self.assertIs(clients._http(), clients._http())
+        url = post.call_args.args[0]
+        self.assertEqual(url, clients.TAVILY_URL + "/search")
+        self.assertEqual(post.call_args.kwargs["json"], {"query": "ramen", "max_results": 3})
+        self.assertEqual(post.call_args.kwargs["headers"]["Authorization"], "Bearer key")
+
+    def test_tavily_errors_keep_status(self):
+        response = MagicMock(status_code=429, reason="Too Many Requests")
+        response.json.return_value = {"detail": {"error": "Rate limit exceeded"}}
+        with patch.object(clients._http(), "post", return_value=response):
+            with self.assertRaises(requests.HTTPError) as caught:
+                clients.TavilySearch("key").search("ramen")
+        self.assertTrue(quota.is_quota_error(caught.exception))
+        self.assertIn("Rate limit exceeded", str(caught.exception))
+
+    def test_singleflight_shares_one_call(self):
+        calls = []
+        def slow():
+            calls.append(1)
+            time.sleep(0.1)
+            return {"answer": 42}
+
+        results = run_threads(5, lambda: clients.singleflight("same", slow))
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(r == {"answer": 42} for r in results))
+
+        def broken():
+            time.sleep(0.05)
+            raise RuntimeError("upstream down")
+        results = run_threads(3, lambda: clients.singleflight("broken", broken))
+        self.assertTrue(all(isinstance(r, RuntimeError) for r in results))
+        self.assertEqual(clients.singleflight("same", lambda: "fresh"), "fresh")  # nothing left in flight
+
+    @patch('search_cache.quota.acquire', return_value=0)
+    def test_concurrent_identical_searches_go_upstream_once(self, mock_acquire):
+        client = MagicMock()
+        client.search.side_effect = lambda q, **kw: (time.sleep(0.1), {"results": [{"title": q}]})[1]
+
+        results = run_threads(4, lambda: search_cache.search(client, "best ramen in north york", bypass=True))
+        self.assertEqual(client.search.call_count, 1)
+        self.assertTrue(all(r == {"results": [{"title": "best ramen in north york"}]} for r in results))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+import sys
+import os
+import unittest
+
+# Add parent folder to path so we can import coldstart
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import coldstart
+
+IMPORTTIME = """import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   google.genai.types
+import time:       300 |        420 | google.genai
+import time:      1000 |       1000 | mcp
+"""
+
+class TestColdStart(unittest.TestCase):
+
+    def test_parses_importtime_output(self):
+        rows = coldstart.parse_importtime(IMPORTTIME)
+        self.assertEqual([(r["module"], r["depth"]) for r in rows],
+                         [("google.genai.types", 1), ("google.genai", 0), ("mcp", 0)])
+        self.assertEqual(coldstart.by_package(rows), [("mcp", 1.0), ("google", 0.4)])
+
+    def test_backend_starts_without_heavy_sdks(self):
+        report = coldstart.measure("backend", runs=1)
+        self.assertEqual(report["heavy_modules"], [])
+        self.assertGreater(report["first_response_ms"], 0)
+
+        slow = {**report, "first_response_ms": report["budget_ms"] + 1, "heavy_modules": ["numpy"]}
+        self.assertEqual(len(coldstart.check(slow)), 2)
+
+if __name__ == '__main__':
+    unittest.main()
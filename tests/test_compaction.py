@@ -0,0 +1,54 @@
+import sys
+import os
+import unittest
+from unittest.mock import patch
+
+# Add parent folder to path so we can import compaction
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import compaction
+
+HITS = [
+    {"url": "https://a", "title": "Ramen guide",
+     "content": "Kinton Ramen in North York serves the best pork broth. We use cookies to improve your experience. "
+                "Subscribe to our newsletter! The parking lot is small."},
+    {"url": "https://b", "title": "Reddit thread",
+     "content": "Kinton Ramen in North York serves the best pork broth! Santouka opened a new spot on Yonge."},
+    {"url": "https://c", "title": "Footer", "content": "© 2024 All rights reserved. Click here to sign in."},
+]
+
+class TestCompaction(unittest.TestCase):
+
+    def test_drops_boilerplate_and_near_duplicates(self):
+        out = compaction.compact_hits(HITS, "Ramen", "North York", budget=1000)
+        text = " ".join(h["content"] for h in out)
+
+        self.assertEqual(text.count("Kinton Ramen"), 1)
+        self.assertIn("Santouka opened a new spot", text)
+        self.assertNotIn("cookies", text)
+        self.assertNotIn("newsletter", text)
+        self.assertEqual([h["url"] for h in out], ["https://a", "https://b"])  # footer-only hit dropped
+
+        # Same template, different restaurant: both kept
+        twins = [{"title": "t", "content": "Kinton Ramen serves the best broth in town. Santouka serves the best broth in town."}]
+        self.assertIn("Santouka", compaction.compact_hits(twins, "Ramen", "Toronto")[0]["content"])
+
+    def test_budget_keeps_most_relevant_sentences(self):
+        full = compaction.compact_hits(HITS, "Ramen", "North York", budget=1000)
+        tight = compaction.compact_hits(HITS, "Ramen", "North York", budget=40)
+        tight_text = " ".join(h["content"] for h in tight)
+
+        self.assertLess(sum(len(h["content"]) for h in tight), sum(len(h["content"]) for h in full))
+        self.assertIn("Kinton Ramen", tight_text)
+        self.assertNotIn("parking lot", tight_text)
+
+    def test_token_counting_falls_back_offline(self):
+        with patch.object(compaction, "_encoding", False):
+            self.assertEqual(compaction.count_tokens("x" * 40), 11)
+
+        before = compaction.get_stats()["calls"]
+        compaction.record_call(100, 20)
+        self.assertEqual(compaction.get_stats()["calls"], before + 1)
+
+if __name__ == '__main__':
+    unittest.main()
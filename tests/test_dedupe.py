@@ -0,0 +1,84 @@
+import sys
+import os
+import unittest
+
+# Add parent folder to path so we can import dedupe
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import backend
+import db
+import dedupe
+
+class TestDedupe(unittest.TestCase):
+
+    def test_normalize_name(self):
+        for variant in ["Pizza Nova", "PIZZA NOVA", "Pizza Nova (Markham)", "pizza-nova!", "The Pizza Nova Restaurant"]:
+            self.assertEqual(dedupe.normalize_name(variant), "pizza nova")
+        self.assertEqual(dedupe.normalize_name("Pizza Nova Markham", "Markham"), "pizza nova")
+        self.assertEqual(dedupe.normalize_name("Café Crêpe"), "cafe crepe")
+
+    def test_variants_are_saved_once(self):
+        outcomes = backend.save_restaurants([
+            backend.RestaurantCandidate("Pizza Nova", "Markham", 7, "Slice", 7),
+            backend.RestaurantCandidate("PIZZA NOVA", "Markham", 7, "Slice", 7),
+            backend.RestaurantCandidate("Pizza Nova (Markham)", "Markham", 8, "Better slice", 9),
+            backend.RestaurantCandidate("Pizzeria Novella", "Markham", 6, "Different place", 6),
+            backend.RestaurantCandidate("Kinton Ramen", "North York", 8, "Pork", 8),
+            backend.RestaurantCandidate("Kinton Ramen Co", "North York", 8, "Pork", 8),
+        ])
+        self.assertEqual([o for _, o in outcomes],
+                         ["inserted", "duplicate", "updated", "inserted", "inserted", "duplicate"])
+        self.assertEqual(backend.count_restaurants(), 3)
+
+    def test_compaction_merges_existing_duplicates(self):
+        backend.init_db()
+        conn = db.get_connection()
+        # Rows written before the matcher existed (straight into the table)
+        conn.executemany(
+            "INSERT INTO restaurants (name, neighborhood, taste_rating, notes, confidence_score) VALUES (?, ?, ?, ?, ?)",
+            [("Yang's Restaurant", "Richmond Hill", 7, "Har gow", 6),
+             ("YANG'S", "Richmond Hill", 9, "Best dim sum", 9),
+             ("Dragon Boat Fusion", "Markham", 8, "Lobster", 8)]
+        )
+        conn.commit()
+        conn.close()
+
+        merged = backend.compact_duplicates()
+        self.assertEqual(merged, [("Yang's Restaurant", "YANG'S")])
+        rows = {r["name"]: r for r in backend.iter_restaurants()}
+        self.assertEqual(set(rows), {"Yang's Restaurant", "Dragon Boat Fusion"})
+        self.assertEqual(rows["Yang's Restaurant"]["taste_rating"], 9)
+        self.assertIn("Best dim sum", rows["Yang's Restaurant"]["notes"])
+
+    def test_rows_changed_outside_the_writer_are_matched(self):
+        backend.save_restaurants([backend.RestaurantCandidate("Kinton Ramen", "North York", 8, "Pork", 8)])
+        conn = db.get_connection()
+        conn.execute("UPDATE restaurants SET name = 'Santouka Ramen' WHERE name = 'Kinton Ramen'")
+        conn.execute("INSERT INTO restaurants (name, neighborhood) VALUES ('Pizza Nova', 'Markham')")
+        conn.commit()
+        conn.close()
+
+        outcomes = backend.save_restaurants([
+            backend.RestaurantCandidate("SANTOUKA RAMEN", "North York", 9, "Shio", 9),
+            backend.RestaurantCandidate("Pizza Nova (Markham)", "Markham", 7, "Slice", 7),
+            backend.RestaurantCandidate("Kinton Ramen", "North York", 8, "Pork", 8),
+        ])
+        self.assertEqual([o for _, o in outcomes], ["updated", "updated", "inserted"])
+        self.assertEqual(backend.count_restaurants(), 3)
+
+    def test_common_grams_dont_crowd_out_the_match(self):
+        backend.init_db()
+        conn = db.get_connection()
+        grams = sorted(dedupe.name_grams("sushi masaki saito"))
+        # Hundreds of unrelated places that each share one gram: every gram is common
+        fillers = range(1000, 1000 + 25 * len(grams))
+        conn.executemany("INSERT INTO restaurant_keys (restaurant_id, norm_name, gram_count) VALUES (?, 'filler', 50)",
+                         [(i,) for i in fillers])
+        conn.executemany("INSERT INTO restaurant_grams (gram, restaurant_id) VALUES (?, ?)",
+                         [(grams[i % len(grams)], i) for i in fillers])
+        dedupe.index_name(conn, 9999, "Sushi Masaki Saitou")
+        self.assertEqual(dedupe.find_match(conn, "Sushi Masaki Saito"), 9999)
+        conn.close()
+
+if __name__ == '__main__':
+    unittest.main()
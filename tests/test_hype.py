@@ -0,0 +1,44 @@
+import sys
+import os
+import unittest
+
+# Add parent folder to path so we can import hype
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import hype
+import analyst
+
+class TestHypeScorer(unittest.TestCase):
+
+    def test_matches_the_original_scores(self):
+        self.assertEqual(analyst.main("This is a revolutionary agentic boom"), {"hype_score": 30})
+        self.assertEqual(analyst.main(""), {"hype_score": 0})
+        # Each keyword counts once, case-insensitive
+        self.assertEqual(hype.score_text("BOOM boom Boom"), 10)
+
+    def test_word_boundary_modes(self):
+        text = "A transformative kaboom"
+        self.assertEqual(hype.HypeScorer(match="prefix").score(text), 10)     # transform-ative
+        self.assertEqual(hype.HypeScorer(match="word").score(text), 0)
+        self.assertEqual(hype.HypeScorer(match="substring").score(text), 20)  # ka-boom too
+
+    def test_substring_counts_nested_and_overlapping_keywords(self):
+        scorer = hype.HypeScorer({"transform": 10, "form": 5, "trans": 3, "formation": 7}, match="substring")
+        # Same as checking each keyword with `in`
+        for text in ["transform", "transformation", "a formation", "nothing"]:
+            expected = sum(points for w, points in scorer.weights.items() if w in text)
+            self.assertEqual(scorer.score(text), expected, text)
+        self.assertEqual(hype.HypeScorer({"transform": 10, "trans": 3}).score("transformative"), 13)
+
+    def test_custom_weights_and_cap(self):
+        scorer = hype.HypeScorer({"Moonshot": 60, "disrupt": 50}, cap=100)
+        self.assertEqual(scorer.score("a moonshot to disrupt everything"), 100)
+        self.assertEqual(scorer.score("a moonshot"), 60)
+
+    def test_batch_matches_one_at_a_time(self):
+        docs = ["revolutionary breakthrough", None, "", "the future is agentic", "nothing here", "boom"] * 50
+        self.assertEqual(hype.score_batch(docs), [hype.score_text(d) for d in docs])
+        self.assertEqual(hype.score_batch([]), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+import sys
+import os
+import json
+import unittest
+
+# Add parent folder to path so we can import jsonstream
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jsonstream
+
+class TestJsonStream(unittest.TestCase):
+
+    def test_objects_come_out_as_soon_as_they_close(self):
+        text = '```json\n[{"name": "Kinton {Ramen}", "notes": "say \\"wow\\""}, {"name": "Santouka", "tags": [1, 2]}]\n```'
+        parser = jsonstream.ArrayObjectParser()
+        seen = []
+        for i in range(len(text)):  # one character at a time
+            seen.extend(o["name"] for o in parser.feed(text[i]))
+            if text[i] == "}" and text[i - 1] == '"' and not seen:
+                self.fail("first object not emitted when it closed")
+        self.assertEqual(seen, ["Kinton {Ramen}", "Santouka"])
+        self.assertTrue(parser.finished)
+
+    def test_keeps_good_objects_around_bad_ones(self):
+        text = '[{"name": "A"}, {"name": "B",}, {"name": "C"}, {"name": "D", "notes": "cut o'
+        self.assertEqual([o["name"] for o in jsonstream.parse_objects(text)], ["A", "C"])
+
+        text = json.dumps([{"name": "A"}]) + "\nHope this helps! [not json]"
+        self.assertEqual(list(jsonstream.iter_objects([text[:5], text[5:]])), [{"name": "A"}])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import sys
+import os
+import json
+import asyncio
+import tempfile
+import unittest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+
+# Add parent folder to path so we can import metrics
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import backend
+import metrics
+import sentinel
+import server
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        metrics.reset()
+
+    def test_spans_and_counters_render_as_prometheus(self):
+        with metrics.span("llm"):
+            pass
+        with self.assertRaises(ValueError), metrics.span("parse"):
+            raise ValueError("bad json")
+        metrics.inc("api_calls", service="gemini")
+        metrics.flush()
+        metrics.inc("api_calls", 2, service="gemini")  # e.g. another process, flushed later
+
+        text = metrics.render_prometheus()
+        self.assertIn("# TYPE foodie_stage_seconds histogram", text)
+        self.assertIn('foodie_stage_seconds_count{stage="llm"} 1', text)
+        self.assertIn('foodie_stage_seconds_bucket{le="+Inf",stage="parse"} 1', text)
+        self.assertIn('foodie_stage_errors_total{stage="parse"} 1', text)
+        self.assertIn('foodie_api_calls_total{service="gemini"} 3', text)
+
+    def test_json_log(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "metrics.jsonl")
+            with patch.object(metrics, "LOG_TARGET", path):
+                with metrics.span("search", target="Ramen"):
+                    pass
+            record = json.loads(open(path).read())
+        self.assertEqual((record["event"], record["stage"], record["target"], record["ok"]),
+                         ("span", "search", "Ramen", True))
+
+    def test_server_endpoint_and_profiled_run(self):
+        watchlist = [{"food_item": f"Dish {i}", "location": "Markham"} for i in range(3)]
+        with tempfile.TemporaryDirectory() as tmp, patch.object(metrics, "PROFILE_DIR", tmp), \
+             patch('backend.TAVILY_API_KEY', 'x'), patch('backend.GOOGLE_API_KEY', 'y'), \
+             patch('backend.get_watchlist', return_value=watchlist), \
+             patch('backend.search_sources', return_value=[{'title': 't', 'content': 'c'}]), \
+             patch('backend.analyze_hits', side_effect=lambda food, loc, hits: [backend.RestaurantCandidate(f"{food} Place", loc, 8, "Good", 9)]):
+            total = asyncio.run(sentinel.run_sentinel_async(profile=True))
+            dumps = sorted(os.listdir(tmp))
+
+        self.assertEqual(total, 3)
+        self.assertTrue(dumps[0].endswith(".mem.txt") and dumps[1].endswith(".prof"))
+
+        r = TestClient(server.app).get("/metrics")
+        self.assertTrue(r.headers["content-type"].startswith("text/plain"))
+        self.assertIn('foodie_restaurants_saved_total{outcome="inserted"} 3', r.text)
+        self.assertIn("foodie_discoveries_total 3", r.text)
+
+if __name__ == '__main__':
+    unittest.main()
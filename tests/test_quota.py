@@ -0,0 +1,62 @@
+import sys
+import os
+import unittest
+from unittest.mock import patch
+
+# Add parent folder to path so we can import quota
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import quota
+
+class FakeClock:
+    """Stands in for the time module so waits are instant but still measured."""
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = 0.0
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept += seconds
+        self.now += seconds
+
+class TestQuotaScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        limits = {"fake": {"rpm": 2, "tpm": 100}}
+        self.patches = [patch('quota.time', self.clock), patch.dict('quota.LIMITS', limits)]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def test_burst_is_free_then_waits_only_for_refill(self):
+        self.assertEqual(quota.acquire("fake"), 0)
+        self.assertEqual(quota.acquire("fake"), 0)
+
+        # Third request in the same minute: 1 request refills in 30s (+ up to 10% jitter)
+        waited = quota.acquire("fake")
+        self.assertGreaterEqual(waited, 30)
+        self.assertLess(waited, 34)
+
+    def test_token_budget_is_enforced(self):
+        quota.acquire("fake", tokens=90)
+        # Only 10 tokens left, so 50 more need 40 tokens of refill = 24s
+        waited = quota.acquire("fake", tokens=50)
+        self.assertGreaterEqual(waited, 24)
+
+    def test_penalize_drains_requests_for_everyone(self):
+        quota.penalize("fake")
+        self.assertGreaterEqual(quota.acquire("fake"), 30)
+
+    def test_backoff_is_jittered_and_capped(self):
+        delays = [quota.backoff_delay(10, base=2, cap=5) for _ in range(50)]
+        self.assertTrue(all(0 <= d <= 5 for d in delays))
+        self.assertGreater(len(set(delays)), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import sys
+import os
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+# Add parent folder to path so we can import router
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import backend
+import router
+
+PRIMARY, BACKUP = "model-a", "model-b"
+
+def failing(bad):
+    """A call that raises for the models in `bad` and answers with the model name otherwise."""
+    def call(model):
+        if model in bad:
+            raise RuntimeError(f"{model} is down")
+        return f"answer from {model}"
+    return call
+
+@patch.object(router, "MODELS", [PRIMARY, BACKUP])
+class TestRouter(unittest.TestCase):
+
+    def setUp(self):
+        router.reset()
+
+    def test_falls_back_when_primary_fails(self):
+        model, result = router.call(failing({PRIMARY}), hedge=False)
+        self.assertEqual((model, result), (BACKUP, "answer from model-b"))
+        stats = router.get_stats()
+        self.assertEqual(stats[PRIMARY]["errors"], 1)
+        self.assertEqual(stats[BACKUP]["calls"], 1)
+
+    def test_breaker_trips_then_recovers_after_probe(self):
+        for _ in range(router.BREAKER_MIN_CALLS):
+            router.call(failing({PRIMARY}), hedge=False)
+        self.assertEqual(router.get_stats()[PRIMARY]["state"], "open")
+        # While open, calls go straight to the backup
+        self.assertEqual(router.route(), [BACKUP])
+
+        with patch.object(router, "BREAKER_COOLDOWN", 0):
+            self.assertEqual(router.route()[0], PRIMARY)
+            # Only one probe at a time
+            router.pick()
+            self.assertEqual(router.route(), [BACKUP])
+            router.record(PRIMARY, 0.1)
+        self.assertEqual(router.get_stats()[PRIMARY]["state"], "closed")
+
+    def test_probe_goes_to_one_caller(self):
+        for _ in range(router.BREAKER_MIN_CALLS):
+            router.call(failing({PRIMARY}), hedge=False)
+        with patch.object(router, "BREAKER_COOLDOWN", 0):
+            self.assertEqual(router.route(claim=True)[0], PRIMARY)
+            self.assertEqual(router.route(claim=True), [BACKUP])
+            router.release(PRIMARY)
+            # A call that never needed its claimed fallback gives the probe back
+            self.assertEqual(router.call(lambda model: model, hedge=False), (PRIMARY, PRIMARY))
+        self.assertEqual(router.get_stats()[PRIMARY]["state"], "closed")
+
+    def test_stream_closed_early_gives_probe_back(self):
+        for _ in range(router.BREAKER_MIN_CALLS):
+            router.call(failing({PRIMARY}), hedge=False)
+        client = MagicMock()
+        client.models.generate_content_stream.return_value = [MagicMock(text="[{"), MagicMock(text="}]")]
+
+        with patch.object(router, "BREAKER_COOLDOWN", 0), patch('backend.quota.acquire', return_value=0):
+            stream = backend.generate_stream_with_retry(client, "prompt")
+            self.assertEqual(next(stream), "[{")
+            self.assertEqual(router.route(), [BACKUP])
+            stream.close()  # client went away mid-answer
+            self.assertEqual(router.route()[0], PRIMARY)
+
+    def test_all_open_fails_fast(self):
+        for _ in range(router.BREAKER_MIN_CALLS):
+            with self.assertRaises(RuntimeError):
+                router.call(failing({PRIMARY, BACKUP}), hedge=False)
+        with self.assertRaises(router.CircuitOpen):
+            router.call(failing(set()), hedge=False)
+
+    def test_quota_wait_not_counted_as_latency(self):
+        router.call(failing(set()), prepare=lambda model: time.sleep(0.05), hedge=False)
+        self.assertLess(router.get_stats()[PRIMARY]["p50_ms"], 25)
+
+    def test_slow_model_demoted(self):
+        for _ in range(5):
+            router.record(PRIMARY, 1.0)
+            router.record(BACKUP, 0.1)
+        self.assertEqual(router.route(), [BACKUP, PRIMARY])
+
+    def test_hedge_backup_wins(self):
+        for _ in range(router.HEDGE_MIN_SAMPLES):
+            router.record(PRIMARY, 0.01)
+
+        def call(model):
+            if model == PRIMARY:
+                time.sleep(0.5)
+            return model
+
+        with patch.object(router, "HEDGE_MIN_DELAY", 0.02):
+            self.assertEqual(router.hedge_delay(PRIMARY), 0.02)
+            model, result = router.call(call, hedge=True)
+        self.assertEqual((model, result), (BACKUP, BACKUP))
+        stats = router.get_stats()
+        self.assertEqual((stats[PRIMARY]["hedges"], stats[BACKUP]["hedge_wins"]), (1, 1))
+
+    def test_no_hedge_without_enough_samples(self):
+        self.assertIsNone(router.hedge_delay(PRIMARY))
+        self.assertEqual(router.call(failing(set()), hedge=True), (PRIMARY, "answer from model-a"))
+
+if __name__ == '__main__':
+    unittest.main()
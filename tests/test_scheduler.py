@@ -0,0 +1,60 @@
+import sys
+import os
+import unittest
+from datetime import datetime, timedelta, timezone
+
+# Add parent folder to path so we can import scheduler
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import backend
+import scheduler
+
+NOW = datetime(2026, 1, 15, 12, 0, 0)
+
+def checked(hours_ago):
+    return (NOW - timedelta(hours=hours_ago)).strftime(scheduler.TIME_FORMAT)
+
+class TestScheduler(unittest.TestCase):
+
+    def test_only_stale_targets_are_due(self):
+        targets = [
+            {"food_item": "Fresh", "last_checked": checked(1), "recent_yield": 2.0},
+            {"food_item": "Stale", "last_checked": checked(100), "recent_yield": 2.0},
+            {"food_item": "Dry", "last_checked": checked(100), "recent_yield": 0.0},  # waits for max interval
+            {"food_item": "New", "last_checked": None},
+        ]
+        due = [t["food_item"] for t in scheduler.plan_run(targets, now=NOW)]
+        self.assertEqual(due, ["New", "Stale"])
+
+    def test_priority_and_budget(self):
+        targets = [
+            {"food_item": "Low", "last_checked": checked(250), "recent_yield": 0.5},
+            {"food_item": "High", "last_checked": checked(250), "recent_yield": 3.0},
+            {"food_item": "Starved", "last_checked": checked(24 * 15), "recent_yield": 0.0},
+            {"food_item": "Custom", "last_checked": checked(3), "recent_yield": 3.0,
+             "min_interval_hours": 2, "max_interval_hours": 4},
+        ]
+        due = [t["food_item"] for t in scheduler.plan_run(targets, now=NOW)]
+        self.assertEqual(due[0], "Starved")  # past its max interval, goes first
+        self.assertLess(due.index("High"), due.index("Low"))
+        self.assertIn("Custom", due)
+        self.assertEqual(len(scheduler.plan_run(targets, budget=2, now=NOW)), 2)
+
+    def test_nightly_run_that_starts_early_still_scans(self):
+        targets = [{"food_item": "Nightly", "last_checked": checked(24 - 0.1), "recent_yield": 50.0},
+                   {"food_item": "Just done", "last_checked": checked(1), "recent_yield": 50.0}]
+        due = [t["food_item"] for t in scheduler.plan_run(targets, now=NOW.replace(tzinfo=timezone.utc))]
+        self.assertEqual(due, ["Nightly"])
+
+    def test_record_scan_pushes_target_back(self):
+        backend.add_to_watchlist("Omakase", "Markham")
+        self.assertIn("Omakase", [t["food_item"] for t in backend.get_due_targets()])
+
+        backend.record_scan("Omakase", "Markham", 2)
+        row = next(t for t in backend.get_watchlist() if t["food_item"] == "Omakase")
+        self.assertEqual((row["scan_count"], row["total_found"]), (1, 2))
+        self.assertGreater(row["recent_yield"], scheduler.INITIAL_YIELD)
+        self.assertNotIn("Omakase", [t["food_item"] for t in backend.get_due_targets()])
+
+if __name__ == '__main__':
+    unittest.main()
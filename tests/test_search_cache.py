@@ -0,0 +1,53 @@
+import sys
+import os
+import unittest
+from unittest.mock import MagicMock, patch
+
+# Add parent folder to path so we can import search_cache
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import search_cache
+
+class TestSearchCache(unittest.TestCase):
+
+    def setUp(self):
+        self.client = MagicMock()
+        self.client.search.return_value = {'results': [{'title': 'Guide', 'content': 'Pizza Nova'}]}
+        search_cache.STATS.update(hits=0, misses=0)
+        # Don't let the quota scheduler slow the tests down
+        self.quota = patch('search_cache.quota.acquire', return_value=0)
+        self.quota.start()
+
+    def tearDown(self):
+        self.quota.stop()
+
+    def test_normalized_repeat_query_is_a_hit(self):
+        first = search_cache.search(self.client, "Best Pizza  in Markham", include_domains=["reddit.com", "blogto.com"])
+        second = search_cache.search(self.client, "best pizza in markham", include_domains=["blogto.com", "reddit.com"])
+
+        self.assertEqual(first, second)
+        self.assertEqual(self.client.search.call_count, 1)
+        self.assertEqual(search_cache.get_stats()["hits"], 1)
+
+    def test_different_topic_or_size_is_a_miss(self):
+        search_cache.search(self.client, "ramen", topic="news")
+        search_cache.search(self.client, "ramen")
+        search_cache.search(self.client, "ramen", max_results=3)
+        self.assertEqual(self.client.search.call_count, 3)
+
+    def test_expired_entries_and_bypass_go_upstream(self):
+        with patch.dict('search_cache.TOPIC_TTLS', {"news": -1}):
+            search_cache.search(self.client, "ai news", topic="news")
+            search_cache.search(self.client, "ai news", topic="news")
+        search_cache.search(self.client, "pho")
+        search_cache.search(self.client, "pho", bypass=True)
+        self.assertEqual(self.client.search.call_count, 4)
+
+    def test_lru_eviction_bounds_size(self):
+        with patch('search_cache.MAX_ENTRIES', 2):
+            for dish in ["a", "b", "c"]:
+                search_cache.search(self.client, dish)
+        self.assertEqual(search_cache.get_stats()["entries"], 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import sys
+import os
+import time
+import asyncio
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+# Add parent folder to path so we can import sentinel
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import backend
+import sentinel
+
+class TestSentinelEngine(unittest.TestCase):
+
+    def test_targets_run_concurrently_within_limits(self):
+        """
+        All targets get processed, and no more than 2 Gemini calls overlap.
+        """
+        watchlist = [{"food_item": f"Dish {i}", "location": "Markham"} for i in range(6)]
+        lock = threading.Lock()
+        state = {"active": 0, "peak": 0}
+
+        def fake_analyze(food, loc, hits):
+            with lock:
+                state["active"] += 1
+                state["peak"] = max(state["peak"], state["active"])
+            time.sleep(0.05)
+            with lock:
+                state["active"] -= 1
+            return [backend.RestaurantCandidate(f"{food} Place", loc, 8, "Good", 9)]
+
+        with patch('backend.TAVILY_API_KEY', 'x'), patch('backend.GOOGLE_API_KEY', 'y'), \
+             patch('backend.get_watchlist', return_value=watchlist), \
+             patch('backend.search_sources', return_value=[{'title': 't', 'content': 'c'}]), \
+             patch('backend.analyze_hits', side_effect=fake_analyze), \
+             patch('backend.save_restaurants', side_effect=lambda spots: [(s.name, "inserted") for s in spots]):
+            total = sentinel.run_sentinel()
+
+        self.assertEqual(total, 6)
+        self.assertLessEqual(state["peak"], sentinel.GEMINI_CONCURRENCY)
+        self.assertGreater(state["peak"], 1)
+
+    def test_one_failing_target_does_not_stop_the_run(self):
+        watchlist = [{"food_item": "Pizza", "location": "Markham"},
+                     {"food_item": "Ramen", "location": "North York"}]
+
+        def fake_search(food, loc, bypass_cache=False):
+            if food == "Pizza":
+                raise RuntimeError("boom")
+            return [{'title': 't', 'content': 'c'}]
+
+        with patch('backend.TAVILY_API_KEY', 'x'), patch('backend.GOOGLE_API_KEY', 'y'), \
+             patch('backend.get_watchlist', return_value=watchlist), \
+             patch('backend.search_sources', side_effect=fake_search), \
+             patch('backend.analyze_hits', side_effect=lambda food, loc, hits: [backend.RestaurantCandidate("Ramen Isshin", loc, 8, "Rich", 9)] if hits else []), \
+             patch('backend.save_restaurants', side_effect=lambda spots: [(s.name, "inserted") for s in spots]):
+            total = sentinel.run_sentinel()
+
+        self.assertEqual(total, 1)
+
+    def test_batch_mode_packs_targets_into_one_call(self):
+        watchlist = [{"food_item": f"Dish {i}", "location": "Markham"} for i in range(5)]
+
+        def fake_batch(groups):
+            return [[backend.RestaurantCandidate(f"{food} Place", loc, 8, "Good", 9)] for food, loc, hits in groups]
+
+        with patch('backend.TAVILY_API_KEY', 'x'), patch('backend.GOOGLE_API_KEY', 'y'), \
+             patch('backend.get_watchlist', return_value=watchlist), \
+             patch('backend.search_sources', return_value=[{'title': 't', 'content': 'c'}]), \
+             patch('backend.analyze_batch', side_effect=fake_batch) as mock_batch, \
+             patch('backend.analyze_hits', side_effect=lambda food, loc, hits: fake_batch([(food, loc, hits)])[0]), \
+             patch('backend.save_restaurants', side_effect=lambda spots: [(s.name, "inserted") for s in spots]):
+            total = asyncio.run(sentinel.run_sentinel_async(batch_size=2))
+
+        self.assertEqual(total, 5)
+        self.assertEqual(mock_batch.call_count, 2)  # 2 + 2 batched, the last one alone
+
+    def test_failed_search_or_analysis_leaves_targets_due(self):
+        """An outage isn't a zero-yield scan: the scheduler must not back off those targets."""
+        backend.init_db()
+        backend.add_to_watchlist("Pizza", "Markham")
+        backend.add_to_watchlist("Ramen", "North York")
+        tavily = MagicMock()
+        tavily.search.side_effect = RuntimeError("Tavily is down")
+
+        with patch('backend.TAVILY_API_KEY', 'x'), patch('backend.GOOGLE_API_KEY', 'y'), \
+             patch('clients.tavily_client', return_value=tavily):
+            self.assertEqual(sentinel.run_sentinel(), 0)
+        watchlist = backend.get_watchlist()
+        self.assertTrue(all(t["last_checked"] is None and not t["scan_count"] for t in watchlist))
+        self.assertEqual(len(backend.get_due_targets()), len(watchlist))
+
+        # Search works, Gemini gives up
+        with patch('backend.TAVILY_API_KEY', 'x'), patch('backend.GOOGLE_API_KEY', 'y'), \
+             patch('backend.search_sources', return_value=[{'title': 't', 'content': 'Pizza Nova'}]), \
+             patch('backend.generate_with_retry', return_value=None):
+            self.assertEqual(sentinel.run_sentinel(), 0)
+        self.assertEqual(len(backend.get_due_targets()), len(watchlist))
+
+    def test_scheduled_scan_skips_the_search_cache(self):
+        """A cached answer finds nothing new; scanning it would back off a healthy target."""
+        backend.init_db()
+        backend.add_to_watchlist("Pizza", "Markham")
+        tavily = MagicMock()
+        tavily.search.return_value = {"results": [{"url": "https://a", "title": "t", "content": "Pizza Nova"}]}
+
+        with patch('backend.TAVILY_API_KEY', 'x'), patch('backend.GOOGLE_API_KEY', 'y'), \
+             patch('clients.tavily_client', return_value=tavily), \
+             patch('backend.search_cache.quota.acquire', return_value=0), \
+             patch('backend.analyze_batch', side_effect=lambda targets: [[] for _ in targets]), \
+             patch('backend.analyze_hits', return_value=[]):
+            backend.search_sources("Pizza", "Markham")  # warms the cache
+            sentinel.run_sentinel()
+        queries = [c.args[0] for c in tavily.search.call_args_list]
+        self.assertEqual(sum("Pizza in Markham" in q for q in queries), 2)
+
+if __name__ == '__main__':
+    unittest.main()
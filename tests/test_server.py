@@ -0,0 +1,83 @@
+import sys
+import os
+import gzip
+import json
+import unittest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+
+# Add parent folder to path so we can import server
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import server
+
+class TestHypeServer(unittest.TestCase):
+
+    def setUp(self):
+        self.client = TestClient(server.app)
+
+    def test_single_endpoint_unchanged(self):
+        r = self.client.post("/analyze", json={"text": "A revolutionary breakthrough"})
+        self.assertEqual(r.json()["hype_score"], 20)
+
+    def test_batch_endpoint(self):
+        r = self.client.post("/analyze/batch", json={"texts": ["boom", "calm day", "agentic future"]})
+        self.assertEqual(r.json()["hype_scores"], [10, 0, 20])
+
+        body = gzip.compress(json.dumps({"texts": ["boom"] * 100}).encode())
+        r = self.client.post("/analyze/batch", content=body, headers={"Content-Encoding": "gzip"})
+        self.assertEqual(r.json()["count"], 100)
+
+        self.assertEqual(self.client.post("/analyze/batch", json={"texts": "nope"}).status_code, 422)
+
+    def test_batch_limits(self):
+        with patch('server.MAX_BATCH_DOCS', 2):
+            r = self.client.post("/analyze/batch", json={"texts": ["a", "b", "c"]})
+            self.assertEqual(r.status_code, 413)
+        with patch('server.MAX_BODY_BYTES', 10):
+            r = self.client.post("/analyze/batch", json={"texts": ["a long enough body"]})
+            self.assertEqual(r.status_code, 413)
+
+    def test_ndjson_stream(self):
+        lines = [json.dumps({"text": "boom"}), json.dumps("calm"), "not json", json.dumps({"text": "the future"})]
+        r = self.client.post("/analyze/stream", content="\n".join(lines) + "\n")
+        records = [json.loads(l) for l in r.text.splitlines()]
+
+        self.assertEqual(r.headers["content-type"], "application/x-ndjson")
+        self.assertEqual([rec["index"] for rec in records], [0, 1, 2, 3])
+        self.assertEqual(records[0]["hype_score"], 10)
+        self.assertIn("error", records[2])
+        self.assertEqual(records[3]["hype_score"], 10)
+
+    def test_stream_is_not_gzipped(self):
+        body = "\n".join(json.dumps({"text": "boom " * 50}) for _ in range(200)) + "\n"
+        headers = {"Accept-Encoding": "gzip"}
+        r = self.client.post("/analyze/stream", content=body, headers=headers)
+        self.assertNotIn("content-encoding", r.headers)
+        self.assertEqual(len(r.text.splitlines()), 200)
+        # Ordinary responses are still compressed
+        r = self.client.post("/analyze/batch", json={"texts": ["boom"] * 500}, headers=headers)
+        self.assertEqual(r.headers["content-encoding"], "gzip")
+
+    def test_bad_bodies_are_client_errors(self):
+        for path in ("/analyze/batch", "/analyze/stream"):
+            r = self.client.post(path, content=b"definitely not gzip", headers={"Content-Encoding": "gzip"})
+            self.assertEqual(r.status_code, 400)
+            r = self.client.post(path, content=b"{}", headers={"Content-Length": "lots"})
+            self.assertEqual(r.status_code, 400)
+
+        truncated = gzip.compress(json.dumps({"texts": ["boom"] * 100}).encode())[:-10]
+        r = self.client.post("/analyze/batch", content=truncated, headers={"Content-Encoding": "gzip"})
+        self.assertEqual(r.status_code, 400)
+
+    def test_stream_line_limit_applies_to_every_line(self):
+        body = json.dumps("boom") + "\n" + json.dumps("x" * 500) + "\n" + json.dumps("calm") + "\n"
+        with patch('server.MAX_LINE_BYTES', 10):
+            r = self.client.post("/analyze/stream", content=body)
+        records = [json.loads(l) for l in r.text.splitlines()]
+        self.assertEqual(records[0]["hype_score"], 10)
+        self.assertEqual((records[1]["index"], len(records)), (1, 2))
+        self.assertIn("Line longer", records[1]["error"])
+
+if __name__ == '__main__':
+    unittest.main()
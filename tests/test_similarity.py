@@ -0,0 +1,112 @@
+import sys
+import os
+import unittest
+import numpy as np
+from unittest.mock import patch
+
+# Add parent folder to path so we can import backend
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+import backend
+import similarity
+
+PLACES = [
+    backend.RestaurantCandidate("Santouka", "Markham", 9, "Shio ramen with rich pork broth", 8),
+    backend.RestaurantCandidate("Kinton", "North York", 8, "Pork broth ramen, thick noodles", 8),
+    backend.RestaurantCandidate("Pizza Nova", "Markham", 6, "Classic pepperoni slice", 7),
+    backend.RestaurantCandidate("Congee Queen", "Scarborough", 7, "Late night congee and rice rolls", 6),
+]
+
+class TestSimilarity(unittest.TestCase):
+
+    def test_places_like_a_known_restaurant(self):
+        backend.save_restaurants(PLACES)
+        found = backend.find_similar_restaurants("santouka", limit=2)
+        self.assertEqual(found["match"]["name"], "Santouka")
+        self.assertEqual(found["results"][0]["name"], "Kinton")
+        self.assertNotIn("Santouka", [r["name"] for r in found["results"]])
+
+        # Free-text descriptions work too, and unrelated places don't show up
+        found = backend.find_similar_restaurants("late night congee", limit=5)
+        self.assertIsNone(found["match"])
+        self.assertEqual([r["name"] for r in found["results"]], ["Congee Queen"])
+
+    def test_saves_update_the_index_incrementally(self):
+        backend.save_restaurants(PLACES[:2])
+        index = similarity.get_index()
+        self.assertEqual(index.rows, 2)
+        self.assertIsInstance(index.ids, np.memmap)
+
+        # Appends only the new row; a changed place gets a new row that supersedes the old one
+        backend.save_restaurants(PLACES[2:3])
+        backend.save_restaurant(backend.RestaurantCandidate("Kinton", "North York", 9, "Now serving wood-fired pizza", 9))
+        index = similarity.get_index()
+        self.assertEqual(index.rows, 4)
+        found = backend.find_similar_restaurants("pizza", limit=5)
+        self.assertEqual({r["name"] for r in found["results"]}, {"Pizza Nova", "Kinton"})
+        self.assertEqual(len(backend.find_similar_restaurants("pork broth ramen")["results"]), 1)
+
+    def test_catches_up_with_rows_written_elsewhere_and_rebuilds(self):
+        backend.save_restaurants(PLACES[:1])
+        # e.g. setup scripts that insert straight into the table
+        conn = db.get_connection()
+        conn.execute("INSERT INTO restaurants (name, neighborhood, taste_rating, notes) VALUES ('Ramen Isshin', 'Toronto', 8, 'Shio ramen')")
+        conn.commit()
+        self.assertEqual(backend.find_similar_restaurants("Santouka")["results"][0]["name"], "Ramen Isshin")
+
+        # A fresh process loads the same arrays from disk
+        fresh = similarity.Index(similarity.index_dir())
+        fresh.refresh()
+        self.assertEqual(fresh.rows, 2)
+
+        with db.get_connection() as conn:
+            conn.execute("DELETE FROM restaurants WHERE name = 'Ramen Isshin'")
+            self.assertEqual(similarity.rebuild(conn), 1)
+        self.assertEqual(backend.find_similar_restaurants("Santouka")["results"], [])
+        # ...and notices the rebuild
+        fresh.refresh()
+        self.assertEqual((fresh.rows, list(fresh.ids)), (1, [1]))
+
+    def test_failed_appends_and_direct_edits_are_caught_up(self):
+        backend.save_restaurants(PLACES[:2])
+        with patch.object(similarity.Index, "append", side_effect=OSError("disk full")):
+            backend.save_restaurant(backend.RestaurantCandidate("Kinton", "North York", 9, "Now serving congee", 9))
+        # An edit that never goes through the writer, to a row below the index's newest id
+        conn = db.get_connection()
+        conn.execute("UPDATE restaurants SET notes = 'Wood-fired pizza now' WHERE name = 'Santouka'")
+        conn.commit()
+        conn.close()
+
+        self.assertEqual(backend.find_similar_restaurants("congee")["results"][0]["name"], "Kinton")
+        self.assertEqual(backend.find_similar_restaurants("pizza")["results"][0]["name"], "Santouka")
+        with db.get_connection() as conn:
+            self.assertEqual(similarity.sync(conn), 0)
+
+    def test_torn_append_is_cut_back(self):
+        backend.save_restaurants(PLACES[:2])
+        index = similarity.get_index()
+        # A crash part-way through an append: data, indices and half of ends made it, ids didn't
+        for name, junk in (("data", np.ones(3, np.float32)), ("indices", np.zeros(3, np.int32)),
+                           ("ends", np.array([999], np.int64))):
+            with open(index._file(name), "ab") as f:
+                f.write(junk.tobytes()[:-2] if name == "ends" else junk.tobytes())
+        with open(os.path.join(similarity.index_dir(), "vocab.txt"), "a") as f:
+            f.write("half-writ")
+
+        fresh = similarity.Index(similarity.index_dir())
+        fresh.refresh()
+        self.assertEqual(fresh.rows, 2)
+
+        with patch.object(similarity, "fcntl", None):  # no flock (Windows): thread lock only
+            backend.save_restaurants(PLACES[2:])
+        index = similarity.get_index()
+        self.assertEqual(index.rows, 4)
+        self.assertEqual(len(index.ends), len(index.ids))
+        self.assertEqual(int(index.ends[-1]), len(index.data))
+        self.assertNotIn("half-writ", index.vocab)
+        self.assertEqual(backend.find_similar_restaurants("late night congee")["results"][0]["name"], "Congee Queen")
+        self.assertEqual(backend.find_similar_restaurants("pepperoni slice")["results"][0]["name"], "Pizza Nova")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import sys
+import os
+import glob
+import unittest
+from unittest.mock import patch
+
+# Add parent folder to path so we can import snapshots
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+import backend
+import snapshots
+
+def add_places(names, neighborhood="Markham", rating=7):
+    backend.save_restaurants([backend.RestaurantCandidate(n, neighborhood, rating, "Notes", 5) for n in names])
+
+class TestSnapshots(unittest.TestCase):
+
+    def setUp(self):
+        backend.init_db()
+
+    def test_exports_only_new_rows(self):
+        add_places(["Santouka", "Kinton"])
+        add_places(["Congee Queen"], neighborhood="Scarborough", rating=None)
+        self.assertEqual(snapshots.export()["restaurants"], 3)
+        self.assertEqual(snapshots.export()["restaurants"], 0)
+
+        add_places(["Pizza Nova"], rating=5)
+        self.assertEqual(snapshots.export()["restaurants"], 1)
+        self.assertEqual(snapshots.get_marks()["restaurants"]["rows"], 4)
+
+        table = snapshots.read("restaurants")
+        self.assertEqual(sorted(table["name"].to_pylist()), ["Congee Queen", "Kinton", "Pizza Nova", "Santouka"])
+        ratings = snapshots.ratings_by_neighborhood().to_pylist()
+        self.assertEqual(ratings[0], {"neighborhood": "Markham", "places": 3, "rated": 3, "avg_rating": 19 / 3})
+        self.assertEqual(ratings[1]["rated"], 0)
+        self.assertEqual(sum(r["discoveries"] for r in snapshots.discoveries_by_month().to_pylist()), 4)
+
+    def test_partitions_by_month_and_compacts(self):
+        add_places(["Old Spot"])
+        conn = db.get_connection()
+        conn.execute("UPDATE restaurants SET created_at = '2025-01-15 12:00:00'")
+        conn.commit()
+        conn.close()
+        for name in ["Alpha", "Bravo", "Charlie", "Delta"]:
+            add_places([name])
+            snapshots.export()
+
+        folder = os.path.join(snapshots.snapshot_dir(), "restaurants")
+        self.assertEqual(len(glob.glob(os.path.join(folder, "month=2025-01", "*.parquet"))), 1)
+        self.assertEqual(snapshots.read("restaurants", filters=[("month", "<", "2025-12")])["name"].to_pylist(), ["Old Spot"])
+
+        with patch.object(snapshots, "MAX_FILES_PER_PARTITION", 2):
+            add_places(["Echo"])
+            snapshots.export()
+        month = snapshots.read("restaurants", columns=["month"])["month"][-1].as_py()
+        self.assertEqual(len(glob.glob(os.path.join(folder, f"month={month}", "*.parquet"))), 1)
+        self.assertEqual(snapshots.read("restaurants").num_rows, 6)
+
+    def test_target_activity_per_week(self):
+        backend.record_search_hits([{"url": "https://a", "title": "A", "content": "a"},
+                                    {"url": "https://b", "title": "B", "content": "b"}], "Ramen", "Markham")
+        backend.record_search_hits([{"url": "https://c", "title": "C", "content": "c"}], "Pho", "Markham")
+        conn = db.get_connection()
+        conn.execute("UPDATE target_hits SET first_seen = '2026-03-04 09:00:00' WHERE food_item = 'Ramen'")
+        conn.execute("UPDATE target_hits SET first_seen = '2026-03-11 09:00:00' WHERE food_item = 'Pho'")
+        conn.commit()
+        conn.close()
+
+        counts = snapshots.export()
+        self.assertEqual((counts["search_hits"], counts["target_hits"]), (3, 3))
+        activity = [(r["target"], str(r["period"].date()), r["new_hits"]) for r in snapshots.target_activity().to_pylist()]
+        self.assertEqual(activity, [("Ramen @ Markham", "2026-03-02", 2), ("Pho @ Markham", "2026-03-09", 1)])
+
+        # A row stamped before the last export but committed after it still gets exported
+        backend.record_search_hits([{"url": "https://d", "title": "D", "content": "d"}], "Ramen", "Markham")
+        conn = db.get_connection()
+        conn.execute("UPDATE target_hits SET first_seen = '2026-03-05 09:00:00' WHERE hit_id = 4")
+        conn.commit()
+        conn.close()
+        self.assertEqual(snapshots.export()["target_hits"], 1)
+        self.assertEqual(snapshots.target_activity().to_pylist()[0]["new_hits"], 3)
+
+    def test_odd_ratings_and_repeated_batches(self):
+        backend.save_restaurants([backend.RestaurantCandidate("Half Star", "Markham", 7.5, "Notes", 5),
+                                  backend.RestaurantCandidate("Out Of Ten", "Markham", "8/10", "Notes", 5)])
+        # A crash after a batch's file is written but before its mark is saved
+        conn = db.get_connection()
+        rows = conn.execute(snapshots.EXPORTS["restaurants"]["sql"], (0,)).fetchall()
+        conn.close()
+        snapshots._write_batch("restaurants", rows, rows[0][0])
+        add_places(["Late Arrival"])
+
+        self.assertEqual(snapshots.export()["restaurants"], 3)
+        table = snapshots.read("restaurants").sort_by("id")
+        self.assertEqual(table["name"].to_pylist(), ["Half Star", "Out Of Ten", "Late Arrival"])
+        self.assertEqual(table["taste_rating"].to_pylist(), [7.5, None, 7.0])
+
+    def test_empty_snapshot_reads(self):
+        self.assertEqual(snapshots.read("restaurants").num_rows, 0)
+        self.assertEqual(snapshots.ratings_by_neighborhood().num_rows, 0)
+        self.assertEqual(snapshots.target_activity().num_rows, 0)
+
+if __name__ == '__main__':
+    unittest.main()
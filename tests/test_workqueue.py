@@ -0,0 +1,100 @@
+import sys
+import os
+import asyncio
+import threading
+import unittest
+import uuid
+from collections import Counter
+from unittest.mock import MagicMock, patch
+
+# Add parent folder to path so we can import workqueue
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import backend
+import sentinel
+import workqueue
+
+TARGETS = [{"food_item": f"Dish {i}", "location": "Markham"} for i in range(12)]
+
+class TestWorkQueue(unittest.TestCase):
+
+    def test_leases(self):
+        run_id = workqueue.open_run(lambda: TARGETS[:3])
+        self.assertEqual(workqueue.open_run(lambda: TARGETS), run_id)  # later workers join, no re-enqueue
+
+        a = workqueue.claim(run_id, "worker-a", limit=2)
+        b = workqueue.claim(run_id, "worker-b", limit=5)
+        self.assertEqual([t["food_item"] for t in a + b], ["Dish 0", "Dish 1", "Dish 2"])
+        self.assertEqual(workqueue.claim(run_id, "worker-c"), [])
+
+        self.assertEqual(workqueue.heartbeat(run_id, "worker-a", a), 2)
+        self.assertTrue(workqueue.complete(run_id, "worker-a", a[0], 4))
+        self.assertFalse(workqueue.complete(run_id, "worker-b", a[1], 1))  # not b's lease
+
+        # worker-a "dies": its lease runs out and worker-c takes the target over
+        workqueue.heartbeat(run_id, "worker-a", a[1:], lease_seconds=-1)
+        taken = workqueue.claim(run_id, "worker-c")
+        self.assertEqual((taken[0]["food_item"], taken[0]["attempts"]), ("Dish 1", 2))
+        self.assertFalse(workqueue.complete(run_id, "worker-a", a[1], 1))
+        self.assertTrue(workqueue.complete(run_id, "worker-c", taken[0], 1))
+
+        # Failures go back to the queue, then fail for good after MAX_ATTEMPTS
+        with patch.object(workqueue, "MAX_ATTEMPTS", 2):
+            self.assertTrue(workqueue.release(run_id, "worker-b", b[0], "boom"))
+            retry = workqueue.claim(run_id, "worker-b")
+            workqueue.release(run_id, "worker-b", retry[0], "boom again")
+        self.assertEqual(workqueue.run_status(run_id), {"done": 2, "failed": 1, "new_spots": 5})
+        self.assertIsNone(workqueue.open_run(lambda: []))
+
+    def test_parallel_workers_process_each_target_once(self):
+        seen = Counter()
+        lock = threading.Lock()
+
+        def fake_analyze(food, loc, hits):
+            with lock:
+                seen[food] += 1
+            return [backend.RestaurantCandidate(uuid.uuid4().hex, loc, 8, "Good", 9)]
+
+        # Once scanned, targets aren't due any more, so a late worker finds nothing new to enqueue
+        totals = []
+        def worker(n):
+            totals.append(asyncio.run(sentinel.run_worker_async(worker_id=f"w{n}")))
+
+        with patch('backend.TAVILY_API_KEY', 'x'), patch('backend.GOOGLE_API_KEY', 'y'), \
+             patch('backend.get_due_targets', side_effect=[TARGETS] + [[]] * 5), \
+             patch('backend.search_sources', return_value=[{'title': 't', 'content': 'c'}]), \
+             patch('backend.analyze_hits', side_effect=fake_analyze):
+            threads = [threading.Thread(target=worker, args=(n,)) for n in range(3)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+        self.assertEqual(seen, Counter({t["food_item"]: 1 for t in TARGETS}))
+        self.assertEqual(sum(totals), len(TARGETS))
+
+    def test_failed_search_goes_back_to_the_queue(self):
+        run_id = workqueue.open_run(lambda: TARGETS[:1])
+        claim = workqueue.claim
+        claimed = []
+
+        def claim_once(*args, **kwargs):
+            # One pass only: otherwise the loop would retry the target until MAX_ATTEMPTS
+            if claimed:
+                return []
+            claimed.extend(claim(*args, **kwargs))
+            return claimed
+
+        tavily = MagicMock()
+        tavily.search.side_effect = RuntimeError("Tavily is down")
+        limits = {"tavily": asyncio.Semaphore(1), "gemini": asyncio.Semaphore(1), "db": asyncio.Semaphore(1)}
+        with patch('clients.tavily_client', return_value=tavily), \
+             patch('workqueue.claim', side_effect=claim_once):
+            self.assertEqual(asyncio.run(sentinel._work_loop(run_id, "worker-a", limits, 1)), 0)
+
+        self.assertEqual(workqueue.run_status(run_id), {"pending": 1, "new_spots": 0})
+        retry = workqueue.claim(run_id, "worker-b")
+        self.assertEqual((retry[0]["food_item"], retry[0]["attempts"]), ("Dish 0", 2))
+
+if __name__ == '__main__':
+    unittest.main()
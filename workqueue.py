@@ -0,0 +1,170 @@
+import os
+import time
+import socket
+import uuid
+from typing import Callable, List, Optional
+import db
+
+# --- QUEUE SETTINGS ---
+# A claimed target belongs to its worker for this long unless it heartbeats.
+# Workers on different boxes compare lease times, so keep clocks roughly in sync.
+LEASE_SECONDS = float(os.getenv("QUEUE_LEASE_SECONDS", "120"))
+# Claims per target before it is marked failed for the run
+MAX_ATTEMPTS = int(os.getenv("QUEUE_MAX_ATTEMPTS", "3"))
+
+_ready_dbs = set()
+
+def _ensure_table(conn):
+    """Creates the queue table once per DB file."""
+    if db.DB_PATH in _ready_dbs:
+        return
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS work_queue (
+            run_id TEXT,
+            food_item TEXT,
+            location TEXT,
+            priority INTEGER,
+            status TEXT DEFAULT 'pending',   -- pending | leased | done | failed
+            lease_owner TEXT,
+            lease_expires REAL,
+            attempts INTEGER DEFAULT 0,
+            new_spots INTEGER,
+            error TEXT,
+            updated_at REAL,
+            PRIMARY KEY (run_id, food_item, location)
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_work_queue_claim ON work_queue(run_id, status, priority)")
+    conn.commit()
+    _ready_dbs.add(db.DB_PATH)
+
+def make_worker_id() -> str:
+    """host:pid:random - unique across processes and boxes sharing the DB."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+def open_run(get_targets: Callable[[], List[dict]]) -> Optional[str]:
+    """
+    Returns the run every worker should join: the newest run that still has
+    unfinished targets, or a new run filled from get_targets() (in priority
+    order). Done under one write lock, so workers started together by cron
+    never enqueue the same run twice. Returns None if there is nothing to do.
+    """
+    conn = db.get_connection()
+    try:
+        _ensure_table(conn)
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute('''
+            SELECT run_id FROM work_queue WHERE status IN ('pending', 'leased')
+            ORDER BY run_id DESC LIMIT 1
+        ''').fetchone()
+        if row:
+            conn.rollback()
+            return row[0]
+
+        targets = get_targets()
+        if not targets:
+            conn.rollback()
+            return None
+        run_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:4]}"
+        now = time.time()
+        conn.executemany('''
+            INSERT OR IGNORE INTO work_queue (run_id, food_item, location, priority, updated_at)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [(run_id, t["food_item"], t["location"], i, now) for i, t in enumerate(targets)])
+        conn.commit()
+        return run_id
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def claim(run_id: str, worker_id: str, limit: int = 1, lease_seconds: float = None) -> List[dict]:
+    """
+    Leases up to `limit` targets of the run to this worker: pending ones first,
+    then ones whose lease ran out (their worker died). Returns the targets.
+    """
+    lease_seconds = lease_seconds or LEASE_SECONDS
+    now = time.time()
+    conn = db.get_connection()
+    try:
+        _ensure_table(conn)
+        conn.execute("BEGIN IMMEDIATE")
+        # Targets that keep killing their workers give up eventually
+        conn.execute('''
+            UPDATE work_queue SET status = 'failed', error = 'lease expired too often', updated_at = ?
+            WHERE run_id = ? AND status = 'leased' AND lease_expires < ? AND attempts >= ?
+        ''', (now, run_id, now, MAX_ATTEMPTS))
+        rows = conn.execute('''
+            UPDATE work_queue
+            SET status = 'leased', lease_owner = ?, lease_expires = ?, attempts = attempts + 1, updated_at = ?
+            WHERE rowid IN (
+                SELECT rowid FROM work_queue
+                WHERE run_id = ? AND (status = 'pending' OR (status = 'leased' AND lease_expires < ?))
+                ORDER BY priority
+                LIMIT ?
+            )
+            RETURNING food_item, location, attempts
+        ''', (worker_id, now + lease_seconds, now, run_id, now, limit)).fetchall()
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return [{"food_item": f, "location": l, "attempts": a} for f, l, a in rows]
+
+def _update_owned(run_id: str, worker_id: str, targets: List[dict], sql: str, params: tuple) -> int:
+    """Runs an UPDATE on the targets this worker still holds. Returns how many it still held."""
+    conn = db.get_connection()
+    try:
+        _ensure_table(conn)
+        updated = 0
+        for t in targets:
+            updated += conn.execute(
+                sql + " WHERE run_id = ? AND food_item = ? AND location = ? AND status = 'leased' AND lease_owner = ?",
+                params + (run_id, t["food_item"], t["location"], worker_id)
+            ).rowcount
+        conn.commit()
+        return updated
+    finally:
+        conn.close()
+
+def heartbeat(run_id: str, worker_id: str, targets: List[dict], lease_seconds: float = None) -> int:
+    """Extends the leases on targets still in progress. Returns how many are still ours."""
+    now = time.time()
+    return _update_owned(run_id, worker_id, targets,
+                         "UPDATE work_queue SET lease_expires = ?, updated_at = ?",
+                         (now + (lease_seconds or LEASE_SECONDS), now))
+
+def complete(run_id: str, worker_id: str, target: dict, new_spots: int) -> bool:
+    """
+    Marks a target done. False if the lease was lost meanwhile (another worker
+    took it over), so a target is only ever completed once per run.
+    """
+    return _update_owned(run_id, worker_id, [target],
+                         "UPDATE work_queue SET status = 'done', new_spots = ?, lease_owner = NULL, updated_at = ?",
+                         (new_spots, time.time())) == 1
+
+def release(run_id: str, worker_id: str, target: dict, error: str = None) -> bool:
+    """Gives a target back after a failure: another worker retries it, or it's failed after MAX_ATTEMPTS."""
+    return _update_owned(run_id, worker_id, [target], '''
+        UPDATE work_queue SET
+            status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+            lease_owner = NULL, lease_expires = NULL, error = ?, updated_at = ?
+    ''', (MAX_ATTEMPTS, error, time.time())) == 1
+
+def run_status(run_id: str) -> dict:
+    """{status: count} for a run, plus the total new spots so far."""
+    conn = db.get_connection()
+    try:
+        _ensure_table(conn)
+        counts = dict(conn.execute(
+            "SELECT status, COUNT(*) FROM work_queue WHERE run_id = ? GROUP BY status", (run_id,)
+        ).fetchall())
+        new_spots = conn.execute(
+            "SELECT COALESCE(SUM(new_spots), 0) FROM work_queue WHERE run_id = ?", (run_id,)
+        ).fetchone()[0]
+    finally:
+        conn.close()
+    return {**counts, "new_spots": new_spots}